@@ -0,0 +1,99 @@
+"""Benchmark the single-pass boxscore extractor against BeautifulSoup.
+
+Every page in the corpus is checked first: both engines must extract the same
+rows and build the same tables. Each page is also checked in its prettified
+form, since that is how raw.py has historically saved pages to disk.
+
+Usage (from the project root):
+
+    PYTHONPATH=. python benchmarks/pfr_extract.py [corpus_dir] [--repeat N]
+"""
+
+import argparse
+import pathlib
+import time
+
+from bs4 import BeautifulSoup
+from polars.testing import assert_frame_equal
+
+from src.data.pfr.extract import extract_table_rows
+from src.data.pfr.tables import (TABLE_NAMES,
+                                 extract_all_table_rows_bs4,
+                                 parse_boxscore)
+
+
+FIXTURES_PATH = pathlib.Path(__file__).parents[1] / 'tests' / 'fixtures' / 'pfr'
+
+
+def load_corpus(corpus_path):
+    """Load every page in a corpus, plus a prettified copy of each.
+
+    :param pathlib.Path corpus_path: directory of boxscore html files
+    :return: (pfr ID, html) pairs
+    :rtype: list[tuple[str, str]]
+    """
+    corpus = []
+    for path in sorted(corpus_path.glob('*.html')):
+        html = path.read_text()
+        corpus.append((path.stem, html))
+        corpus.append((path.stem, BeautifulSoup(html, 'html.parser').prettify()))
+    return corpus
+
+
+def check_outputs(corpus):
+    """Check that both engines give identical rows and tables.
+
+    :param list[tuple[str, str]] corpus: (pfr ID, html) pairs
+    :return: None
+    :rtype: None
+    :raises AssertionError: if the outputs differ
+    """
+    for pfr_id, html in corpus:
+        assert extract_table_rows(html) == extract_all_table_rows_bs4(html), pfr_id
+        fast = parse_boxscore(html, pfr_id, engine='fast')
+        reference = parse_boxscore(html, pfr_id, engine='bs4')
+        for name in TABLE_NAMES:
+            assert_frame_equal(fast[name], reference[name])
+
+
+def time_engine(corpus, engine, repeat):
+    """Time parsing a corpus with one engine.
+
+    :param list[tuple[str, str]] corpus: (pfr ID, html) pairs
+    :param str engine: 'fast' or 'bs4'
+    :param int repeat: number of passes over the corpus
+    :return: best seconds per page for row extraction and for full parsing
+    :rtype: tuple[float, float]
+    """
+    extract = extract_table_rows if engine == 'fast' else extract_all_table_rows_bs4
+    best_extract = best_parse = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html in corpus:
+            extract(html)
+        best_extract = min(best_extract, time.perf_counter() - start)
+        start = time.perf_counter()
+        for pfr_id, html in corpus:
+            parse_boxscore(html, pfr_id, engine=engine)
+        best_parse = min(best_parse, time.perf_counter() - start)
+    return best_extract / len(corpus), best_parse / len(corpus)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', nargs='?', type=pathlib.Path,
+                        default=FIXTURES_PATH)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    check_outputs(corpus)
+    print(f"Outputs identical on {len(corpus)} pages")
+
+    results = {engine: time_engine(corpus, engine, args.repeat)
+               for engine in ['bs4', 'fast']}
+    print(f"{'engine':<8}{'extract ms/page':>18}{'parse ms/page':>16}")
+    for engine, (extract_s, parse_s) in results.items():
+        print(f"{engine:<8}{extract_s * 1e3:>18.2f}{parse_s * 1e3:>16.2f}")
+    speedup = results['bs4'][0] / results['fast'][0]
+    print(f"extract speedup: {speedup:.1f}x")
@@ -3,15 +3,25 @@
 :PROJ_ROOT (pathlib.Path): Project root directory.
 :PATHS (dict): Paths to data files and directories.
 :RAW_DATA_URLS (dict): URLs to raw data files.
+:PFR_FETCH (dict): Request budget for fetching boxscores from pro-football-reference.
 :CURRENT_SEASON (int): Current NFL season. Used to fetch current season of play-by-play data.
 :CURRENT_WEEK (int): Current NFL week. Used to fetch current week of play-by-play data.
 :TRAINING (dict): Parameters for training data.
+:FEATURE_CACHE (dict): Settings for the feature builder cache used by build.py.
 :SCORING_METRIC (str): Scoring metric for hyperparameter tuning.
 :CV_TRAIN_SIZE (int): Number of consecutive seasons to use for training in grouped time-series cross validation.
 :CV_TEST_SIZE (int): Number of consecutive seasons to use for testing in grouped time-series cross validation.
 :CV_SHIFT_SIZE (int): Number of seasons to shift for each CV fold.
+:CV_N_JOBS (int): Number of CV folds fitted in parallel when evaluating a model. -1 uses every CPU. Estimators fit on one thread each when folds are fitted in parallel. Folds are fitted serially in hyperparameter trials, which run in parallel themselves.
 :MAX_EVALS (int): Maximum number of hyperparameter tuning iterations.
 :EARLY_STOP_N (int): Number of iterations without improvement to stop hyperparameter tuning.
+:HYPEROPT_BATCH_SIZE (int): Number of hyperparameter trials suggested and evaluated together.
+:HYPEROPT_N_JOBS (int): Number of processes evaluating hyperparameter trials. None uses every CPU.
+:HYPEROPT_SEED (int): Random seed for hyperparameter tuning.
+:HYPEROPT_PRUNING (dict): Settings for pruning hyperparameter trials whose mean loss over their first folds is above the median of earlier trials by more than a relative tolerance. Set to None to fit every fold of every trial.
+:CALIBRATION (dict): How estimators are calibrated when they are evaluated and fitted. 'ensemble' averages estimators fitted without and calibrated on each of ``n_folds`` folds of the training rows. 'holdout' fits one estimator outside a stratified holdout of ``holdout_size`` of the training rows and calibrates it on the holdout.
+:HYPEROPT_CALIBRATION (dict): How estimators are calibrated in hyperparameter trials. Same settings as CALIBRATION.
+:LGBM_EARLY_STOPPING_ROUNDS (int): Number of boosting rounds without improvement on the calibration holdout to stop a LightGBM hyperparameter trial.
 :DEFAULT_PARAM_PREFIX (str): Prefix for default hyperparameters.
 :FEATURE_PRECISIONS (dict): Number of decimal places to round features to.
 """
@@ -23,17 +33,32 @@ import pathlib
 PROJ_ROOT = pathlib.Path(__file__).parents[2].absolute()
 PATHS = {
     'pfr_data': PROJ_ROOT / 'data' / 'pfr',
+    'pfr_archive': PROJ_ROOT / 'data' / 'pfr-archive',
     'raw_games': PROJ_ROOT / 'data' / 'raw' / 'games.csv',
+    'raw_plays': PROJ_ROOT / 'data' / 'raw' / 'plays',
+    'expected_values': PROJ_ROOT / 'data' / 'ancillary' / 'expected-values.csv',
+    'expected_values_store': PROJ_ROOT / 'data' / 'ancillary' / 'expected-values',
     'train': PROJ_ROOT / 'data' / 'train',
     'results': PROJ_ROOT / 'data' / 'results',
     'prediction': PROJ_ROOT / 'data' / 'prediction',
     'boxscore_stats': PROJ_ROOT / 'data' / 'boxscore-stats.db',
+    'boxscore_store': PROJ_ROOT / 'data' / 'boxscore-stats',
     'train_db': PROJ_ROOT / 'data' / 'train.db',
+    'feature_cache': PROJ_ROOT / 'data' / 'feature-cache',
+    'hyperopt_trials': PROJ_ROOT / 'data' / 'results' / 'trials.db',
+    'team_features': PROJ_ROOT / 'data' / 'team-features',
 }
 RAW_DATA_URLS = {
     "games": "https://raw.githubusercontent.com/nflverse/nfldata/master/data/games.csv",
     "plays": "https://github.com/nflverse/nflverse-data/releases/download/pbp",
 }
+PFR_FETCH = {
+    "rate": 1 / 6,
+    "burst": 1,
+    "max_concurrency": 4,
+    "max_retries": 5,
+    "backoff": 2.0,
+}
 
 
 CURRENT_SEASON = 2024
@@ -44,12 +69,35 @@ TRAINING = {
     "games_cols": ["game_id", "season", "week", "away_team", "home_team",
                    "away_rest", "home_rest", "result"]
 }
+FEATURE_CACHE = {
+    "max_entries": 32,
+}
 SCORING_METRIC = 'neg_brier_score'
 CV_TRAIN_SIZE = 10
 CV_TEST_SIZE = 3
 CV_SHIFT_SIZE = 2
-MAX_EVALS = 15
+CV_N_JOBS = -1
+MAX_EVALS = 100
 EARLY_STOP_N = 70
+HYPEROPT_BATCH_SIZE = 4
+HYPEROPT_N_JOBS = None
+HYPEROPT_SEED = 0
+HYPEROPT_PRUNING = {
+    "min_trials": 10,  # trials fitted on every fold before any are pruned
+    "min_folds": 1,  # folds fitted before a trial can be pruned
+    "tolerance": 0.01,
+}
+CALIBRATION = {
+    "mode": "ensemble",
+    "n_folds": 3,
+    "holdout_size": 1 / 3,
+}
+HYPEROPT_CALIBRATION = {
+    "mode": "holdout",
+    "n_folds": 3,
+    "holdout_size": 1 / 3,
+}
+LGBM_EARLY_STOPPING_ROUNDS = 20
 DEFAULT_PARAM_PREFIX = 'calibratedclassifiercv__estimator__'
 FEATURE_PRECISIONS = {
     "away_lon_delta": 2,
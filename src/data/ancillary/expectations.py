@@ -1,151 +1,303 @@
-"""Helper functions to calculate expected values for field position."""
+"""Helper functions to calculate expected values for field position.
 
-import pandas as pd
-from sklearn.linear_model import LinearRegression
+Expected values are also kept in a store with one table per season, fitted
+on every play through that season. Features can then use the table fitted
+strictly before each game, rather than one fitted on future seasons. Each
+table keeps the net value totals it was fitted on, so adding a season only
+scans that season's plays.
+
+Store layout::
+
+    expected-values/
+        2001.parquet
+        2002.parquet
+        ...
+"""
+
+import polars as pl
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 from src.config.config import PATHS
+from src.data.raw.plays import scan_plays
+
+
+# play-by-play columns used to fit the expected values
+EV_COLUMNS = ['posteam', 'posteam_type', 'location', 'down', 'yrdln',
+              'posteam_score', 'defteam_score', 'result']
+EV_DOWNS = (1,)  # add downs here to fit them too
 
 
-def preprocess_plays(raw_plays):
-    """Preprocess raw play-by-play data.
+def preprocess_plays(plays):
+    """Preprocess cleaned play-by-play data.
 
-    :param pd.DataFrame raw_plays: Raw play-by-play data.
+    Regular season plays with a possession team are already selected by
+    scan_plays.
+
+    :param pl.LazyFrame plays: Cleaned play-by-play data.
     :return: Preprocessed play-by-play data.
-    :rtype: pd.DataFrame
+    :rtype: pl.LazyFrame
     """
-    return (raw_plays
-            .query('posteam != "" and posteam != "None"')
-            .query('season_type == "REG"')
-            .query('location == "Home"')
-            .query('down.notnull()')
-            .query('yrdln.notnull()'))
+    return plays.filter(
+        pl.col('location') == 'Home',
+        pl.col('down').is_not_null(),
+        pl.col('yrdln').is_not_null(),
+    )
 
 
-def fix_bad_yardlines(plays):
+def fix_bad_yardlines():
     """Fix bad yardlines in play-by-play data.
-    
-    :param pd.DataFrame plays: Play-by-play data.
-    :return: New column with fixed yardlines.
-    :rtype: pd.Series
+
+    Midfield is given as '50', without a team.
+
+    :return: Fixed yardlines.
+    :rtype: pl.Expr
     """
-    return plays['yrdln'].where(plays['yrdln'] != '50', 'ZZZ 50')
+    return (
+        pl.when(pl.col('yrdln') == '50')
+        .then(pl.lit('ZZZ 50'))
+        .otherwise(pl.col('yrdln'))
+    )
 
 
-def make_posteam_results(plays):
+def make_posteam_results():
     """Make new results column where the sign of the result is relative to the
     posteam.
-    
-    :param pd.DataFrame plays: Play-by-play data.
-    :return: New column with posteam results.
-    :rtype: pd.Series
+
+    :return: Posteam results.
+    :rtype: pl.Expr
     """
-    return plays['result'].where(plays['posteam_type'] == 'home',
-                                 -plays['result'])
+    return (
+        pl.when(pl.col('posteam_type') == 'home')
+        .then(pl.col('result'))
+        .otherwise(-pl.col('result'))
+    )
 
 
-def calculate_net_value(plays):
+def calculate_net_value():
     """Calculate the net value of all the plays.
-    
-    :param pd.DataFrame plays: Play-by-play data.
-    :return: New column with net values.
-    :rtype: pd.Series
+
+    :return: Net values.
+    :rtype: pl.Expr
     """
-    return plays['posteam_result'] - (plays['posteam_score'] - plays['defteam_score'])
+    return (make_posteam_results()
+            - (pl.col('posteam_score') - pl.col('defteam_score')))
 
 
-def make_absolute_yardlines(plays):
+def make_absolute_yardlines():
     """Convert relative yardlines to absolute yardlines.
-    
+
     Yardlines in the plays data are given like 'KC 69'. This function converts
     them to absolute yardlines (i.e., 0-99).
 
-    :param pd.DataFrame plays: Play-by-play data.
-    :return: New column with absolute yardlines.
-    :rtype: pd.Series
+    :return: Absolute yardlines.
+    :rtype: pl.Expr
     """
-    yard_lines = plays['yrdln_fixed'].str.split(' ', expand=True)
-    yard_lines[1] = yard_lines[1].astype(int)
-    cond = plays['posteam'] == yard_lines[0]
-    absolute_yard_lines = yard_lines[1].where(cond, 100 - yard_lines[1])
-    return absolute_yard_lines
+    yard_lines = fix_bad_yardlines().str.split_exact(' ', 1)
+    side = yard_lines.struct.field('field_0')
+    yards = yard_lines.struct.field('field_1').cast(pl.Int64)
+    return pl.when(pl.col('posteam') == side).then(yards).otherwise(100 - yards)
 
 
-def calulate_mean_yrdln_values(plays):
+def calculate_mean_yrdln_values(plays, keys):
     """Calculate the mean net value of plays at each yardline.
-    
-    :param pd.DataFrame plays: Play-by-play data.
-    :return: Mean net value of plays at each yardline.
-    :rtype: pd.DataFrame
+
+    :param pl.LazyFrame plays: Play-by-play data.
+    :param list[str] keys: Columns to calculate separate values for.
+    :return: Mean net value of plays at each yardline, for each key.
+    :rtype: pl.LazyFrame
     """
-    return (plays
-            .groupby(['absolute_yrdln'])
-            ['net_value']
-            .mean())
-
-
-def do_regression_analysis(yrdln_values):
-    """Perform regression analysis on yardline values.
-    
-    :param pd.DataFrame yrdln_values: Yardline values.
-    :return: Predicted values.
-    :rtype: np.ndarray
+    return (
+        plays
+        .group_by(*keys, make_absolute_yardlines().alias('absolute_yrdln'))
+        .agg(calculate_net_value().mean().alias('net_value'))
+    )
+
+
+def fit_expected_values(yrdln_values, keys):
+    """Fit a line to the yardline values for each key.
+
+    The least squares slope and intercept of every key are computed in
+    closed form in one group-by.
+
+    :param pl.LazyFrame yrdln_values: Output of calculate_mean_yrdln_values.
+    :param list[str] keys: Columns to fit separate lines for.
+    :return: Yardline values with the fitted expected value.
+    :rtype: pl.LazyFrame
     """
-    regr = LinearRegression()
-    regr.fit(yrdln_values[['absolute_yrdln']], yrdln_values['net_value'])
-    return regr.predict(yrdln_values[['absolute_yrdln']])
+    x = pl.col('absolute_yrdln')
+    y = pl.col('net_value')
+    x_dev = x - x.mean()
+    slope = (x_dev * y).sum() / (x_dev * x_dev).sum()
+    fits = yrdln_values.group_by(keys).agg(
+        slope.alias('slope'),
+        (y.mean() - slope * x.mean()).alias('intercept'),
+    )
+    return (
+        yrdln_values
+        .join(fits, on=keys, how='left', nulls_equal=True)
+        .with_columns(expected_value=pl.col('intercept')
+                      + pl.col('slope') * x)
+        .drop('slope', 'intercept')
+    )
 
 
-def calculate_field_position_ev(all_plays):
+def select_ev_plays(plays, downs):
+    """Keep the plays of the downs to calculate values for.
+
+    :param pl.LazyFrame plays: Preprocessed play-by-play data.
+    :param Iterable[int] downs: Downs to calculate values for.
+    :return: Plays of those downs by a home or away posteam.
+    :rtype: pl.LazyFrame
+    """
+    return (
+        plays
+        .filter(
+            pl.col('posteam_type').is_in(['home', 'away']),
+            pl.col('down').is_in(list(downs)),
+        )
+        .with_columns(pl.col('down').cast(pl.Int64))
+    )
+
+
+def calculate_field_position_ev(plays, downs=EV_DOWNS, by=()):
     """Calculate expected values for field position.
 
-    :param pd.DataFrame all_plays: All play-by-play data.
+    The mean net value at each yardline is computed for every posteam type,
+    down and ``by`` column in a single group-by, then a line is fitted to
+    each.
+
+    :param pl.LazyFrame plays: Preprocessed play-by-play data.
+    :param Iterable[int] downs: Downs to calculate values for.
+    :param Iterable[str] by: Other columns to calculate separate values for,
+        such as season or a distance bucket.
     :return: Expected values for field position.
-    :rtype: pd.DataFrame
+    :rtype: pl.LazyFrame
     """
-    types = ['home', 'away']
-    downs = [1] # this is a list so we can add more downs later
-    grid = [(type, down) for type in types for down in downs]
-
-    for type, down in grid:
-        plays = (all_plays
-                 .query('posteam_type == @type')
-                 .query('down == @down')
-                 .assign(yrdln_fixed=fix_bad_yardlines,
-                         posteam_result=make_posteam_results,
-                         net_value=calculate_net_value,
-                         absolute_yrdln=make_absolute_yardlines))
-
-        plays = plays[['posteam', 'posteam_type', 'posteam_score', 'defteam_score',
-                      'result', 'posteam_result', 'yrdln_fixed', 'net_value',
-                      'absolute_yrdln']]
-
-        expected_values = (calulate_mean_yrdln_values(plays)
-                           .reset_index()
-                           .assign(posteam_type=type,
-                                   down=down)
-                           .assign(expected_value=do_regression_analysis))
-        yield expected_values
+    keys = ['posteam_type', 'down', *by]
+    return (
+        plays
+        .pipe(select_ev_plays, downs=downs)
+        .pipe(calculate_mean_yrdln_values, keys=keys)
+        .pipe(fit_expected_values, keys=keys)
+        .select('absolute_yrdln', 'net_value', *keys, 'expected_value')
+        .sort(*keys, 'absolute_yrdln')
+    )
+
+
+def fit_season_ev(plays, previous=None, downs=EV_DOWNS):
+    """Fit expected values through a season.
+
+    :param pl.LazyFrame plays: The season's preprocessed play-by-play data.
+    :param pl.LazyFrame previous: The table fitted through the season before,
+        or None for the first season.
+    :param Iterable[int] downs: Downs to calculate values for.
+    :return: Expected values for field position, with the net value totals
+        they were fitted on.
+    :rtype: pl.LazyFrame
+    """
+    keys = ['posteam_type', 'down']
+    totals = (
+        plays
+        .pipe(select_ev_plays, downs=downs)
+        .group_by(*keys, make_absolute_yardlines().alias('absolute_yrdln'))
+        .agg(
+            calculate_net_value().sum().alias('net_value_total'),
+            calculate_net_value().count().alias('count'),
+        )
+    )
+    if previous is not None:
+        totals = (
+            pl.concat([previous.select(totals.collect_schema().names()),
+                       totals], how='vertical_relaxed')
+            .group_by(*keys, 'absolute_yrdln')
+            .agg(pl.sum('net_value_total', 'count'))
+        )
+    return (
+        totals
+        .with_columns(net_value=pl.col('net_value_total') / pl.col('count'))
+        .pipe(fit_expected_values, keys=keys)
+        .select(*keys, 'absolute_yrdln', 'net_value', 'expected_value',
+                'net_value_total', 'count')
+        .sort(*keys, 'absolute_yrdln')
+    )
+
+
+def update_ev_store(store_path, raw_plays_path, seasons, downs=EV_DOWNS):
+    """Fit the expected values through each season not yet in the store.
+
+    Seasons up to the last one in the store are skipped, and the rest are
+    fitted in order, each from its own plays and the table before it. The
+    store has to be rebuilt from scratch to change ``downs``.
+
+    :param pathlib.Path store_path: expected value store directory
+    :param pathlib.Path raw_plays_path: play-by-play directory
+    :param Iterable[int] seasons: seasons to fit through
+    :param Iterable[int] downs: Downs to calculate values for.
+    :return: number of seasons fitted
+    :rtype: int
+    """
+    store_path.mkdir(parents=True, exist_ok=True)
+    fitted = sorted(int(path.stem) for path in store_path.glob('*.parquet'))
+    previous = None
+    if fitted:
+        previous = pl.scan_parquet(store_path / f"{fitted[-1]}.parquet")
+    n_seasons = 0
+    for season in sorted(seasons):
+        if fitted and season <= fitted[-1]:
+            continue
+        plays = (scan_plays(raw_plays_path, [season], EV_COLUMNS)
+                 .pipe(preprocess_plays))
+        table = (
+            fit_season_ev(plays, previous, downs)
+            .select(pl.lit(season, dtype=pl.Int64).alias('fit_through_season'),
+                    pl.all())
+            .collect(engine='streaming')
+        )
+        tmp_path = store_path / f"{season}.tmp"
+        table.write_parquet(tmp_path)
+        tmp_path.replace(store_path / f"{season}.parquet")
+        previous = table.lazy()
+        n_seasons += 1
+    return n_seasons
+
+
+def scan_ev_store(store_path):
+    """Lazily scan the expected value store.
+
+    :param pathlib.Path store_path: expected value store directory
+    :return: expected values keyed by fit_through_season, posteam_type, down
+        and absolute_yrdln
+    :rtype: pl.LazyFrame
+    """
+    return pl.scan_parquet(store_path / '*.parquet')
 
 
 if __name__ == '__main__':
     raw_plays_path = PATHS['raw_plays']
     expected_values_path = PATHS['expected_values']
+    expected_values_store_path = PATHS['expected_values_store']
 
-    all_plays = pd.DataFrame()
-    seasons = list(range(2001, 2025))
-    all_plays = pd.concat([pd.read_parquet(raw_plays_path / f"play_by_play_{season}.parquet")
-                           for season in seasons])
-    all_plays = preprocess_plays(all_plays)
-
-    expected_values = pd.concat(calculate_field_position_ev(all_plays))
-    expected_values.to_csv(expected_values_path, index=False)
+    seasons = range(2001, 2025)
+    n_seasons = update_ev_store(expected_values_store_path, raw_plays_path,
+                                seasons)
+    print(f"Fitted expected values through {n_seasons} new seasons")
+    # the table fitted through the last season covers every season's plays
+    expected_values = (
+        scan_ev_store(expected_values_store_path)
+        .filter(pl.col('fit_through_season') == max(seasons))
+        .select('absolute_yrdln', 'net_value', 'posteam_type', 'down',
+                'expected_value')
+        .sort('posteam_type', 'down', 'absolute_yrdln')
+        .collect()
+    )
+    expected_values.write_csv(expected_values_path)
 
+    plot_data = expected_values.to_pandas()
     fig, ax = plt.subplots()
-    sns.scatterplot(data=expected_values, x='absolute_yrdln', y='net_value',
+    sns.scatterplot(data=plot_data, x='absolute_yrdln', y='net_value',
                     hue='posteam_type', ax=ax)
-    sns.lineplot(data=expected_values, x='absolute_yrdln', y='expected_value',
+    sns.lineplot(data=plot_data, x='absolute_yrdln', y='expected_value',
                  hue='posteam_type', ax=ax)
     plt.tight_layout()
     plt.show()
@@ -1,11 +1,21 @@
 """"""
 
+import argparse
 import os
 import sqlite3
 
 import polars as pl
 
-from src.utils import shift_week_number
+from src.data.cache import FeatureCache
+from src.data.features.pythag_exp import add_log5_features
+from src.data.features.qb_stats import add_qb_rating_net
+from src.data.incremental import (materialise_team_features,
+                                  read_state,
+                                  scan_team_features)
+from src.data.pfr.store import has_table, pfr_season, scan_parquet_store
+from src.utils import (combine_team_features,
+                       join_to_home_and_away,
+                       make_team_week_index)
 
 
 pl.Config.set_tbl_formatting("ASCII_MARKDOWN")
@@ -138,18 +148,87 @@ def fix_pfr_team_names(df):
     )
 
 
+def assemble_features(games, team_features):
+    """Join every team feature table to the games.
+
+    The tables are combined into one keyed by team and week first, so the
+    games are only joined once for the obj team and once for the adv team,
+    however many features there are.
+
+    :param pl.LazyFrame games: The games dataframe.
+    :param Iterable[pl.LazyFrame] team_features: team feature tables keyed
+        by team, season and week
+    :return: A games dataframe with the team features added.
+    :rtype: pl.LazyFrame
+    """
+    return (
+        join_to_home_and_away(games, combine_team_features(team_features),
+                              drop_swt=False)
+        .pipe(add_log5_features)
+        .pipe(add_qb_rating_net)
+    )
+
+
+def load_boxscore_table(name, boxscore_store_path, boxscore_stats_path,
+                        min_season=None):
+    """Lazily load a boxscore table.
+
+    Reads from the parquet store when it holds the table, so that the season
+    filter prunes whole partitions and only the columns used downstream are
+    read. Falls back to reading the whole table from the SQLite database.
+
+    :param str name: table name
+    :param pathlib.Path boxscore_store_path: parquet store directory
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :param int min_season: earliest season to load. Loads every season if
+        None.
+    :return: the boxscore table
+    :rtype: pl.LazyFrame
+    """
+    if has_table(boxscore_store_path, name):
+        table = scan_parquet_store(boxscore_store_path, name)
+    else:
+        with sqlite3.connect(boxscore_stats_path) as conn:
+            table = (
+                pl.read_database(
+                    query=f"select * from {name}",
+                    connection=conn,
+                    infer_schema_length=None,
+                )
+                .lazy()
+                .with_columns(pfr_season())
+            )
+    if min_season is not None:
+        table = table.filter(pl.col('season') >= min_season)
+    return table.drop('season')
+
+
 if __name__ == '__main__':
     from src.data.raw.games import refresh_games_data
-    from src.data.features.play_stats import build_play_stats_features
-    from src.data.features.pythag_exp import build_pythag_features
-    from src.data.features.qb_stats import build_qb_stats_features
+    from src.data.features.play_stats import build_play_stats_team_features
+    from src.data.features.pythag_exp import build_pythag_team_features
+    from src.data.features.qb_stats import build_starter_qbr
     from src.config.config import (TRAINING,
                                    RAW_DATA_URLS,
-                                   PATHS)
+                                   PATHS,
+                                   FEATURE_CACHE)
+
+    parser = argparse.ArgumentParser(
+        description="Build training and testing datasets."
+    )
+    parser.add_argument('--force', action='store_true',
+                        help="recompute every feature, ignoring the cache")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only compute features for weeks added since "
+                             "the last incremental build")
+    args = parser.parse_args()
 
     raw_games_path = PATHS['raw_games']
     boxscore_stats_path = PATHS['boxscore_stats']
+    boxscore_store_path = PATHS['boxscore_store']
     train_db_path = PATHS['train_db']
+    feature_cache_path = PATHS['feature_cache']
+    team_features_path = PATHS['team_features']
     min_year = TRAINING['min_year']
     holdout_year_start = TRAINING['holdout_year_start']
     games_url = RAW_DATA_URLS['games']
@@ -165,67 +244,84 @@ if __name__ == '__main__':
     games = transform_home_away(games)
     posteam_defteam_map = get_posteam_defteam_map(games)
     scores = get_game_outcomes(games)
-    with sqlite3.connect(boxscore_stats_path) as conn:
-        player_offense = (
-            pl.read_database(
-                query="select * from player_offense",
-                connection=conn,
-            )
-            .lazy()
-            .pipe(fix_pfr_team_names)
-            .join(
-                posteam_defteam_map,
-                left_on=['pfr', 'team'],
-                right_on=['pfr', 'posteam'],
-                how='left'
-            )
-            .rename({'team': 'posteam'})
+    # player stats roll across seasons, so every season is loaded unless an
+    # incremental build has kept the rows still inside the rolling windows
+    last_week = None
+    if args.incremental and not args.force:
+        last_week = read_state(team_features_path)
+    if last_week is None:
+        player_min_season, min_season = None, min_year
+    else:
+        # the season before is kept for the league QB rating
+        player_min_season = last_week[0] - 1
+        min_season = max(min_year, last_week[0])
+    player_offense = (
+        load_boxscore_table('player_offense', boxscore_store_path,
+                            boxscore_stats_path,
+                            min_season=player_min_season)
+        .pipe(fix_pfr_team_names)
+        .join(
+            posteam_defteam_map,
+            left_on=['pfr', 'team'],
+            right_on=['pfr', 'posteam'],
+            how='left'
         )
-        drives = (
-            pl.read_database(
-                query="select * from drives",
-                connection=conn,
-            )
-            .lazy()
-            .pipe(fix_pfr_team_names)
-            .join(
-                posteam_defteam_map,
-                left_on=['pfr', 'team'],
-                right_on=['pfr', 'posteam'],
-                how='left'
-            )
-            .rename({'team': 'posteam'})
+        .rename({'team': 'posteam'})
+    )
+    drives = (
+        load_boxscore_table('drives', boxscore_store_path,
+                            boxscore_stats_path, min_season=min_season)
+        .pipe(fix_pfr_team_names)
+        .join(
+            posteam_defteam_map,
+            left_on=['pfr', 'team'],
+            right_on=['pfr', 'posteam'],
+            how='left'
         )
-        starters = (
-            pl.read_database(
-                query="select * from starters",
-                connection=conn,
-                infer_schema_length=None,
-            )
-            .lazy()
-            .pipe(fix_pfr_team_names)
-            .join(
-                posteam_defteam_map,
-                left_on=['pfr', 'team'],
-                right_on=['pfr', 'posteam'],
-                how='left'
-            )
-            .rename({'team': 'posteam'})
+        .rename({'team': 'posteam'})
+    )
+    starters = (
+        load_boxscore_table('starters', boxscore_store_path,
+                            boxscore_stats_path, min_season=min_season)
+        .pipe(fix_pfr_team_names)
+        .join(
+            posteam_defteam_map,
+            left_on=['pfr', 'team'],
+            right_on=['pfr', 'posteam'],
+            how='left'
         )
+        .rename({'team': 'posteam'})
+    )
 
 
     print('Building features...')
-    features = (
-        games
-        .select(
-            'game_id', 'season', 'week', 'obj_team', 'adv_team', 'result',
-            'obj_team_is_home',
-            rest_net=pl.col('obj_rest') - pl.col('adv_rest')
+    features = games.select(
+        'game_id', 'season', 'week', 'obj_team', 'adv_team', 'result',
+        'obj_team_is_home',
+        rest_net=pl.col('obj_rest') - pl.col('adv_rest')
+    )
+    if args.incremental:
+        n_weeks = materialise_team_features(
+            team_features_path, drives, scores, player_offense, starters,
+            full=args.force,
         )
-        .pipe(build_play_stats_features, drives=drives)
-        .pipe(build_pythag_features, scores=scores)
-        .pipe(build_qb_stats_features, player_offense=player_offense,
-              starters=starters)
+        print(f"Materialised {n_weeks} new weeks of team features")
+        team_features = scan_team_features(team_features_path)
+    else:
+        cache = FeatureCache(feature_cache_path, force=args.force,
+                             **FEATURE_CACHE)
+        team_weeks = make_team_week_index(scores).collect().lazy()
+        team_features = {
+            'play_stats': cache.wrap(build_play_stats_team_features)(
+                drives, team_weeks),
+            'pythag': cache.wrap(build_pythag_team_features)(
+                scores, team_weeks=team_weeks),
+            'starter_qbr': cache.wrap(build_starter_qbr)(player_offense,
+                                                         starters),
+        }
+    features = (
+        features
+        .pipe(assemble_features, team_features.values())
         .pipe(reduce_games, min_year=min_year)
         .sort('game_id')
     )
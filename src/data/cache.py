@@ -0,0 +1,160 @@
+"""Content-hash cache for the feature builders in build.py.
+
+A feature builder's output is keyed by a hash of its inputs and of its code:
+the source of the builder's module plus every ``src`` module it depends on.
+Outputs are stored as parquet, so a rebuild where neither the data nor the
+feature code has changed reads the feature back instead of recomputing it.
+Changing one feature only invalidates that feature.
+
+Entries are evicted least-recently-used first once the cache holds more than
+``max_entries`` of them.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import sys
+
+import polars as pl
+
+
+HASH_SEEDS = {'seed': 0, 'seed_1': 1, 'seed_2': 2, 'seed_3': 3}
+
+
+def fingerprint_frame(frame):
+    """Hash the schema and contents of a frame.
+
+    :param Union[pl.DataFrame, pl.LazyFrame] frame: frame to hash
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    if isinstance(frame, pl.LazyFrame):
+        frame = frame.collect()
+    digest = hashlib.sha256(str(frame.schema).encode())
+    if frame.height:
+        digest.update(frame.hash_rows(**HASH_SEEDS).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def get_source_modules(func):
+    """Get the ``src`` modules a function depends on.
+
+    Walks the globals of the function's module, and of every ``src`` module
+    found there, so that a change to a shared helper (e.g. scaler.py or
+    utils.py) invalidates every feature that uses it.
+
+    :param callable func: function
+    :return: modules, sorted by name
+    :rtype: list[module]
+    """
+    modules = {}
+    stack = [inspect.getmodule(func)]
+    while stack:
+        module = stack.pop()
+        if module is None or module.__name__ in modules:
+            continue
+        modules[module.__name__] = module
+        for value in vars(module).values():
+            dependency = value if inspect.ismodule(value) else inspect.getmodule(value)
+            if (dependency is not None
+                    and dependency.__name__.startswith('src.')
+                    and dependency.__name__ not in modules):
+                stack.append(dependency)
+    return [modules[name] for name in sorted(modules)]
+
+
+def fingerprint_code(func):
+    """Hash the source of a function's module and its ``src`` dependencies.
+
+    :param callable func: function
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(func.__qualname__.encode())
+    for module in get_source_modules(func):
+        digest.update(module.__name__.encode())
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+def fingerprint_value(value):
+    """Hash a builder argument.
+
+    :param object value: frame or plain value
+    :return: hex digest
+    :rtype: str
+    """
+    if isinstance(value, (pl.DataFrame, pl.LazyFrame)):
+        return fingerprint_frame(value)
+    return hashlib.sha256(repr(value).encode()).hexdigest()
+
+
+class FeatureCache:
+    """Parquet cache for feature builder outputs.
+
+    :param pathlib.Path path: cache directory
+    :param int max_entries: max number of cached outputs to keep
+    :param bool force: recompute every feature, overwriting cached outputs
+    """
+
+    def __init__(self, path, max_entries=32, force=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.force = force
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, builder, args, kwargs):
+        """Make the cache key for a builder call.
+
+        :param callable builder: feature builder
+        :param tuple args: positional arguments
+        :param dict kwargs: keyword arguments
+        :return: sha256 hex digest
+        :rtype: str
+        """
+        digest = hashlib.sha256(fingerprint_code(builder).encode())
+        digest.update(f"{sys.version_info[:2]}{pl.__version__}".encode())
+        for value in args:
+            digest.update(fingerprint_value(value).encode())
+        for name in sorted(kwargs):
+            digest.update(name.encode())
+            digest.update(fingerprint_value(kwargs[name]).encode())
+        return digest.hexdigest()
+
+    def evict(self):
+        """Delete the least recently used outputs beyond ``max_entries``.
+
+        :return: None
+        :rtype: None
+        """
+        entries = sorted(self.path.glob('*.parquet'),
+                         key=lambda p: p.stat().st_mtime_ns,
+                         reverse=True)
+        for path in entries[self.max_entries:]:
+            path.unlink(missing_ok=True)
+
+    def wrap(self, builder):
+        """Wrap a feature builder so that its output is cached.
+
+        :param callable builder: feature builder that returns a frame
+        :return: cached feature builder, which returns a LazyFrame
+        :rtype: callable
+        """
+        @functools.wraps(builder)
+        def cached_builder(*args, **kwargs):
+            key = self.make_key(builder, args, kwargs)
+            path = self.path / f"{builder.__name__}-{key[:32]}.parquet"
+            if path.exists() and not self.force:
+                print(f"Using cached {builder.__name__}")
+                os.utime(path)
+                return pl.scan_parquet(path)
+            output = builder(*args, **kwargs)
+            if isinstance(output, pl.LazyFrame):
+                output = output.collect()
+            tmp_path = path.with_suffix('.tmp')
+            output.write_parquet(tmp_path)
+            os.replace(tmp_path, path)
+            self.evict()
+            return output.lazy()
+        return cached_builder
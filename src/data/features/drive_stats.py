@@ -5,8 +5,17 @@ import sqlite3
 
 import polars as pl
 
+from src.data.ancillary.expectations import scan_ev_store
 from src.data.features.scaler import build_adjusted_features
-from src.utils import shift_week_number, join_to_home_and_away
+from src.data.raw.plays import scan_plays
+from src.utils import (join_to_home_and_away,
+                       lag_team_features,
+                       make_team_week_index)
+
+
+# play-by-play columns used by extract_drive_points
+DRIVE_COLUMNS = ['season', 'week', 'posteam', 'defteam', 'posteam_type',
+                 'fixed_drive', 'fixed_drive_result', 'yardline_100']
 
 
 def get_drive_result():
@@ -21,13 +30,27 @@ def get_drive_result():
 def extract_drive_points(plays, expected_values):
     """Extract the results for all drives.
 
+    Each drive is valued against the expected values fitted through the
+    season before its game, so drives in the first season of the store are
+    left out.
+
     Example output:
 
 
     :param pl.DataFrame plays: The plays DataFrame.
+    :param pl.LazyFrame expected_values: The expected value store, from
+        scan_ev_store.
     :return: The results for all drives.
     :rtype: pl.DataFrame
     """
+    # drives start on a first down
+    first_down_values = (
+        expected_values
+        .filter(pl.col('down') == 1)
+        .select('fit_through_season', 'posteam_type', 'absolute_yrdln',
+                'expected_value')
+        .sort('fit_through_season')
+    )
     return (
         plays.group_by(
             ['season', 'week', 'posteam', 'fixed_drive']
@@ -37,13 +60,20 @@ def extract_drive_points(plays, expected_values):
             pl.first('yardline_100', 'posteam_type', 'defteam')
         )
         .with_columns(
-            absolute_yrdln=(100 - pl.col('yardline_100')).cast(pl.Int32),
+            pl.col('season').cast(pl.Int64),
+            absolute_yrdln=(100 - pl.col('yardline_100')).cast(pl.Int64),
         )
-        .join(
-            expected_values,
-            on=['absolute_yrdln', 'posteam_type'],
-            how='left'
+        .sort('season')
+        .join_asof(
+            first_down_values,
+            left_on='season',
+            right_on='fit_through_season',
+            by=['posteam_type', 'absolute_yrdln'],
+            strategy='backward',
+            allow_exact_matches=False,
+            check_sortedness=False,
         )
+        .filter(pl.col('expected_value').is_not_null())
         .with_columns(
             exp_points_drive=pl.col('points_drive') - pl.col('expected_value'),
         )
@@ -68,7 +98,7 @@ def build_drive_stats_features(plays, expected_values, game_id_map):
     )
     features = (
         raw_features
-        .pipe(shift_week_number)
+        .pipe(lag_team_features, make_team_week_index(game_id_map))
         .pipe(join_to_home_and_away, games=game_id_map)
         # .select(
             # 'game_id',
@@ -85,16 +115,13 @@ def build_drive_stats_features(plays, expected_values, game_id_map):
 
 if __name__ == '__main__':
     from src.config.config import PATHS
-    from src.data.build import clean_plays
 
     raw_plays_path = PATHS['raw_plays']
-    expected_values = PATHS['expected_values']
+    expected_values_store_path = PATHS['expected_values_store']
 
     seasons = range(2001, 2025)
-    paths = [raw_plays_path / f'play_by_play_{season}.parquet' for season in seasons]
-    raw_plays = pl.concat([pl.scan_parquet(p) for p in paths],
-                          how='vertical_relaxed')
-    plays = clean_plays(raw_plays)
-    expected_values = pl.scan_csv(expected_values)
+    plays = scan_plays(raw_plays_path, seasons, DRIVE_COLUMNS)
+    expected_values = scan_ev_store(expected_values_store_path)
 
     drive_points = extract_drive_points(plays, expected_values)
+    print(drive_points.collect(engine='streaming'))
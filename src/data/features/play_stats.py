@@ -3,33 +3,61 @@
 import polars as pl
 
 from src.data.features.scaler import build_adjusted_features
-from src.utils import shift_week_number, join_to_home_and_away
+from src.utils import (join_to_home_and_away,
+                       lag_team_features,
+                       make_team_week_index)
 
 
-def build_play_stats_features(games, drives):
-    """Builds play statistics features for NFL games.
+# per-play stats, totalled over each team's drives in a game
+PLAY_STATS = {
+    'yards_play': pl.sum('Net Yds'),
+}
+
+
+def build_play_stats_team_features(drives, team_weeks):
+    """Builds opponent-adjusted play statistics for each team and week.
 
-    :param pl.LazyFrame games: LazyFrame containing game data.
     :param pl.LazyFrame drives: LazyFrame containing drive data.
-    :return: LazyFrame with play statistics features added.
+    :param pl.LazyFrame team_weeks: output of make_team_week_index
+    :return: LazyFrame with one row per team and week, holding the stats
+        through the team's previous game.
     :rtype: pl.LazyFrame
     """
     stats = (
         drives
         .group_by('posteam', 'season', 'week', 'defteam')
         .agg(
-            pl.sum('Net Yds').alias('yards_play'),
+            *(stat.alias(name) for name, stat in PLAY_STATS.items()),
             pl.sum('Plays').alias('count'),
         )
     )
-    for feature_name in ['yards_play']:
-        feature = (
-            stats
-            .select(
-                'posteam', 'season', 'week', 'defteam', feature_name, 'count'
-            )
-            .pipe(build_adjusted_features)
-            .pipe(shift_week_number)
-        )
-        games = join_to_home_and_away(games, feature, drop_swt=False)
-    return games
+    return (
+        stats
+        .pipe(build_adjusted_features, stat_names=list(PLAY_STATS))
+        .pipe(lag_team_features, team_weeks)
+    )
+
+
+def join_play_stats_features(games, team_features):
+    """Joins team play statistics to the teams in each game.
+
+    :param pl.LazyFrame games: LazyFrame containing game data.
+    :param pl.LazyFrame team_features: LazyFrame from
+        build_play_stats_team_features.
+    :return: LazyFrame with play statistics features added.
+    :rtype: pl.LazyFrame
+    """
+    return join_to_home_and_away(games, team_features, drop_swt=False)
+
+
+def build_play_stats_features(games, drives):
+    """Builds play statistics features for NFL games.
+
+    :param pl.LazyFrame games: LazyFrame containing game data.
+    :param pl.LazyFrame drives: LazyFrame containing drive data.
+    :return: LazyFrame with play statistics features added.
+    :rtype: pl.LazyFrame
+    """
+    team_weeks = make_team_week_index(games)
+    team_features = build_play_stats_team_features(drives, team_weeks)
+    return join_play_stats_features(games, team_features)
@@ -1,11 +1,14 @@
 """"""
 
-import sqlite3
-
 import polars as pl
 
-from src.data.features.scaler import build_adjusted_features
-from src.utils import shift_week_number, join_to_home_and_away
+from src.utils import (join_to_home_and_away,
+                       lag_team_features,
+                       make_team_week_index,
+                       rolling_total)
+
+
+PYEXP_EXPONENT = 2.77
 
 
 def get_points_for_against(scores):
@@ -31,40 +34,70 @@ def get_points_for_against(scores):
     )
 
 
-def roll_points_for_against(team_scores):
-    """Calculates rolling points for and against over a specified period.
+def get_window_suffix(window):
+    """Get the column suffix for a rolling window.
+
+    :param int window: number of games, or None for the season so far
+    :return: column suffix
+    :rtype: str
+    """
+    return "" if window is None else f"_{window}g"
+
+
+def get_pyexp_name(window, exponent):
+    """Get the column name of a Pythagorean expectation variant.
+
+    The season-to-date variant with the default exponent is just 'pyexp'.
+
+    :param int window: number of games, or None for the season so far
+    :param float exponent: Pythagorean exponent
+    :return: column name
+    :rtype: str
+    """
+    name = f"pyexp{get_window_suffix(window)}"
+    if exponent != PYEXP_EXPONENT:
+        name += f"_e{exponent:g}".replace('.', 'p')
+    return name
+
+
+def roll_points_for_against(team_scores, windows=(None,)):
+    """Calculates rolling points for and against over a set of windows.
+
+    Every window is a difference of cumulative sums within a team's season,
+    so all of them come out of one pass.
 
     :param pl.LazyFrame team_scores: Polars LazyFrame containing team scores.
-    :return: Rolling points for and against.
+    :param Iterable[int] windows: numbers of games, or None for the season
+        so far
+    :return: Rolling points for and against, with a points_for{suffix} and
+        points_against{suffix} column per window.
     :rtype: pl.LazyFrame
     """
-    rolling_team_scores = (
+    by = ['obj_team', 'season']
+    return (
         team_scores
         .sort('obj_team', 'season', 'week')
-        .with_row_index('index')
-        .rolling(
-            index_column='index',
-            group_by=['obj_team', 'season'],
-            period='99i',
-        )
-        .agg(
-            pl.col('week').last(),
-            pl.col('obj_score').sum().alias('points_for'),
-            pl.col('adv_score').sum().alias('points_against'),
+        .select(
+            'obj_team', 'season', 'week',
+            *(rolling_total(col, by, window)
+              .alias(f"{name}{get_window_suffix(window)}")
+              for window in windows
+              for col, name in [('obj_score', 'points_for'),
+                                ('adv_score', 'points_against')]),
         )
-        .sort('index')
-        .select('obj_team', 'season', 'week', 'points_for', 'points_against')
     )
-    return rolling_team_scores
 
 
-def calculate_pyexp_stats(points, period='99i', suffix=""):
+def calculate_pyexp_stats(points, windows=(None,),
+                          exponents=(PYEXP_EXPONENT,)):
     """Calculates Pythagorean expectation statistics.
 
-    :param pl.LazyFrame points: Polars LazyFrame containing points data.
-    :param str period: Rolling period for aggregation.
-    :param str suffix: Optional suffix for the resulting column names.
-    :return: Pythagorean expectation statistics.
+    :param pl.LazyFrame points: Polars LazyFrame from
+        roll_points_for_against.
+    :param Iterable[int] windows: windows to use, from those in ``points``
+    :param Iterable[float] exponents: Pythagorean exponents
+    :return: Pythagorean expectation statistics, one column per window and
+        exponent.
     :rtype: pl.LazyFrame
     """
     return (
@@ -72,7 +105,10 @@ def calculate_pyexp_stats(points, period='99i', suffix=""):
         .select(
             pl.col('obj_team').alias('team'),
             pl.col('season', 'week'),
-            (1 / (1 + (pl.col('points_against') / pl.col('points_for')).pow(2.77))).alias(f'pyexp{suffix}'),
+            *((1 / (1 + (pl.col(f'points_against{get_window_suffix(w)}')
+                         / pl.col(f'points_for{get_window_suffix(w)}')).pow(x)))
+              .alias(get_pyexp_name(w, x))
+              for w in windows for x in exponents),
         )
     )
 
@@ -110,23 +146,70 @@ def convert_to_log5(games, feature_name):
     )
 
 
-def build_pythag_features(games, scores):
+def build_pythag_team_features(scores, windows=(None,),
+                               exponents=(PYEXP_EXPONENT,), team_weeks=None):
+    """Builds Pythagorean expectation for each team and week.
+
+    :param pl.LazyFrame scores: Polars LazyFrame containing scores data.
+    :param Iterable[int] windows: numbers of games, or None for the season
+        so far
+    :param Iterable[float] exponents: Pythagorean exponents
+    :param pl.LazyFrame team_weeks: output of make_team_week_index. Indexed
+        from ``scores`` if None.
+    :return: Pythagorean expectation through each team's previous game, one
+        column per window and exponent.
+    :rtype: pl.LazyFrame
+    """
+    team_points = get_points_for_against(scores)
+    rolling_team_points = roll_points_for_against(team_points, windows)
+    pyexps = calculate_pyexp_stats(rolling_team_points, windows, exponents)
+    if team_weeks is None:
+        team_weeks = make_team_week_index(scores)
+    return pyexps.pipe(lag_team_features, team_weeks)
+
+
+def add_log5_features(games):
+    """Replaces every joined Pythagorean expectation with its log5 feature.
+
+    :param pl.LazyFrame games: Games with pyexp{suffix}_obj and
+        pyexp{suffix}_adv columns.
+    :return: Games DataFrame with a log5 feature per Pythagorean expectation
+        column.
+    :rtype: pl.LazyFrame
+    """
+    for name in games.collect_schema().names():
+        if name.startswith('pyexp') and name.endswith('_obj'):
+            games = convert_to_log5(games, name.removesuffix('_obj'))
+    return games
+
+
+def join_pythag_features(games, team_features):
+    """Joins team Pythagorean expectation to each game as log5 features.
+
+    :param pl.LazyFrame games: Polars LazyFrame containing game data.
+    :param pl.LazyFrame team_features: LazyFrame from
+        build_pythag_team_features.
+    :return: Games DataFrame with a log5 feature per Pythagorean expectation
+        column.
+    :rtype: pl.LazyFrame
+    """
+    return (
+        join_to_home_and_away(games, team_features, drop_swt=False)
+        .pipe(add_log5_features)
+    )
+
+
+def build_pythag_features(games, scores, windows=(None,),
+                          exponents=(PYEXP_EXPONENT,)):
     """Builds Pythagorean expectation features for NFL games.
 
     :param pl.LazyFrame games: Polars LazyFrame containing game data.
     :param pl.LazyFrame scores: Polars LazyFrame containing scores data.
-    :param pl.LazyFrame drives: Polars LazyFrame containing drives data.
+    :param Iterable[int] windows: numbers of games, or None for the season
+        so far
+    :param Iterable[float] exponents: Pythagorean exponents
     :return: Games DataFrame with Pythagorean expectation features added.
     :rtype: pl.LazyFrame
     """
-    team_points = get_points_for_against(scores)
-    rolling_team_points = roll_points_for_against(team_points)
-    pyexps = calculate_pyexp_stats(rolling_team_points)
-    for f in [(pyexps, "pyexp")]:
-        feature = (
-            f[0]
-            .pipe(shift_week_number)
-        )
-        games = join_to_home_and_away(games, feature, drop_swt=False)
-        games = convert_to_log5(games, f[1])
-    return games
+    team_features = build_pythag_team_features(scores, windows, exponents)
+    return join_pythag_features(games, team_features)
@@ -1,32 +1,123 @@
 """"""
 import polars as pl
 
-from src.utils import join_to_home_and_away
+from src.utils import join_to_home_and_away, rolling_total
 
 
-def make_rolling_qb_data(player_offense):
-    """"""
-    return (
+QB_WINDOW = 50  # passing games in each QB's rolling window
+QB_STATS = ['completions', 'pass_attempts', 'pass_yards', 'pass_td',
+            'interceptions']
+
+
+def get_game_date():
+    """Get the date of a game from its pfr game ID, e.g. '202409050kan'.
+
+    :return: game date expression
+    :rtype: pl.Expr
+    """
+    return pl.col('pfr').str.slice(0, 8).str.to_date('%Y%m%d').alias('game_date')
+
+
+def get_qb_window_suffix(window, unit='games'):
+    """Get the column suffix for a QB rolling window.
+
+    The default window of QB_WINDOW games has no suffix.
+
+    :param int window: window length
+    :param str unit: 'games' or 'attempts'
+    :return: column suffix
+    :rtype: str
+    """
+    if unit == 'games':
+        return "" if window == QB_WINDOW else f"_{window}g"
+    return f"_{window}att"
+
+
+def make_rolling_qb_data(player_offense, game_windows=(QB_WINDOW,),
+                         attempt_windows=()):
+    """Get each QB's passing totals over trailing windows.
+
+    Totals are differences of per-player prefix sums. A game window covers a
+    QB's last N passing games. An attempt window covers his fewest most
+    recent games with at least N attempts between them, found by an as-of
+    join on the prefix sum of attempts.
+
+    :param pl.LazyFrame player_offense: player offense stats
+    :param Iterable[int] game_windows: numbers of games
+    :param Iterable[int] attempt_windows: numbers of attempts
+    :return: one row per QB and passing game, with a {stat}{suffix} column
+        per stat and window
+    :rtype: pl.LazyFrame
+    """
+    passing = (
         player_offense
         .filter(pl.col('pass_attempts') > 0)
-        .sort('player', 'season', 'week')
-        .with_row_index('index')
-        .rolling(
-            index_column='index',
-            group_by=['player'],
-            period='50i'
-        )
-        .agg(
-            pl.col('completions').sum(),
-            pl.col('pass_attempts').sum(),
-            pl.col('pass_yards').sum(),
-            pl.col('pass_td').sum(),
-            pl.col('interceptions').sum(),
-            pl.col('pfr').last(),
-            pl.col('season').last(),
-            pl.col('week').last(),
-        )
+        .select('player', 'pfr', 'season', 'week', *QB_STATS)
+        .with_columns(get_game_date())
+        .sort('player', 'game_date')
+    )
+    rolling = passing.select(
+        'player', 'pfr', 'season', 'week', 'game_date',
+        *(rolling_total(stat, ['player'], window)
+          .alias(f"{stat}{get_qb_window_suffix(window)}")
+          for window in game_windows for stat in QB_STATS),
     )
+    if attempt_windows:
+        prefix = passing.select(
+            'player', 'game_date',
+            *(rolling_total(stat, ['player'], None).alias(f"cum_{stat}")
+              for stat in QB_STATS),
+        )
+        window_starts = prefix.select(
+            'player', pl.col('cum_pass_attempts').alias('start_attempts'),
+            *(pl.col(f"cum_{stat}").alias(f"start_{stat}") for stat in QB_STATS),
+        ).sort('start_attempts')
+        for window in attempt_windows:
+            suffix = get_qb_window_suffix(window, 'attempts')
+            totals = (
+                prefix
+                .with_columns(
+                    start_attempts=pl.col('cum_pass_attempts') - window
+                )
+                .sort('start_attempts')
+                .join_asof(
+                    window_starts,
+                    on='start_attempts',
+                    by='player',
+                    strategy='backward',
+                    check_sortedness=False,
+                )
+                .select(
+                    'player', 'game_date',
+                    *((pl.col(f"cum_{stat}")
+                       - pl.col(f"start_{stat}").fill_null(0))
+                      .alias(f"{stat}{suffix}")
+                      for stat in QB_STATS),
+                )
+            )
+            rolling = rolling.join(totals, on=['player', 'game_date'],
+                                   how='left')
+    return rolling
+
+
+def passer_rating(suffix=""):
+    """Calculate the NFL passer rating from passing totals.
+
+    :param str suffix: suffix of the passing total columns
+    :return: passer rating expression
+    :rtype: pl.Expr
+    """
+    completions = pl.col(f"completions{suffix}")
+    attempts = pl.col(f"pass_attempts{suffix}")
+    yards = pl.col(f"pass_yards{suffix}")
+    touchdowns = pl.col(f"pass_td{suffix}")
+    interceptions = pl.col(f"interceptions{suffix}")
+    # passer rating components
+    a = (((completions / attempts) - 0.3) * 5).clip(0, 2.375)
+    b = (((yards / attempts) - 3) * 0.25).clip(0, 2.375)
+    c = ((touchdowns / attempts) * 20).clip(0, 2.375)
+    d = ((2.375 - (interceptions / attempts) * 25)).clip(0, 2.375)
+    return (((a + b + c + d) / 6) * 100).round(1)
 
 
 def make_rolling_team_data(player_offense):
@@ -65,45 +156,100 @@ def make_rolling_team_data(player_offense):
 
 def calculate_qbr(passer_data):
     """"""
+    return passer_data.with_columns(qb_rating=passer_rating())
+
+
+def make_league_qbr(player_offense):
+    """Get the league's passer rating over the previous season.
+
+    Used for starters without a previous passing game.
+
+    :param pl.LazyFrame player_offense: player offense stats, including the
+        season before any season the rating is needed for
+    :return: league passer rating for each season
+    :rtype: pl.LazyFrame
+    """
     return (
-        passer_data
-        .with_columns( # passer rating components
-            a=(((pl.col('completions') / pl.col('pass_attempts')) - 0.3) * 5).clip(0, 2.375),
-            b=(((pl.col('pass_yards') / pl.col('pass_attempts')) - 3) * 0.25).clip(0, 2.375),
-            c=((pl.col('pass_td') / pl.col('pass_attempts')) * 20).clip(0, 2.375),
-            d=((2.375 - (pl.col('interceptions') / pl.col('pass_attempts')) * 25)).clip(0, 2.375),
-        )
-        .with_columns(
-            qb_rating=(((pl.col('a') + pl.col('b') + pl.col('c') + pl.col('d')) / 6) * 100).round(1)
+        player_offense
+        .filter(pl.col('pass_attempts') > 0)
+        .group_by('season')
+        .agg(pl.col(QB_STATS).sum())
+        .select(
+            pl.col('season') + 1,
+            passer_rating().alias('league_qbr'),
         )
     )
 
 
-def build_starter_qbr(player_offense, starters):
-    """"""
-    return (
-        make_rolling_qb_data(player_offense)
-        .pipe(calculate_qbr)
-        .sort('player', 'season', 'week')
-        .with_columns(
-            pl.exclude('player', 'pfr', 'season', 'week').shift(1).over(["player"]),
+def make_starter_qbr(player_offense, starters, league_qbr,
+                     game_windows=(QB_WINDOW,), attempt_windows=()):
+    """Get each starting QB's rolling passer rating going into a game.
+
+    Each starter is as-of joined to his latest passing game before the game
+    date. Starters without one get the league's rating from the previous
+    season.
+
+    :param pl.LazyFrame player_offense: player offense stats
+    :param pl.LazyFrame starters: starters, with the QB in QB_1
+    :param pl.LazyFrame league_qbr: output of make_league_qbr
+    :param Iterable[int] game_windows: numbers of games
+    :param Iterable[int] attempt_windows: numbers of attempts
+    :return: a starter_qbr{suffix} column per window, for each team and week
+    :rtype: pl.LazyFrame
+    """
+    suffixes = [
+        *(get_qb_window_suffix(w) for w in game_windows),
+        *(get_qb_window_suffix(w, 'attempts') for w in attempt_windows),
+    ]
+    ratings = (
+        make_rolling_qb_data(player_offense, game_windows, attempt_windows)
+        .select(
+            'player', 'game_date',
+            *(passer_rating(suffix).alias(f"starter_qbr{suffix}")
+              for suffix in suffixes),
         )
-        .join(
-            starters,
-            left_on=['player', 'pfr'],
-            right_on=['QB_1', 'pfr'],
-            how='right',
+        .sort('game_date')
+    )
+    return (
+        starters
+        .with_columns(get_game_date())
+        .sort('game_date')
+        .join_asof(
+            ratings,
+            on='game_date',
+            by_left='QB_1',
+            by_right='player',
+            strategy='backward',
+            allow_exact_matches=False,
+            check_sortedness=False,
         )
+        .join(league_qbr, on='season', how='left')
         .select(
-            'posteam', 'season', 'week',
-            pl.col('qb_rating').fill_null(strategy='mean')
+            pl.col('posteam').alias('team'),
+            'season', 'week',
+            *(pl.col(f"starter_qbr{suffix}").fill_null(pl.col('league_qbr'))
+              for suffix in suffixes),
         )
-        .sort('posteam', 'season', 'week')
-        .rename({'posteam': 'team',
-                 'qb_rating': 'starter_qbr'})
+        .sort('team', 'season', 'week')
     )
 
 
+def build_starter_qbr(player_offense, starters, game_windows=(QB_WINDOW,),
+                      attempt_windows=()):
+    """Get each starting QB's rolling passer rating going into a game.
+
+    :param pl.LazyFrame player_offense: player offense stats
+    :param pl.LazyFrame starters: starters, with the QB in QB_1
+    :param Iterable[int] game_windows: numbers of games
+    :param Iterable[int] attempt_windows: numbers of attempts
+    :return: a starter_qbr{suffix} column per window, for each team and week
+    :rtype: pl.LazyFrame
+    """
+    league_qbr = make_league_qbr(player_offense)
+    return make_starter_qbr(player_offense, starters, league_qbr,
+                            game_windows, attempt_windows)
+
+
 def build_team_qbr(player_offense):
     """"""
     return (
@@ -120,7 +266,47 @@ def build_team_qbr(player_offense):
     )
 
 
-def build_qb_stats_features(games, player_offense, starters):
+def add_qb_rating_net(games):
+    """Replace the joined starting QB ratings with net ratings.
+
+    :param pl.LazyFrame games: games with starter_qbr{suffix}_obj and
+        starter_qbr{suffix}_adv columns
+    :return: The games DataFrame with a qb_rating_net{suffix} column per
+        starter_qbr{suffix} column.
+    :rtype: pl.LazyFrame
+    """
+    names = [c.removesuffix('_obj') for c in games.collect_schema().names()
+             if c.startswith('starter_qbr') and c.endswith('_obj')]
+    return (
+        games
+        .with_columns(
+            (pl.col(f"{name}_obj") - pl.col(f"{name}_adv"))
+            .round(1)
+            .fill_null(0)
+            .alias(name.replace('starter_qbr', 'qb_rating_net'))
+            for name in names
+        )
+        .drop(*(f"{name}_{side}" for name in names for side in ['obj', 'adv']))
+    )
+
+
+def join_qb_stats_features(games, starter_qbr):
+    """Join the starting QB ratings to each game as net ratings.
+
+    :param pl.LazyFrame games: The games DataFrame to join features to.
+    :param pl.LazyFrame starter_qbr: output of build_starter_qbr
+    :return: The games DataFrame with a qb_rating_net{suffix} column per
+        starter_qbr{suffix} column.
+    :rtype: pl.LazyFrame
+    """
+    return (
+        join_to_home_and_away(games, starter_qbr, drop_swt=False)
+        .pipe(add_qb_rating_net)
+    )
+
+
+def build_qb_stats_features(games, player_offense, starters,
+                            game_windows=(QB_WINDOW,), attempt_windows=()):
     """Build out QB stats features for the games DataFrame.
 
     :param pl.LazyFrame games: The games DataFrame to join features to.
@@ -128,22 +314,11 @@ def build_qb_stats_features(games, player_offense, starters):
         containing passing statistics.
     :param pl.LazyFrame starters: The starters DataFrame containing
         quarterback information.
+    :param Iterable[int] game_windows: numbers of games
+    :param Iterable[int] attempt_windows: numbers of attempts
     :return: The games DataFrame with QB stats features added.
     :rtype: pl.LazyFrame
     """
-    starter_qbr = build_starter_qbr(player_offense, starters)
-    games = join_to_home_and_away(games, starter_qbr, drop_swt=False)
-    games = (
-        games
-        .with_columns(
-            (pl.col('starter_qbr_obj') - pl.col('starter_qbr_adv'))
-            .round(1)
-            .fill_null(0)
-            .alias('qb_rating_net')
-        )
-        .drop('starter_qbr_obj', 'starter_qbr_adv')
-    )
-    # print(feature.collect().glimpse())
-    # print(starters.collect())
-    # print(games.collect())
-    return games
+    starter_qbr = build_starter_qbr(player_offense, starters, game_windows,
+                                    attempt_windows)
+    return join_qb_stats_features(games, starter_qbr)
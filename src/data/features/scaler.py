@@ -2,6 +2,37 @@
 
 import polars as pl
 
+from src.utils import rolling_total
+
+
+def make_league_totals(game_data, stat_names, window):
+    """Get the league's rolling totals going into each week.
+
+    :param pl.LazyFrame game_data: The game data.
+    :param list[str] stat_names: The names of the statistics to be adjusted.
+    :param int window: Number of weeks in the rolling window.
+    :return: The league's totals for each season and week.
+    :rtype: pl.LazyFrame
+    """
+    return (
+        game_data
+        .group_by(['season', 'week'])
+        .agg(
+            pl.col(stat_names).sum(),
+            pl.col('count').sum()
+        )
+        .sort('season', 'week')
+        .rolling(
+            index_column='week',
+            period=f'{window}i',
+            group_by=['season']
+        )
+        .agg(
+            pl.col(stat_names).sum(),
+            pl.col('count').sum()
+        )
+    )
+
 
 def make_rolling_data(game_data, stat_name, side):
     """Turn weekly data into a set of rolling data that we can use to make
@@ -136,24 +167,7 @@ def make_rolling_data(game_data, stat_name, side):
     )
 
     # Collect rolling data for the league
-    league_means = (
-        game_data
-        .group_by(['season', 'week'])
-        .agg(
-            pl.col(stat_name).sum(),
-            pl.col('count').sum()
-        )
-        .sort('season', 'week')
-        .rolling(
-            index_column='week',
-            period=period,
-            group_by=['season']
-        )
-        .agg(
-            pl.col(stat_name).sum(),
-            pl.col('count').sum()
-        )
-    )
+    league_means = make_league_totals(game_data, [stat_name], window=20)
     return rolled_data_obj, opp_agged_data, league_means
 
 
@@ -190,90 +204,246 @@ def calculate_adj_metric(rolled_data, opp_agged_data, league_means,
             suffix='_lg'
         )
         .fill_null(strategy='forward')
+        .pipe(add_adj_metric, [stat_name], side)
+    )
+
+
+def adj_metric(stat_name, opp_side):
+    """Adjust a game's stat for the opponent.
+
+    The opponent's average excludes the game being adjusted.
+
+    :param str stat_name: The name of the statistic to be adjusted.
+    :param str opp_side: The opponent's side of the ball.
+    :return: adj_{stat_name} expression
+    :rtype: pl.Expr
+    """
+    opp_resid = pl.col(f"{stat_name}_{opp_side}") - pl.col(stat_name)
+    count_resid = pl.col(f"count_{opp_side}") - pl.col('count')
+    opp_avg = opp_resid / count_resid
+    # lg_resid = pl.col(f"{stat_name}_lg") - pl.col(f"{stat_name}_{opp_side}")
+    # lg_avg = lg_resid / (pl.col("count_lg") - pl.col(f"count_{opp_side}"))
+    # adj = pl.col(stat_name) * (lg_avg / opp_avg)
+    # adj = pl.col(stat_name) * (pl.lit(0.1) * (opp_avg - lg_avg)).exp()
+    # adj = pl.col(stat_name)
+    return (pl.col(stat_name) - opp_avg).alias(f"adj_{stat_name}")
+
+
+def add_adj_metric(df, stat_names, side):
+    """Adjust each game's stats for the opponent.
+
+    :param pl.LazyFrame df: One row per game in each team's window, with the
+        opponent's and league's rolling totals.
+    :param list[str] stat_names: The names of the statistics to be adjusted.
+    :param str side: The side of the ball (posteam or defteam).
+    :return: The games with an adj_{stat_name} column for each stat.
+    :rtype: pl.LazyFrame
+    """
+    opp_side = 'defteam' if side == 'posteam' else 'posteam'
+    return df.with_columns(adj_metric(s, opp_side) for s in stat_names)
+
+
+def make_opp_totals(game_data, stat_names, side, window):
+    """Get each opponent's rolling totals through each of its games.
+
+    :param pl.LazyFrame game_data: The game data.
+    :param list[str] stat_names: The names of the statistics to be adjusted.
+    :param str side: The side of the ball (posteam or defteam) being
+        adjusted. Totals are for the other side.
+    :param int window: Number of games in the rolling window.
+    :return: Opponent totals, sorted by week.
+    :rtype: pl.LazyFrame
+    """
+    opp_side = 'defteam' if side == 'posteam' else 'posteam'
+    return (
+        game_data
+        .select(opp_side, 'season', 'week', *stat_names, 'count')
+        .sort(opp_side, 'season', 'week')
         .with_columns(
-            (pl.col(f"{stat_name}_{opp_side}") - pl.col(stat_name)).alias(f"{stat_name}_{opp_side}_resid"),
-            (pl.col(f"count_{opp_side}") - pl.col('count')).alias(f"count_{opp_side}_resid"),
-            (pl.col(f"{stat_name}_lg") - pl.col(f"{stat_name}_{opp_side}")).alias(f"{stat_name}_lg_resid"),
-            (pl.col(f"count_lg") - pl.col(f"count_{opp_side}")).alias(f"count_lg_resid"),
+            rolling_total(col, [opp_side, 'season'], window)
+            for col in [*stat_names, 'count']
         )
-        .with_columns(
-            game_avg=pl.col(stat_name) / pl.col('count'),
-            opp_avg=pl.col(f"{stat_name}_{opp_side}_resid") / pl.col(f"count_{opp_side}_resid"),
-            lg_avg=pl.col(f"{stat_name}_lg_resid") / pl.col(f"count_lg_resid"),
+        .sort('week')
+    )
+
+
+def make_window_games(game_data, stat_names, side, window):
+    """Pair each week of a team's season with the games in its window.
+
+    :param pl.LazyFrame game_data: The game data.
+    :param list[str] stat_names: The names of the statistics to be adjusted.
+    :param str side: The side of the ball (posteam or defteam).
+    :param int window: Number of games in the rolling window.
+    :return: One row per team, week and game in the window ending that
+        week, sorted by week.
+    :rtype: pl.LazyFrame
+    """
+    opp_side = 'defteam' if side == 'posteam' else 'posteam'
+    team_games = (
+        game_data
+        .select(side, opp_side, 'season', 'week', *stat_names, 'count')
+        .sort(side, 'season', 'week')
+        .with_columns(game=pl.int_range(pl.len()).over(side, 'season'))
+    )
+    # each window end lists the indices of the games in its window, so the
+    # join only makes the rows inside windows
+    window_ends = (
+        team_games
+        .select(
+            side, 'season',
+            pl.col('week').alias('end_week'),
+            pl.int_ranges(pl.max_horizontal(pl.col('game') - window + 1, 0),
+                          pl.col('game') + 1).alias('game'),
         )
-        .with_columns(
-            adj_metric=(pl.col(stat_name) - pl.col('opp_avg')),
-            # adj_metric=pl.col(stat_name) * (pl.col('lg_avg') / pl.col('opp_avg')),
-            # adj_metric=pl.col(stat_name) * (pl.lit(0.1) * (pl.col('opp_avg') - pl.col('lg_avg'))).exp(),
-            # adj_metric=pl.col(stat_name),
+        .explode('game')
+    )
+    return (
+        team_games
+        .join(window_ends, on=[side, 'season', 'game'])
+        .select(side, opp_side, 'season', pl.col('end_week').alias('week'),
+                *stat_names, 'count')
+        .sort('week')
+    )
+
+
+def calculate_adj_metric_asof(game_data, stat_names, side, window=20):
+    """Opponent-adjust every game in each team's rolling window.
+
+    Equivalent to make_rolling_data followed by calculate_adj_metric, without
+    building list columns, and for any number of stats in one pass. Rolling
+    totals are differences of cumulative sums, and each opponent's totals are
+    as-of joined at the week the window ends, so an opponent on a bye that
+    week contributes its totals through its latest game.
+
+    :param pl.LazyFrame game_data: The game data.
+    :param list[str] stat_names: The names of the statistics to be adjusted.
+        Every stat shares the count column.
+    :param str side: The side of the ball (posteam or defteam).
+    :param int window: Number of games in the rolling window.
+    :return: The games in each team's window, with an adj_{stat_name}
+        column for each stat.
+    :rtype: pl.LazyFrame
+    """
+    opp_side = 'defteam' if side == 'posteam' else 'posteam'
+    return (
+        make_window_games(game_data, stat_names, side, window)
+        .join_asof(
+            make_opp_totals(game_data, stat_names, side, window),
+            on='week',
+            by=[opp_side, 'season'],
+            strategy='backward',
+            suffix=f'_{opp_side}',
+            check_sortedness=False,
         )
+        # adj_metric doesn't use the league term, so league totals aren't
+        # joined. Join make_league_totals on season and week, with an '_lg'
+        # suffix, if it's restored.
+        .pipe(add_adj_metric, stat_names, side)
     )
 
 
-def aggregate_adj_metric(df, stat_name, side, aggregation):
-    """"""
+def aggregate_adj_metric(df, stat_names, side, aggregation):
+    """Total the adjusted stats over each team's window.
+
+    :param pl.LazyFrame df: The games in each team's window, with an
+        adj_{stat_name} column for each stat.
+    :param list[str] stat_names: The names of the adjusted statistics.
+    :param str side: The side of the ball (posteam or defteam).
+    :param str aggregation: 'mean' for the adjusted stat per count, or
+        'cumsum' for the adjusted total.
+    :return: One {stat_name}_{side} column per stat, for each team and week.
+    :rtype: pl.LazyFrame
+    """
     totals = (
         df
         .group_by([side, 'season', 'week'])
         .agg(
-            pl.col('adj_metric').sum().alias('adj_metric_total'),
+            *(pl.col(f"adj_{s}").sum() for s in stat_names),
             pl.col('count').sum().alias('count_total'),
         )
     )
     if aggregation == 'mean':
-        return (
-            totals
-            .with_columns((pl.col('adj_metric_total') / pl.col('count_total')).alias('avg_adj_metric'))
-            .select(
-                pl.col(side).alias('team'),
-                'season', 'week',
-                pl.col('avg_adj_metric').alias(f"{stat_name}_{side}"),
-            )
-        )
-    elif aggregation == 'cumsum':
-        return (
-            totals
-            .select(
-                pl.col(side).alias('team'),
-                'season', 'week',
-                pl.col('adj_metric_total').alias(f"{stat_name}_{side}"),
-            )
+        totals = totals.with_columns(
+            pl.col(f"adj_{s}") / pl.col('count_total') for s in stat_names
         )
+    return totals.select(
+        pl.col(side).alias('team'),
+        'season', 'week',
+        *(pl.col(f"adj_{s}").alias(f"{s}_{side}") for s in stat_names),
+    )
+
 
+def get_stat_names(feature_data):
+    """Get the stat columns of the feature data.
 
-def build_adjusted_features(feature_data, aggregation='mean'):
-    """"""
-    stat_name = feature_data.collect_schema().names()[-2]
+    :param pl.LazyFrame feature_data: The game data.
+    :return: Every column other than the team, week and count columns.
+    :rtype: list[str]
+    """
+    keys = {'posteam', 'defteam', 'season', 'week', 'count'}
+    return [c for c in feature_data.collect_schema().names() if c not in keys]
+
+
+def build_adjusted_features(feature_data, aggregation='mean', engine='asof',
+                            stat_names=None):
+    """Build opponent-adjusted features for both sides of the ball.
+
+    With the as-of engine every stat is adjusted in one shared pass per side,
+    so adding a stat only adds columns.
+
+    :param pl.LazyFrame feature_data: One row per team and game, with
+        posteam, defteam, season, week, count and stat columns.
+    :param str aggregation: 'mean' or 'cumsum'
+    :param str engine: 'asof' for calculate_adj_metric_asof, or 'explode'
+        for the list-based make_rolling_data and calculate_adj_metric, which
+        makes one pass per stat
+    :param list[str] stat_names: The stats to adjust. Defaults to every
+        column other than the team, week and count columns.
+    :return: A {stat_name}_posteam and {stat_name}_defteam column per stat,
+        for each team and week.
+    :rtype: pl.LazyFrame
+    """
+    if stat_names is None:
+        stat_names = get_stat_names(feature_data)
     dfs_to_join = []
     for side in ['posteam', 'defteam']:
-        rolled_data, opp_agged_data, league_means = make_rolling_data(
-            feature_data,
-            stat_name,
-            side,
-        )
-        adjusted_data = calculate_adj_metric(
-            rolled_data,
-            opp_agged_data,
-            league_means,
-            stat_name,
-            side,
-        )
-        agged_adj_data = aggregate_adj_metric(
-            adjusted_data,
-            stat_name,
-            side,
-            aggregation,
-        )
-        dfs_to_join.append(agged_adj_data)
-    left_df, right_df = dfs_to_join
-    final_df = (
-        left_df
-        .join(right_df,
-              on=['team', 'season', 'week'],
-              how='left')
-        .sort('team', 'season', 'week')
-    )
-    return final_df
+        if engine == 'explode':
+            for stat_name in stat_names:
+                rolled_data, opp_agged_data, league_means = make_rolling_data(
+                    feature_data,
+                    stat_name,
+                    side,
+                )
+                adjusted_data = calculate_adj_metric(
+                    rolled_data,
+                    opp_agged_data,
+                    league_means,
+                    stat_name,
+                    side,
+                )
+                dfs_to_join.append(aggregate_adj_metric(
+                    adjusted_data,
+                    [stat_name],
+                    side,
+                    aggregation,
+                ))
+        else:
+            adjusted_data = calculate_adj_metric_asof(
+                feature_data,
+                stat_names,
+                side,
+            )
+            dfs_to_join.append(aggregate_adj_metric(
+                adjusted_data,
+                stat_names,
+                side,
+                aggregation,
+            ))
+    final_df = dfs_to_join[0]
+    for df in dfs_to_join[1:]:
+        final_df = final_df.join(df, on=['team', 'season', 'week'],
+                                 how='left')
+    return final_df.sort('team', 'season', 'week')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+"""Schedule-adjusted team ratings fitted with a simple rating system (SRS).
+
+scaler.py adjusts each game for the opponent's raw averages, so an
+opponent's numbers are never adjusted for *its* opponents. Here every
+team's offense and defense are fitted at once. For a game where team i's
+offense faced team j's defense,
+
+    stat / count ~ league + offense_i + defense_j
+
+is fitted by weighted least squares over every game of the season so far,
+with count as the weight. A ridge penalty ``alpha`` (in units of count)
+shrinks teams toward the league average until they've played enough games.
+
+Each season's design matrix is sparse, with three nonzeros per game, and its
+normal equations are built up a week at a time. Each week's system is
+solved by conjugate gradients, warm-started from the previous week's
+ratings.
+"""
+
+import numpy as np
+import polars as pl
+from scipy import sparse
+from scipy.sparse.linalg import cg
+
+from src.data.features.scaler import get_stat_names
+
+
+ALPHA = 100.0
+
+
+def make_design_matrix(offense, defense, n_teams):
+    """Make the design matrix for a set of games.
+
+    Columns are the league average, then each team's offense, then each
+    team's defense.
+
+    :param np.ndarray offense: team index of each game's offense
+    :param np.ndarray defense: team index of each game's defense
+    :param int n_teams: number of teams
+    :return: one row per game
+    :rtype: sparse.csr_array
+    """
+    n_games = len(offense)
+    rows = np.repeat(np.arange(n_games), 3)
+    cols = np.column_stack([
+        np.zeros(n_games, dtype=np.int64),
+        1 + offense,
+        1 + n_teams + defense,
+    ]).ravel()
+    return sparse.csr_array((np.ones(3 * n_games), (rows, cols)),
+                            shape=(n_games, 1 + 2 * n_teams))
+
+
+def fit_season(season_data, stat_names, alpha=ALPHA, rtol=1e-10):
+    """Fit ratings through each week of a season.
+
+    :param pl.DataFrame season_data: one row per team and game, for one
+        season
+    :param list[str] stat_names: stats to rate
+    :param float alpha: ridge penalty, in units of count
+    :param float rtol: conjugate gradient tolerance
+    :return: ratings through each week for every team that played that week
+    :rtype: pl.DataFrame
+    """
+    teams = np.unique(season_data.select(
+        pl.concat([pl.col('posteam'), pl.col('defteam')])
+    ).to_series().to_numpy())
+    n_teams = len(teams)
+    n_params = 1 + 2 * n_teams
+    penalty = sparse.diags_array(np.r_[0.0, np.full(2 * n_teams, alpha)])
+    normal = sparse.csr_array((n_params, n_params))
+    rhs = np.zeros((n_params, len(stat_names)))
+    ratings = np.zeros((n_params, len(stat_names)))
+
+    frames = []
+    for (week,), games in season_data.sort('week').group_by('week',
+                                                           maintain_order=True):
+        offense = np.searchsorted(teams, games['posteam'].to_numpy())
+        defense = np.searchsorted(teams, games['defteam'].to_numpy())
+        counts = games['count'].to_numpy().astype(float)
+        per_count = games.select(stat_names).to_numpy() / counts[:, None]
+        design = make_design_matrix(offense, defense, n_teams)
+        normal = normal + design.T @ (design * counts[:, None])
+        rhs += design.T @ (per_count * counts[:, None])
+        system = normal + penalty
+        for k in range(len(stat_names)):
+            ratings[:, k], _ = cg(system, rhs[:, k], x0=ratings[:, k],
+                                  rtol=rtol, atol=0.0)
+        frames.append(pl.DataFrame({
+            'team': teams[offense],
+            'week': week,
+            **{f"{s}_posteam": ratings[1 + offense, k]
+               for k, s in enumerate(stat_names)},
+            **{f"{s}_defteam": ratings[1 + n_teams + offense, k]
+               for k, s in enumerate(stat_names)},
+        }))
+    return pl.concat(frames)
+
+
+def build_srs_features(feature_data, stat_names=None, alpha=ALPHA):
+    """Build schedule-adjusted ratings for both sides of the ball.
+
+    The output has the same layout as
+    scaler.build_adjusted_features: {stat}_posteam is how far the team's
+    offense is above the league average per count, and {stat}_defteam is
+    how far above average the team's defense allows, through each week.
+
+    :param pl.LazyFrame feature_data: One row per team and game, with
+        posteam, defteam, season, week, count and stat columns.
+    :param list[str] stat_names: The stats to rate. Defaults to every column
+        other than the team, week and count columns.
+    :param float alpha: ridge penalty, in units of count
+    :return: A {stat_name}_posteam and {stat_name}_defteam column per stat,
+        for each team and week.
+    :rtype: pl.LazyFrame
+    """
+    if stat_names is None:
+        stat_names = get_stat_names(feature_data)
+    feature_data = feature_data.collect()
+    frames = [
+        fit_season(season_data, stat_names, alpha)
+        .with_columns(season=pl.lit(season, dtype=feature_data['season'].dtype))
+        for (season,), season_data in feature_data.group_by('season')
+    ]
+    return (
+        pl.concat(frames)
+        .select('team', 'season', 'week',
+                *(f"{s}_posteam" for s in stat_names),
+                *(f"{s}_defteam" for s in stat_names))
+        .with_columns(pl.col('week').cast(feature_data['week'].dtype))
+        .sort('team', 'season', 'week')
+        .lazy()
+    )
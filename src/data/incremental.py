@@ -0,0 +1,222 @@
+"""Week-incremental materialisation of the team feature tables.
+
+The rolling features in build.py are computed per team and week, then joined
+to the games. During the season a refresh only adds a week of games, so
+rather than recomputing every window since 1999 we keep the team feature
+tables on disk, along with the rolling state needed to extend them, and only
+compute the rows for weeks that haven't been materialised yet.
+
+The state is what each rolling window can still see at the end of the last
+materialised week:
+
+- play stats and Pythagorean expectation roll within a season, so their state
+  is the current season's rows, which are read from the season partitions of
+  the boxscore store.
+- QB ratings roll over a player's last ``QB_WINDOW`` passing games across
+  seasons, so those rows are kept for each player in ``qb_state.parquet``.
+  Starters without a previous passing game get the league's rating from the
+  previous season, which is read from the boxscore store.
+
+The result is identical to a full rebuild.
+
+Each run writes one file per table holding the weeks it materialised, named
+by the last of those weeks.
+
+Layout::
+
+    team-features/
+        state.json
+        qb_state.parquet
+        play_stats/
+            2023-18.parquet
+            2024-01.parquet
+            ...
+        pythag/
+        starter_qbr/
+"""
+
+import json
+import shutil
+
+import polars as pl
+
+from src.data.features.play_stats import build_play_stats_team_features
+from src.data.features.pythag_exp import build_pythag_team_features
+from src.data.features.qb_stats import (QB_WINDOW,
+                                        make_league_qbr,
+                                        make_starter_qbr)
+from src.utils import make_team_week_index
+
+
+TEAM_FEATURES = ('play_stats', 'pythag', 'starter_qbr')
+QB_STATE_COLUMNS = ['player', 'pfr', 'season', 'week', 'completions',
+                    'pass_attempts', 'pass_yards', 'pass_td', 'interceptions']
+
+
+def is_after(season, week):
+    """Check whether rows come after a week.
+
+    :param int season: season
+    :param int week: week
+    :return: filter expression
+    :rtype: pl.Expr
+    """
+    return ((pl.col('season') > season)
+            | ((pl.col('season') == season) & (pl.col('week') > week)))
+
+
+def get_last_week(df):
+    """Get the latest week in a frame.
+
+    :param pl.LazyFrame df: frame with season and week columns
+    :return: (season, week), or None if the frame is empty
+    :rtype: tuple[int, int]
+    """
+    last = (
+        df
+        .select('season', 'week')
+        .sort('season', 'week')
+        .last()
+        .collect()
+    )
+    return tuple(last.row(0)) if last.height else None
+
+
+def read_state(store_path):
+    """Read the last materialised week.
+
+    :param pathlib.Path store_path: team feature store directory
+    :return: (season, week), or None if nothing has been materialised
+    :rtype: tuple[int, int]
+    """
+    path = store_path / 'state.json'
+    if not path.exists():
+        return None
+    state = json.loads(path.read_text())
+    return state['season'], state['week']
+
+
+def write_state(store_path, season, week):
+    """Record the last materialised week.
+
+    :param pathlib.Path store_path: team feature store directory
+    :param int season: season
+    :param int week: week
+    :return: None
+    :rtype: None
+    """
+    path = store_path / 'state.json'
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps({'season': season, 'week': week}))
+    tmp_path.replace(path)
+
+
+def make_qb_state(player_offense):
+    """Keep the passing games still inside each QB's rolling window.
+
+    :param pl.LazyFrame player_offense: player offense stats
+    :return: each player's last QB_WINDOW passing games
+    :rtype: pl.LazyFrame
+    """
+    return (
+        player_offense
+        .select(QB_STATE_COLUMNS)
+        .filter(pl.col('pass_attempts') > 0)
+        .sort('player', 'season', 'week')
+        .group_by('player', maintain_order=True)
+        .tail(QB_WINDOW)
+    )
+
+
+def build_team_features(drives, scores, player_offense, starters,
+                        league_qbr):
+    """Build the team feature tables.
+
+    :param pl.LazyFrame drives: drives
+    :param pl.LazyFrame scores: game outcomes
+    :param pl.LazyFrame player_offense: player offense stats
+    :param pl.LazyFrame starters: starters
+    :param pl.LazyFrame league_qbr: league passer rating for each season
+    :return: one table per name in TEAM_FEATURES
+    :rtype: dict[str, pl.LazyFrame]
+    """
+    team_weeks = make_team_week_index(scores).collect().lazy()
+    return {
+        'play_stats': build_play_stats_team_features(drives, team_weeks),
+        'pythag': build_pythag_team_features(scores, team_weeks=team_weeks),
+        'starter_qbr': make_starter_qbr(player_offense, starters, league_qbr),
+    }
+
+
+def materialise_team_features(store_path, drives, scores, player_offense,
+                              starters, full=False):
+    """Bring the team feature store up to the latest week of boxscores.
+
+    On the first run, or with ``full``, every week is computed. Otherwise
+    only the weeks after the last materialised week are, using the current
+    season's rows and the QB state. ``drives`` and ``scores`` must hold every
+    week of the seasons being materialised, and ``player_offense`` the
+    season before those as well; ``starters`` only needs the new weeks.
+
+    :param pathlib.Path store_path: team feature store directory
+    :param pl.LazyFrame drives: drives
+    :param pl.LazyFrame scores: game outcomes
+    :param pl.LazyFrame player_offense: player offense stats
+    :param pl.LazyFrame starters: starters
+    :param bool full: rebuild the store from scratch
+    :return: number of weeks materialised
+    :rtype: int
+    """
+    last = None if full else read_state(store_path)
+    latest = get_last_week(drives)
+    if latest is None or (last is not None and last >= latest):
+        return 0
+    if last is None:
+        shutil.rmtree(store_path, ignore_errors=True)
+        store_path.mkdir(parents=True)
+        qb_state = pl.LazyFrame(schema=player_offense.select(
+            QB_STATE_COLUMNS).collect_schema())
+        is_new = pl.lit(True)
+    else:
+        qb_state = pl.scan_parquet(store_path / 'qb_state.parquet')
+        is_new = is_after(*last)
+    is_new = is_new & ~is_after(*latest)
+
+    new_weeks = drives.filter(is_new).select('season', 'week').unique()
+    first_season = new_weeks.select(pl.min('season')).collect().item()
+    in_seasons = pl.col('season') >= first_season
+    league_qbr = make_league_qbr(player_offense).collect().lazy()
+    player_offense = pl.concat(
+        [qb_state, player_offense.filter(is_new).select(QB_STATE_COLUMNS)],
+        how='vertical_relaxed',
+    )
+    tables = build_team_features(
+        drives.filter(in_seasons & ~is_after(*latest)),
+        scores.filter(in_seasons & ~is_after(*latest)),
+        player_offense,
+        starters.filter(is_new),
+        league_qbr,
+    )
+    file_name = f"{latest[0]}-{latest[1]:02d}.parquet"
+    for name, table in tables.items():
+        (store_path / name).mkdir(exist_ok=True)
+        table.filter(is_new).collect().write_parquet(
+            store_path / name / file_name
+        )
+
+    qb_state = make_qb_state(player_offense).collect()
+    qb_state.write_parquet(store_path / 'qb_state.tmp')
+    (store_path / 'qb_state.tmp').replace(store_path / 'qb_state.parquet')
+    write_state(store_path, *latest)
+    return new_weeks.select(pl.len()).collect().item()
+
+
+def scan_team_features(store_path):
+    """Lazily scan the team feature store.
+
+    :param pathlib.Path store_path: team feature store directory
+    :return: one table per name in TEAM_FEATURES
+    :rtype: dict[str, pl.LazyFrame]
+    """
+    return {name: pl.scan_parquet(store_path / name / '*.parquet')
+            for name in TEAM_FEATURES}
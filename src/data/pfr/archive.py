@@ -0,0 +1,211 @@
+"""Compressed, content-addressed archive for raw boxscore pages.
+
+Pages are gzip-compressed one at a time and appended to pack files, so a pack
+is a valid multi-member gzip file. Each page's contents are keyed by their
+sha256 digest and stored once, however many game IDs point at them. A SQLite
+index maps pfr game IDs to digests, and digests to (pack, offset, length).
+Packs are memory-mapped for reading, so fetching a page is a slice and a
+decompress rather than a file open.
+
+Layout::
+
+    pfr-archive/
+        index.db
+        pack-00000.gz
+        pack-00001.gz
+        ...
+"""
+
+import gzip
+import hashlib
+import mmap
+import sqlite3
+import threading
+
+
+PACK_SIZE = 256 * 1024 ** 2
+
+
+class BoxscoreArchive:
+    """Archive of raw boxscore pages.
+
+    Writes are thread-safe within a process. Any number of processes can
+    read at once, but only one should write.
+
+    :param pathlib.Path path: archive directory
+    :param int pack_size: size in bytes at which to start a new pack
+    """
+
+    def __init__(self, path, pack_size=PACK_SIZE):
+        self.path = path
+        self.pack_size = pack_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._conn = sqlite3.connect(path / 'index.db', check_same_thread=False)
+        self._conn.executescript(
+            "create table if not exists pages "
+            "(pfr text primary key, sha256 text not null);"
+            "create table if not exists blobs "
+            "(sha256 text primary key, pack integer, start integer, "
+            "length integer);"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, pfr_id):
+        return self.sha256(pfr_id) is not None
+
+    def __len__(self):
+        return self._conn.execute("select count(*) from pages").fetchone()[0]
+
+    def close(self):
+        """Close the index and unmap the packs.
+
+        :return: None
+        :rtype: None
+        """
+        for pack_map in self._maps.values():
+            pack_map.close()
+        self._maps.clear()
+        self._conn.close()
+
+    def pack_path(self, pack):
+        """Get the path of a pack file.
+
+        :param int pack: pack number
+        :return: pack path
+        :rtype: pathlib.Path
+        """
+        return self.path / f"pack-{pack:05d}.gz"
+
+    def ids(self):
+        """Get the IDs of every archived page.
+
+        :return: pfr game IDs
+        :rtype: set[str]
+        """
+        return {row[0] for row in self._conn.execute("select pfr from pages")}
+
+    def digests(self):
+        """Get the contents digest of every archived page.
+
+        :return: sha256 digest for each pfr game ID
+        :rtype: dict[str, str]
+        """
+        return dict(self._conn.execute("select pfr, sha256 from pages"))
+
+    def sha256(self, pfr_id):
+        """Get the contents digest of an archived page.
+
+        :param str pfr_id: pfr game ID
+        :return: sha256 digest, or None if the page isn't archived
+        :rtype: str
+        """
+        row = self._conn.execute(
+            "select sha256 from pages where pfr = ?", (pfr_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _current_pack(self):
+        """Get the pack to append to, and its size."""
+        row = self._conn.execute("select max(pack) from blobs").fetchone()
+        pack = row[0] or 0
+        pack_path = self.pack_path(pack)
+        size = pack_path.stat().st_size if pack_path.exists() else 0
+        if size >= self.pack_size:
+            pack, size = pack + 1, 0
+        return pack, size
+
+    def put(self, pfr_id, html):
+        """Archive a page, replacing any earlier page for the same game.
+
+        :param str pfr_id: pfr game ID
+        :param str html: boxscore html
+        :return: sha256 digest of the page
+        :rtype: str
+        """
+        data = html.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock, self._conn:
+            known = self._conn.execute(
+                "select 1 from blobs where sha256 = ?", (digest,)
+            ).fetchone()
+            if not known:
+                pack, offset = self._current_pack()
+                record = gzip.compress(data, mtime=0)
+                with open(self.pack_path(pack), 'ab') as f:
+                    f.write(record)
+                self._conn.execute(
+                    "insert into blobs values (?, ?, ?, ?)",
+                    (digest, pack, offset, len(record)),
+                )
+            self._conn.execute(
+                "insert or replace into pages values (?, ?)", (pfr_id, digest)
+            )
+        return digest
+
+    def _map(self, pack, end):
+        """Get a memory map of a pack that covers at least ``end`` bytes."""
+        pack_map = self._maps.get(pack)
+        if pack_map is None or len(pack_map) < end:
+            if pack_map is not None:
+                pack_map.close()
+            with open(self.pack_path(pack), 'rb') as f:
+                pack_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = pack_map
+        return pack_map
+
+    def get(self, pfr_id):
+        """Read an archived page.
+
+        :param str pfr_id: pfr game ID
+        :return: boxscore html
+        :rtype: str
+        :raises KeyError: if the page isn't archived
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "select b.pack, b.start, b.length from pages p "
+                "join blobs b on p.sha256 = b.sha256 where p.pfr = ?",
+                (pfr_id,),
+            ).fetchone()
+            if row is None:
+                raise KeyError(pfr_id)
+            pack, offset, length = row
+            pack_map = self._map(pack, offset + length)
+            record = pack_map[offset:offset + length]
+        return gzip.decompress(record).decode()
+
+
+def import_html_files(archive, paths):
+    """Copy boxscore html files into an archive.
+
+    :param BoxscoreArchive archive: archive to write to
+    :param list[pathlib.Path] paths: boxscore html files, named by pfr ID
+    :return: number of files imported
+    :rtype: int
+    """
+    existing = archive.ids()
+    n = 0
+    for path in paths:
+        if path.stem not in existing:
+            archive.put(path.stem, path.read_text())
+            n += 1
+    return n
+
+
+if __name__ == '__main__':
+    from src.config.config import PATHS
+
+    pfr_path = PATHS['pfr_data']
+    archive_path = PATHS['pfr_archive']
+
+    paths = sorted(pfr_path.glob('*.html'))
+    with BoxscoreArchive(archive_path) as archive:
+        n = import_html_files(archive, paths)
+        print(f"Imported {n} of {len(paths)} boxscores into {archive_path}")
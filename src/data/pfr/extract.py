@@ -0,0 +1,147 @@
+"""Fast extraction of boxscore tables from raw pro-football-reference html.
+
+Most of the tables on a boxscore page are commented out and only rendered by
+javascript. Rather than building a soup for the whole page, re-serialising
+every comment and building a second soup from them, we make one streaming
+pass over the raw html with a regular expression that finds table tags and
+comment boundaries. Only the target tables are tokenized, and their rows come
+out as lists of cell strings that match ``Tag.get_text(strip=True)``.
+"""
+
+import re
+from html.parser import HTMLParser
+
+
+TABLE_IDS = (
+    'player_offense',
+    'team_stats',
+    'vis_drives',
+    'home_drives',
+    'vis_starters',
+    'home_starters',
+)
+# tables that are rendered in the page body; the rest are commented out
+BODY_TABLE_IDS = {'player_offense'}
+TOKENS = re.compile(r'<!--|-->|<table\b[^>]*>|</table\s*>', re.IGNORECASE)
+ID_ATTR = re.compile(r'\bid\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+
+
+class TableRowParser(HTMLParser):
+    """Collects the cell text of every row in a table.
+
+    Each cell is the concatenation of its stripped text nodes, the same as
+    BeautifulSoup's ``get_text(strip=True)``. Comments inside cells are
+    ignored.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def _close_cell(self):
+        if self._cell is not None:
+            self._row.append(''.join(self._cell))
+            self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._close_row()
+            self._row = []
+        elif tag in ('th', 'td') and self._row is not None:
+            self._close_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ('th', 'td'):
+            self._close_cell()
+        elif tag in ('tr', 'table'):
+            self._close_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            text = data.strip()
+            if text:
+                self._cell.append(text)
+
+
+def find_tables(html, table_ids=TABLE_IDS):
+    """Find the markup for a set of tables in one pass over a page.
+
+    Tables inside comments are found as well. If a table appears both in the
+    page body and inside a comment, the body copy is used for tables in
+    BODY_TABLE_IDS and the commented copy for the rest.
+
+    :param str html: boxscore html
+    :param Iterable[str] table_ids: ids of the tables to find
+    :return: markup for each table that was found
+    :rtype: dict[str, str]
+    """
+    table_ids = set(table_ids)
+    found = {}
+    in_comment = False
+    stack = []
+    for match in TOKENS.finditer(html):
+        token = match.group(0)
+        if token == '<!--':
+            in_comment = True
+        elif token == '-->':
+            in_comment = False
+            # drop tables left open by a malformed comment
+            stack = [t for t in stack if not t[2]]
+        elif token[1] == '/':
+            if stack:
+                table_id, start, commented = stack.pop()
+                if table_id is not None:
+                    found.setdefault((table_id, commented),
+                                     html[start:match.end()])
+        else:
+            id_match = ID_ATTR.search(token)
+            table_id = id_match.group(1) if id_match else None
+            if table_id not in table_ids:
+                table_id = None
+            stack.append((table_id, match.start(), in_comment))
+
+    tables = {}
+    for table_id in table_ids:
+        prefer_comment = table_id not in BODY_TABLE_IDS
+        for commented in (prefer_comment, not prefer_comment):
+            if (table_id, commented) in found:
+                tables[table_id] = found[(table_id, commented)]
+                break
+    return tables
+
+
+def parse_table_rows(table_html):
+    """Parse the rows of a table.
+
+    :param str table_html: markup for a single table
+    :return: cell text for each row
+    :rtype: list[list[str]]
+    """
+    parser = TableRowParser()
+    parser.feed(table_html)
+    parser.close()
+    parser._close_row()
+    return parser.rows
+
+
+def extract_table_rows(html, table_ids=TABLE_IDS):
+    """Extract the rows of a set of tables from a boxscore page.
+
+    :param str html: boxscore html
+    :param Iterable[str] table_ids: ids of the tables to extract
+    :return: cell text for each row of each table that was found
+    :rtype: dict[str, list[list[str]]]
+    """
+    return {
+        table_id: parse_table_rows(table_html)
+        for table_id, table_html in find_tables(html, table_ids).items()
+    }
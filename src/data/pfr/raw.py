@@ -1,27 +1,229 @@
+"""Helper functions and script for fetching raw boxscores from
+pro-football-reference.
+
+Boxscores are fetched from an asyncio event loop. A token bucket caps the
+request rate, a semaphore caps the number of requests in flight, and a single
+pooled requests.Session reuses connections. The blocking requests calls run on
+worker threads, so network latency overlaps without breaking the request
+budget.
+"""
+
+import asyncio
 import os
-from time import sleep
+import random
+import time
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import polars as pl
 
 
+PFR_BOXSCORE_URL = "https://www.pro-football-reference.com/boxscores"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/117.0"
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket rate limiter for coroutines.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``. Each
+    request consumes one token, so ``capacity`` is the largest burst allowed.
+
+    :param float rate: tokens added per second
+    :param int capacity: maximum number of tokens held at once
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available, then consume it.
+
+        :return: None
+        :rtype: None
+        """
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def drain(self, delay):
+        """Empty the bucket so that no token is available for ``delay`` seconds.
+
+        Used when the server asks us to slow down, so that every pending
+        request backs off, not just the one that was throttled.
+
+        :param float delay: seconds until the next token is available
+        :return: None
+        :rtype: None
+        """
+        self._refill()
+        self._tokens = min(self._tokens, -delay * self.rate)
+
+
+def make_session(pool_size):
+    """Make a requests session with a connection pool.
+
+    :param int pool_size: max number of pooled connections
+    :return: session with browser headers and a pooled adapter
+    :rtype: requests.Session
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-def fetch_boxscore_html(pfr_game_id):
-    """"""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/117.0"
-    }
-    url = f"https://www.pro-football-reference.com/boxscores/{pfr_game_id}.htm"
-    response = requests.get(url, headers=headers)
-    return BeautifulSoup(response.text, "html.parser").prettify()
+def get_existing_pfr_ids(pfr_data_path):
+    """Get the IDs of boxscores that have already been fetched.
+
+    :param pathlib.Path pfr_data_path: directory of raw boxscore html files
+    :return: pfr game IDs
+    :rtype: set[str]
+    """
+    with os.scandir(pfr_data_path) as entries:
+        return {e.name[:-5] for e in entries if e.name.endswith('.html')}
+
+
+def get_retry_delay(response, attempt, backoff):
+    """Get the number of seconds to wait before retrying a request.
+
+    Honours the Retry-After header when the server sends one in seconds.
+    Otherwise backs off exponentially with a little jitter.
+
+    :param requests.Response response: failed response, or None if the
+        request raised a connection error
+    :param int attempt: zero-based attempt number
+    :param float backoff: base backoff in seconds
+    :return: delay in seconds
+    :rtype: float
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return backoff * 2 ** attempt + random.uniform(0, backoff)
+
+
+def fetch_boxscore_html(pfr_game_id, session=None, base_url=PFR_BOXSCORE_URL,
+                        timeout=30):
+    """Fetch a single boxscore page.
+
+    :param str pfr_game_id: pfr game ID, e.g. '202409050kan'
+    :param requests.Session session: session to reuse, if any
+    :param str base_url: boxscores URL
+    :param float timeout: request timeout in seconds
+    :return: response for the boxscore page
+    :rtype: requests.Response
+    """
+    getter = session if session is not None else requests
+    url = f"{base_url}/{pfr_game_id}.htm"
+    return getter.get(url, headers=HEADERS, timeout=timeout)
+
+
+async def fetch_with_retry(session, bucket, pfr_game_id, base_url,
+                           max_retries, backoff):
+    """Fetch a boxscore page, retrying on throttling and server errors.
+
+    :param requests.Session session: pooled session
+    :param TokenBucket bucket: rate limiter shared by all requests
+    :param str pfr_game_id: pfr game ID
+    :param str base_url: boxscores URL
+    :param int max_retries: number of retries after the first attempt
+    :param float backoff: base backoff in seconds
+    :return: boxscore html
+    :rtype: str
+    :raises requests.HTTPError: on a non-retryable status, or when retries
+        run out
+    """
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        try:
+            response = await asyncio.to_thread(
+                fetch_boxscore_html, pfr_game_id, session, base_url
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            response = None
+        else:
+            if response.status_code == 200:
+                return response.text
+            if (response.status_code not in RETRY_STATUSES
+                    or attempt == max_retries):
+                response.raise_for_status()
+                raise requests.HTTPError(
+                    f"Unexpected status {response.status_code} for {pfr_game_id}",
+                    response=response,
+                )
+        delay = get_retry_delay(response, attempt, backoff)
+        if response is not None and response.status_code == 429:
+            bucket.drain(delay)
+        await asyncio.sleep(delay)
+
+
+async def fetch_boxscores(pfr_game_ids, save, rate, burst=1, max_concurrency=4,
+                          max_retries=5, backoff=2.0,
+                          base_url=PFR_BOXSCORE_URL):
+    """Fetch many boxscores concurrently under a shared request budget.
+
+    :param Iterable[str] pfr_game_ids: pfr game IDs to fetch
+    :param callable save: called as ``save(pfr_game_id, html)`` on a worker
+        thread once a page has been fetched
+    :param float rate: max requests per second
+    :param int burst: max requests sent back-to-back
+    :param int max_concurrency: max requests in flight
+    :param int max_retries: retries per game
+    :param float backoff: base backoff in seconds
+    :param str base_url: boxscores URL
+    :return: exceptions for the games that could not be fetched
+    :rtype: dict[str, Exception]
+    """
+    bucket = TokenBucket(rate, burst)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    failures = {}
+
+    async def fetch_one(pfr_game_id):
+        async with semaphore:
+            try:
+                html = await fetch_with_retry(session, bucket, pfr_game_id,
+                                              base_url, max_retries, backoff)
+                await asyncio.to_thread(save, pfr_game_id, html)
+            except Exception as e:
+                print(f"Failed to fetch boxscore for game ID {pfr_game_id}: {e}")
+                failures[pfr_game_id] = e
+            else:
+                print(f"Fetched boxscore for game ID: {pfr_game_id}")
+
+    with make_session(max_concurrency) as session:
+        await asyncio.gather(*(fetch_one(i) for i in pfr_game_ids))
+    return failures
 
 
 if __name__ == "__main__":
-    from src.config.config import PATHS
+    from src.config.config import PATHS, PFR_FETCH
+    from src.data.pfr.archive import BoxscoreArchive, import_html_files
 
     raw_games_path = PATHS['raw_games']
     pfr_data_path = PATHS['pfr_data']
+    pfr_archive_path = PATHS['pfr_archive']
 
     games = pl.scan_csv(raw_games_path)
     games = games.filter(
@@ -30,13 +232,18 @@ if __name__ == "__main__":
     )
 
     pfr_game_ids = games.collect().get_column('pfr').to_list()
-    existing_pfr_game_ids = [f[:-5] for f in os.listdir(pfr_data_path)]
-    # print(existing_pfr_game_ids)
-
-    for game_id in pfr_game_ids:
-        if game_id not in existing_pfr_game_ids:
-            print(f"Fetching boxscore for game ID: {game_id}")
-            sleep(6.0042069)
-            html = fetch_boxscore_html(game_id)
-            with open(pfr_data_path / f"{game_id}.html", "w") as f:
-                f.write(html)
+    with BoxscoreArchive(pfr_archive_path) as archive:
+        # move any boxscores saved as loose html files into the archive
+        if pfr_data_path.exists():
+            legacy_ids = get_existing_pfr_ids(pfr_data_path) - archive.ids()
+            import_html_files(archive, [pfr_data_path / f"{i}.html"
+                                        for i in sorted(legacy_ids)])
+        existing_pfr_game_ids = archive.ids()
+        missing_pfr_game_ids = [i for i in pfr_game_ids
+                                if i not in existing_pfr_game_ids]
+        print(f"Fetching {len(missing_pfr_game_ids)} boxscores...")
+
+        failures = asyncio.run(fetch_boxscores(missing_pfr_game_ids,
+                                               archive.put, **PFR_FETCH))
+    if failures:
+        print(f"Failed to fetch {len(failures)} boxscores: {sorted(failures)}")
@@ -0,0 +1,136 @@
+"""Parquet staging store for the boxscore tables.
+
+Each table is hive-partitioned by season, so that build.py can scan it lazily
+and have season filters prune whole files and column selections reach the
+parquet reader.
+
+Layout::
+
+    boxscore-stats/
+        player_offense/
+            season=1999/data.parquet
+            season=2000/data.parquet
+            ...
+        team_stats/
+        drives/
+        starters/
+"""
+
+import shutil
+
+import polars as pl
+
+
+def pfr_season():
+    """Get the season of a game from its pfr game ID.
+
+    pfr game IDs start with the game date, e.g. '202501050kan'. Games played
+    in January and February belong to the previous season.
+
+    :return: season expression
+    :rtype: pl.Expr
+    """
+    year = pl.col('pfr').str.slice(0, 4).cast(pl.Int32)
+    month = pl.col('pfr').str.slice(4, 2).cast(pl.Int32)
+    return (year - (month < 3).cast(pl.Int32)).alias('season')
+
+
+def get_partition_path(store_path, name, season):
+    """Get the path of a season partition.
+
+    :param pathlib.Path store_path: store directory
+    :param str name: table name
+    :param int season: season
+    :return: partition file path
+    :rtype: pathlib.Path
+    """
+    return store_path / name / f"season={season}" / "data.parquet"
+
+
+def write_partitions(table, store_path, name):
+    """Write a table into its season partitions, replacing those seasons.
+
+    :param pl.DataFrame table: table with a pfr column
+    :param pathlib.Path store_path: store directory
+    :param str name: table name
+    :return: None
+    :rtype: None
+    """
+    table = table.with_columns(pfr_season())
+    for (season,), partition in table.group_by('season', maintain_order=True):
+        path = get_partition_path(store_path, name, season)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partition.drop('season').write_parquet(path)
+
+
+def write_parquet_store(tables, store_path):
+    """Write the boxscore tables to the store, replacing what's there.
+
+    :param dict[str, pl.LazyFrame] tables: one table per name
+    :param pathlib.Path store_path: store directory
+    :return: None
+    :rtype: None
+    """
+    for name, table in tables.items():
+        shutil.rmtree(store_path / name, ignore_errors=True)
+        write_partitions(table.collect(), store_path, name)
+
+
+def upsert_parquet_store(tables, store_path, pfr_ids):
+    """Replace the rows for a set of games in the store.
+
+    Only the partitions for the seasons of those games are rewritten.
+
+    :param dict[str, pl.LazyFrame] tables: one table per name
+    :param pathlib.Path store_path: store directory
+    :param list[str] pfr_ids: pfr game IDs being replaced
+    :return: None
+    :rtype: None
+    """
+    for name, table in tables.items():
+        table = table.collect()
+        seasons = table.select(pfr_season().unique()).to_series().to_list()
+        partitions = [table]
+        for season in seasons:
+            path = get_partition_path(store_path, name, season)
+            if path.exists():
+                partitions.insert(0, pl.read_parquet(path)
+                                  .filter(~pl.col('pfr').is_in(pfr_ids)))
+        write_partitions(pl.concat(partitions, how='diagonal_relaxed'),
+                         store_path, name)
+
+
+def has_table(store_path, name):
+    """Check whether the store holds a table.
+
+    :param pathlib.Path store_path: store directory
+    :param str name: table name
+    :return: whether any partitions exist for the table
+    :rtype: bool
+    """
+    return any((store_path / name).glob('season=*/data.parquet'))
+
+
+def scan_parquet_store(store_path, name):
+    """Lazily scan a table from the store.
+
+    Partitions can have different columns (e.g. a starters position that only
+    appears in some seasons), so the scan uses the union of the partition
+    schemas and fills missing columns with nulls. Only parquet footers are
+    read to build the schema.
+
+    :param pathlib.Path store_path: store directory
+    :param str name: table name
+    :return: table with a season column
+    :rtype: pl.LazyFrame
+    """
+    schema = {}
+    for path in sorted((store_path / name).glob('season=*/data.parquet')):
+        schema.update(pl.read_parquet_schema(path))
+    return pl.scan_parquet(
+        store_path / name,
+        hive_partitioning=True,
+        hive_schema={'season': pl.Int32},
+        schema=schema,
+        missing_columns='insert',
+    )
@@ -1,24 +1,58 @@
+import argparse
+import hashlib
 import os
+import multiprocessing
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from bs4 import BeautifulSoup
 from bs4 import Comment
 import polars as pl
 import pandas as pd
 
+from src.data.pfr.archive import BoxscoreArchive
+from src.data.pfr.extract import TABLE_IDS, extract_table_rows
+from src.data.pfr.store import (has_table,
+                                upsert_parquet_store,
+                                write_parquet_store)
+
+
+TABLE_NAMES = ['player_offense', 'team_stats', 'drives', 'starters']
+CONCAT_HOW = {
+    'player_offense': 'vertical',
+    'team_stats': 'vertical',
+    'drives': 'vertical',
+    'starters': 'diagonal',
+}
+
 
 def extract_row(tr):
     """"""
     return [cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
 
 
-def extract_player_offense_table(soup, pfr_id):
-    """"""
-    table = soup.find("table", {"id": "player_offense"})
-    all_rows = []
-    for tr in table.find_all("tr"):
-        row = extract_row(tr)
-        if row[0] != "" and row[0] != "Player":
-            all_rows.append(row)
+def extract_table_rows_bs4(soup, table_id):
+    """Extract the rows of a table from a soup.
+
+    :param bs4.BeautifulSoup soup: parsed html
+    :param str table_id: id of the table
+    :return: cell text for each row
+    :rtype: list[list[str]]
+    """
+    table = soup.find("table", {"id": table_id})
+    return [extract_row(tr) for tr in table.find_all("tr")]
+
+
+def make_player_offense_table(rows, pfr_id):
+    """Build the player offense table from its rows.
+
+    :param list[list[str]] rows: cell text for each row
+    :param str pfr_id: pfr game ID
+    :return: player offense table
+    :rtype: pl.LazyFrame
+    """
+    all_rows = [row for row in rows if row[0] != "" and row[0] != "Player"]
     col_names = [
         "player",
         "team",
@@ -54,10 +88,15 @@ def extract_player_offense_table(soup, pfr_id):
     )
 
 
-def extract_team_stats_table(soup, pfr_id):
-    """"""
-    table = soup.find("table", {"id": "team_stats"})
-    all_rows = [extract_row(tr) for tr in table.find_all("tr")]
+def make_team_stats_table(rows, pfr_id):
+    """Build the team stats table from its rows.
+
+    :param list[list[str]] rows: cell text for each row
+    :param str pfr_id: pfr game ID
+    :return: team stats table, away team and home team
+    :rtype: tuple[pl.LazyFrame, str, str]
+    """
+    all_rows = list(rows)
     away_team, home_team = all_rows.pop(0)[1:3]
     col_names = ['stat', away_team, home_team]
     team_stats = (
@@ -73,61 +112,57 @@ def extract_team_stats_table(soup, pfr_id):
     return team_stats, away_team, home_team
 
 
-def extract_drives_table(soup, away_team, home_team, pfr_id):
-    """"""
-    away_table = soup.find("table", {"id": "vis_drives"})
-    away_rows = [extract_row(tr) for tr in away_table.find_all("tr")]
-    col_names = away_rows.pop(0)
-    col_names[0] = "num"
-    away_drive = (
-        pl.LazyFrame(away_rows, schema=col_names, orient="row")
-        .with_columns(
-            pl.col('num', 'Quarter', 'Plays', 'Net Yds').cast(pl.Int32, strict=False),
-            team=pl.lit(away_team),
-            pfr=pl.lit(pfr_id)
-        )
-    )
-    home_table = soup.find("table", {"id": "home_drives"})
-    home_rows = [extract_row(tr) for tr in home_table.find_all("tr")]
-    col_names = home_rows.pop(0)
+def make_team_drives_table(rows, team, pfr_id):
+    """Build one team's drives table from its rows.
+
+    :param list[list[str]] rows: cell text for each row
+    :param str team: team abbreviation
+    :param str pfr_id: pfr game ID
+    :return: drives table
+    :rtype: pl.LazyFrame
+    """
+    all_rows = list(rows)
+    col_names = list(all_rows.pop(0))
     col_names[0] = "num"
-    home_drive = (
-        pl.LazyFrame(home_rows, schema=col_names, orient="row")
+    return (
+        pl.LazyFrame(all_rows, schema=col_names, orient="row")
         .with_columns(
             pl.col('num', 'Quarter', 'Plays', 'Net Yds').cast(pl.Int32, strict=False),
-            team=pl.lit(home_team),
+            team=pl.lit(team),
             pfr=pl.lit(pfr_id)
         )
     )
+
+
+def make_drives_table(away_rows, home_rows, away_team, home_team, pfr_id):
+    """Build the drives table from the away and home drives rows.
+
+    :param list[list[str]] away_rows: cell text for each away row
+    :param list[list[str]] home_rows: cell text for each home row
+    :param str away_team: away team abbreviation
+    :param str home_team: home team abbreviation
+    :param str pfr_id: pfr game ID
+    :return: drives table
+    :rtype: pl.LazyFrame
+    """
+    away_drive = make_team_drives_table(away_rows, away_team, pfr_id)
+    home_drive = make_team_drives_table(home_rows, home_team, pfr_id)
     return pl.concat([away_drive, home_drive], how="vertical")
 
 
-def extract_starters_table(soup, away_team, home_team, pfr_id):
-    """"""
-    away_table = soup.find("table", {"id": "vis_starters"})
-    away_rows = [extract_row(tr) for tr in away_table.find_all("tr")]
-    col_names = away_rows.pop(0)
-    away_starters = (
-        pl.DataFrame(away_rows, schema=col_names, orient="row")
-        .with_columns(
-            pl.col('Pos').cum_count().over('Pos').alias('num'),
-        )
-        .with_columns(
-            pl.col('Pos') + "_" + pl.col('num').cast(pl.Utf8),
-        )
-        .select('Pos', 'Player')
-        .transpose(column_names="Pos")
-        .lazy()
-        .with_columns(
-            team=pl.lit(away_team),
-            pfr=pl.lit(pfr_id),
-        )
-    )
-    home_table = soup.find("table", {"id": "home_starters"})
-    home_rows = [extract_row(tr) for tr in home_table.find_all("tr")]
-    col_names = home_rows.pop(0)
-    home_starters = (
-        pl.DataFrame(home_rows, schema=col_names, orient="row")
+def make_team_starters_table(rows, team, pfr_id):
+    """Build one team's starters table from its rows.
+
+    :param list[list[str]] rows: cell text for each row
+    :param str team: team abbreviation
+    :param str pfr_id: pfr game ID
+    :return: starters table with one column per position
+    :rtype: pl.LazyFrame
+    """
+    all_rows = list(rows)
+    col_names = all_rows.pop(0)
+    return (
+        pl.DataFrame(all_rows, schema=col_names, orient="row")
         .with_columns(
             pl.col('Pos').cum_count().over('Pos').alias('num'),
         )
@@ -138,90 +173,235 @@ def extract_starters_table(soup, away_team, home_team, pfr_id):
         .transpose(column_names="Pos")
         .lazy()
         .with_columns(
-            team=pl.lit(home_team),
+            team=pl.lit(team),
             pfr=pl.lit(pfr_id),
         )
     )
+
+
+def make_starters_table(away_rows, home_rows, away_team, home_team, pfr_id):
+    """Build the starters table from the away and home starters rows.
+
+    :param list[list[str]] away_rows: cell text for each away row
+    :param list[list[str]] home_rows: cell text for each home row
+    :param str away_team: away team abbreviation
+    :param str home_team: home team abbreviation
+    :param str pfr_id: pfr game ID
+    :return: starters table
+    :rtype: pl.LazyFrame
+    """
+    away_starters = make_team_starters_table(away_rows, away_team, pfr_id)
+    home_starters = make_team_starters_table(home_rows, home_team, pfr_id)
     return pl.concat([away_starters, home_starters], how="diagonal")
 
 
-if __name__ == "__main__":
-    from src.config.config import PATHS
+def extract_player_offense_table(soup, pfr_id):
+    """"""
+    rows = extract_table_rows_bs4(soup, "player_offense")
+    return make_player_offense_table(rows, pfr_id)
+
+
+def extract_team_stats_table(soup, pfr_id):
+    """"""
+    rows = extract_table_rows_bs4(soup, "team_stats")
+    return make_team_stats_table(rows, pfr_id)
+
+
+def extract_drives_table(soup, away_team, home_team, pfr_id):
+    """"""
+    away_rows = extract_table_rows_bs4(soup, "vis_drives")
+    home_rows = extract_table_rows_bs4(soup, "home_drives")
+    return make_drives_table(away_rows, home_rows, away_team, home_team, pfr_id)
+
+
+def extract_starters_table(soup, away_team, home_team, pfr_id):
+    """"""
+    away_rows = extract_table_rows_bs4(soup, "vis_starters")
+    home_rows = extract_table_rows_bs4(soup, "home_starters")
+    return make_starters_table(away_rows, home_rows, away_team, home_team,
+                               pfr_id)
+
+
+def extract_all_table_rows_bs4(html):
+    """Extract the rows of every table we use with BeautifulSoup.
+
+    This is the reference implementation for extract.extract_table_rows.
+
+    :param str html: boxscore html
+    :return: cell text for each row of each table
+    :rtype: dict[str, list[list[str]]]
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    table_rows = {'player_offense': extract_table_rows_bs4(soup, 'player_offense')}
+    # the remaining tables are commented out in the page source
+    comments = soup.find_all(string=lambda text: isinstance(text, Comment))
+    html = "\n".join([str(c) for c in comments])
+    soup = BeautifulSoup(html, "html.parser")
+    for table_id in TABLE_IDS[1:]:
+        table_rows[table_id] = extract_table_rows_bs4(soup, table_id)
+    return table_rows
+
+
+def parse_boxscore(html, pfr_id, engine='fast'):
+    """Parse every table we use from a single boxscore page.
+
+    :param str html: boxscore html
+    :param str pfr_id: pfr game ID
+    :param str engine: 'fast' for the single-pass extractor in extract.py,
+        'bs4' for BeautifulSoup
+    :return: player_offense, team_stats, drives and starters tables
+    :rtype: dict[str, pl.DataFrame]
+    """
+    if engine == 'fast':
+        rows = extract_table_rows(html)
+    elif engine == 'bs4':
+        rows = extract_all_table_rows_bs4(html)
+    else:
+        raise ValueError("engine must be 'fast' or 'bs4'")
+    player_offense = make_player_offense_table(rows['player_offense'], pfr_id)
+    team_stats, away_team, home_team = make_team_stats_table(rows['team_stats'],
+                                                             pfr_id)
+    drives = make_drives_table(rows['vis_drives'], rows['home_drives'],
+                               away_team, home_team, pfr_id)
+    starters = make_starters_table(rows['vis_starters'], rows['home_starters'],
+                                   away_team, home_team, pfr_id)
+    tables = pl.collect_all([player_offense, team_stats, drives, starters])
+    return dict(zip(TABLE_NAMES, tables))
+
+
+def concat_tables(parsed_tables):
+    """Concatenate parsed tables by name.
+
+    :param list[dict[str, pl.DataFrame]] parsed_tables: tables from
+        parse_boxscore or parse_boxscore_files
+    :return: one table per name
+    :rtype: dict[str, pl.DataFrame]
+    """
+    return {
+        name: pl.concat([t[name] for t in parsed_tables], how=CONCAT_HOW[name])
+        for name in TABLE_NAMES
+    }
 
-    pfr_path = PATHS['pfr_data']
-    boxscore_stats_path = PATHS['boxscore_stats']
 
-    player_offense_tables = []
-    team_stats_tables = []
-    drives_tables = []
-    starters_tables = []
-    file_list = [f for f in os.listdir(pfr_path) if f.endswith('.html')]
-    for file in sorted(file_list):
-        print(f"Processing file: {file}")
-        with open(pfr_path / file, 'r') as f:
+def parse_boxscore_files(paths, engine='fast'):
+    """Parse a shard of boxscore files.
+
+    This is the unit of work for a process pool worker, so it returns one
+    frame per table for the whole shard rather than one per file.
+
+    :param list[pathlib.Path] paths: boxscore html files
+    :param str engine: 'fast' or 'bs4', see parse_boxscore
+    :return: one table per name
+    :rtype: dict[str, pl.DataFrame]
+    """
+    parsed_tables = []
+    for path in paths:
+        with open(path, 'r') as f:
             html = f.read()
-        soup = BeautifulSoup(html, "html.parser")
-        pfr_id = file[:-5]
-        t = extract_player_offense_table(soup, pfr_id)
-        player_offense_tables.append(t)
-        comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-        html = "\n".join([str(c) for c in comments])
-        soup = BeautifulSoup(html, "html.parser")
-        t, away_team, home_team = extract_team_stats_table(soup, pfr_id)
-        team_stats_tables.append(t)
-        t = extract_drives_table(soup, away_team, home_team, pfr_id)
-        drives_tables.append(t)
-        t = extract_starters_table(soup, away_team, home_team, pfr_id)
-        starters_tables.append(t)
-
-
-
-    # player offense
+        parsed_tables.append(parse_boxscore(html, path.stem, engine))
+    return concat_tables(parsed_tables)
+
+
+def parse_archived_boxscores(pfr_ids, archive_path, engine='fast'):
+    """Parse a shard of archived boxscores.
+
+    Each worker opens its own read handle on the archive.
+
+    :param list[str] pfr_ids: pfr game IDs
+    :param pathlib.Path archive_path: boxscore archive directory
+    :param str engine: 'fast' or 'bs4', see parse_boxscore
+    :return: one table per name
+    :rtype: dict[str, pl.DataFrame]
+    """
+    with BoxscoreArchive(archive_path) as archive:
+        parsed_tables = [parse_boxscore(archive.get(pfr_id), pfr_id, engine)
+                         for pfr_id in pfr_ids]
+    return concat_tables(parsed_tables)
+
+
+def make_shards(paths, n_shards):
+    """Split a list of paths into contiguous shards of near-equal size.
+
+    :param list paths: paths to split
+    :param int n_shards: number of shards
+    :return: shards
+    :rtype: list[list]
+    """
+    size, extra = divmod(len(paths), n_shards)
+    shards, start = [], 0
+    for i in range(n_shards):
+        end = start + size + (i < extra)
+        shards.append(paths[start:end])
+        start = end
+    return [s for s in shards if s]
+
+
+def parse_boxscores(paths, n_jobs=None, shards_per_job=4, engine='fast',
+                    archive_path=None):
+    """Parse boxscores, sharded across a process pool.
+
+    Each worker parses whole shards and returns a frame per table, and the
+    shards are concatenated once at the end.
+
+    :param list paths: boxscore html files, or pfr game IDs if reading from
+        an archive
+    :param int n_jobs: number of worker processes. Defaults to the number of
+        CPUs. 1 parses serially in this process.
+    :param int shards_per_job: shards per worker, to even out slow shards
+    :param str engine: 'fast' or 'bs4', see parse_boxscore
+    :param pathlib.Path archive_path: boxscore archive directory. If None,
+        boxscores are read from html files.
+    :return: one table per name
+    :rtype: dict[str, pl.DataFrame]
+    """
+    if archive_path is None:
+        worker = partial(parse_boxscore_files, engine=engine)
+    else:
+        worker = partial(parse_archived_boxscores, archive_path=archive_path,
+                         engine=engine)
+    n_jobs = min(n_jobs or os.cpu_count(), max(len(paths), 1))
+    if n_jobs == 1:
+        return worker(paths)
+    shards = make_shards(paths, n_jobs * shards_per_job)
+    parsed_tables = []
+    # polars is not fork-safe, so workers are spawned
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+        for i, tables in enumerate(executor.map(worker, shards)):
+            print(f"Parsed shard {i + 1} of {len(shards)}")
+            parsed_tables.append(tables)
+    return concat_tables(parsed_tables)
+
+
+def build_tables(parsed_tables):
+    """Sort and clean the parsed tables before writing them.
+
+    :param dict[str, pl.DataFrame] parsed_tables: one table per name
+    :return: one table per name
+    :rtype: dict[str, pl.LazyFrame]
+    """
     player_offense = (
-        pl.concat(player_offense_tables, how="vertical")
+        parsed_tables['player_offense']
+        .lazy()
         .sort(
             ["pfr", "team", "pass_attempts", "rush_attempts", "targets"],
             descending=[False, False, True, True, True],
         )
         .fill_null(0)
     )
-    print(player_offense.collect().glimpse())
-    player_offense.collect().write_database(
-        table_name='player_offense',
-        connection=f"sqlite:///{boxscore_stats_path}",
-        engine='sqlalchemy',
-        if_table_exists='replace'
-    )
-
-    # team stats
     team_stats = (
-        pl.concat(team_stats_tables, how="vertical")
+        parsed_tables['team_stats']
+        .lazy()
         .sort(["pfr", "team"], descending=[False, False])
     )
-    print(team_stats.collect())
-    team_stats.collect().write_database(
-        table_name='team_stats',
-        connection=f"sqlite:///{boxscore_stats_path}",
-        engine='sqlalchemy',
-        if_table_exists='replace'
-    )
-
-    # drives
     drives = (
-        pl.concat(drives_tables, how="vertical")
+        parsed_tables['drives']
+        .lazy()
         .sort(["pfr", "team", "num"], descending=[False, False, False])
     )
-    print(drives.collect())
-    drives.collect().write_database(
-        table_name='drives',
-        connection=f"sqlite:///{boxscore_stats_path}",
-        engine='sqlalchemy',
-        if_table_exists='replace'
-    )
-
-    # starters
     starters = (
-        pl.concat(starters_tables, how="diagonal")
+        parsed_tables['starters']
+        .lazy()
         .select(
             pl.col('team'),
             pl.all().exclude('team', 'pfr'),
@@ -229,10 +409,249 @@ if __name__ == "__main__":
         )
         .sort(["pfr", "team"], descending=[False, False])
     )
-    print(starters.collect())
-    starters.collect().write_database(
-        table_name='starters',
-        connection=f"sqlite:///{boxscore_stats_path}",
-        engine='sqlalchemy',
-        if_table_exists='replace'
-    )
+    return {
+        'player_offense': player_offense,
+        'team_stats': team_stats,
+        'drives': drives,
+        'starters': starters,
+    }
+
+
+def read_tables(boxscore_stats_path):
+    """Read the boxscore tables back from the boxscore stats database.
+
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :return: one table per name
+    :rtype: dict[str, pl.LazyFrame]
+    """
+    with sqlite3.connect(boxscore_stats_path) as conn:
+        return {
+            name: pl.read_database(query=f'select * from "{name}"',
+                                   connection=conn,
+                                   infer_schema_length=None).lazy()
+            for name in TABLE_NAMES
+        }
+
+
+def write_tables(tables, boxscore_stats_path, if_table_exists='replace'):
+    """Write the boxscore tables to the boxscore stats database.
+
+    :param dict[str, pl.LazyFrame] tables: one table per name
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :param str if_table_exists: 'replace' or 'append'
+    :return: None
+    :rtype: None
+    """
+    for name, table in tables.items():
+        table = table.collect()
+        print(table)
+        table.write_database(
+            table_name=name,
+            connection=f"sqlite:///{boxscore_stats_path}",
+            engine='sqlalchemy',
+            if_table_exists=if_table_exists
+        )
+
+
+def hash_file(path):
+    """Hash the contents of a file.
+
+    :param pathlib.Path path: file to hash
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def read_manifest(boxscore_stats_path):
+    """Read the manifest of boxscore files already parsed into the database.
+
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :return: (mtime_ns, size, sha256) for each parsed pfr game ID
+    :rtype: dict[str, tuple[int, int, str]]
+    """
+    with sqlite3.connect(boxscore_stats_path) as conn:
+        conn.execute(
+            "create table if not exists parsed_files "
+            "(pfr text primary key, mtime_ns integer, size integer, sha256 text)"
+        )
+        rows = conn.execute(
+            "select pfr, mtime_ns, size, sha256 from parsed_files"
+        ).fetchall()
+    return {pfr: (mtime_ns, size, sha256) for pfr, mtime_ns, size, sha256 in rows}
+
+
+def write_manifest(boxscore_stats_path, entries, replace=False):
+    """Record boxscore files as parsed.
+
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :param list[tuple] entries: (pfr, mtime_ns, size, sha256) rows
+    :param bool replace: clear the manifest first
+    :return: None
+    :rtype: None
+    """
+    with sqlite3.connect(boxscore_stats_path) as conn:
+        conn.execute(
+            "create table if not exists parsed_files "
+            "(pfr text primary key, mtime_ns integer, size integer, sha256 text)"
+        )
+        if replace:
+            conn.execute("delete from parsed_files")
+        conn.executemany(
+            "insert or replace into parsed_files values (?, ?, ?, ?)", entries
+        )
+
+
+def make_manifest_entry(path, sha256=None):
+    """Make a manifest row for a boxscore file.
+
+    :param pathlib.Path path: boxscore html file
+    :param str sha256: contents hash, if already known
+    :return: (pfr, mtime_ns, size, sha256)
+    :rtype: tuple
+    """
+    stat = path.stat()
+    sha256 = sha256 or hash_file(path)
+    return (path.stem, stat.st_mtime_ns, stat.st_size, sha256)
+
+
+def find_stale_files(paths, manifest):
+    """Find the boxscore files that are new or have changed since they were
+    parsed.
+
+    The mtime and size are checked first, so unchanged files are never read.
+    Files with a new mtime are hashed, and only count as changed if their
+    contents did.
+
+    :param list[pathlib.Path] paths: boxscore html files
+    :param dict manifest: output of read_manifest
+    :return: manifest rows for stale files, and for files that were touched
+        without their contents changing
+    :rtype: tuple[list[tuple], list[tuple]]
+    """
+    stale, touched = [], []
+    for path in paths:
+        stat = path.stat()
+        known = manifest.get(path.stem)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            continue
+        entry = make_manifest_entry(path)
+        if known is not None and known[2] == entry[3]:
+            touched.append(entry)
+        else:
+            stale.append(entry)
+    return stale, touched
+
+
+def find_stale_archived_pages(digests, manifest):
+    """Find the archived boxscores that are new or have changed since they
+    were parsed.
+
+    The archive is content-addressed, so its digests are compared directly
+    and no page has to be read.
+
+    :param dict[str, str] digests: sha256 digest for each archived pfr ID
+    :param dict manifest: output of read_manifest
+    :return: manifest rows for stale pages
+    :rtype: list[tuple]
+    """
+    return [(pfr_id, None, None, sha256)
+            for pfr_id, sha256 in sorted(digests.items())
+            if manifest.get(pfr_id, (None, None, None))[2] != sha256]
+
+
+def get_sqlite_type(dtype):
+    """Map a polars dtype to a SQLite column type.
+
+    :param pl.DataType dtype: polars dtype
+    :return: SQLite column type
+    :rtype: str
+    """
+    if dtype.is_integer():
+        return 'INTEGER'
+    if dtype.is_float():
+        return 'REAL'
+    return 'TEXT'
+
+
+def upsert_tables(tables, boxscore_stats_path, pfr_ids, chunk_size=500):
+    """Replace the rows for a set of games in the boxscore tables.
+
+    Existing rows for the games are deleted and the new rows are appended.
+    Columns that a table doesn't have yet (e.g. a starters position that has
+    never appeared before) are added first.
+
+    :param dict[str, pl.LazyFrame] tables: one table per name
+    :param pathlib.Path boxscore_stats_path: SQLite database path
+    :param list[str] pfr_ids: pfr game IDs being replaced
+    :param int chunk_size: max pfr IDs per delete statement
+    :return: None
+    :rtype: None
+    """
+    with sqlite3.connect(boxscore_stats_path) as conn:
+        for name, table in tables.items():
+            existing = [row[1] for row in
+                        conn.execute(f'pragma table_info("{name}")')]
+            if not existing:
+                continue
+            for i in range(0, len(pfr_ids), chunk_size):
+                chunk = pfr_ids[i:i + chunk_size]
+                placeholders = ', '.join('?' * len(chunk))
+                conn.execute(
+                    f'delete from "{name}" where pfr in ({placeholders})', chunk
+                )
+            for col, dtype in table.collect_schema().items():
+                if col not in existing:
+                    conn.execute(
+                        f'alter table "{name}" add column "{col}" '
+                        f'{get_sqlite_type(dtype)}'
+                    )
+    write_tables(tables, boxscore_stats_path, if_table_exists='append')
+
+
+if __name__ == "__main__":
+    from src.config.config import PATHS
+
+    parser = argparse.ArgumentParser(description="Parse boxscore tables.")
+    parser.add_argument('--full', action='store_true',
+                        help="reparse every file and rewrite every table")
+    args = parser.parse_args()
+
+    pfr_path = PATHS['pfr_data']
+    archive_path = PATHS['pfr_archive']
+    boxscore_stats_path = PATHS['boxscore_stats']
+    boxscore_store_path = PATHS['boxscore_store']
+
+    manifest = {} if args.full else read_manifest(boxscore_stats_path)
+    if (archive_path / 'index.db').exists():
+        with BoxscoreArchive(archive_path) as archive:
+            digests = archive.digests()
+        stale = find_stale_archived_pages(digests, manifest)
+        touched = []
+        sources = [e[0] for e in stale]
+    else:
+        archive_path = None
+        paths = sorted(pfr_path.glob('*.html'))
+        stale, touched = find_stale_files(paths, manifest)
+        sources = [pfr_path / f"{e[0]}.html" for e in stale]
+
+    store_is_complete = all(has_table(boxscore_store_path, name)
+                            for name in TABLE_NAMES)
+    if manifest and not store_is_complete:
+        print("Backfilling the parquet store from the database...")
+        write_parquet_store(read_tables(boxscore_stats_path),
+                            boxscore_store_path)
+
+    print(f"Parsing {len(stale)} new or changed boxscores...")
+    if stale:
+        parsed_tables = parse_boxscores(sources, archive_path=archive_path)
+        tables = build_tables(parsed_tables)
+        if args.full:
+            write_tables(tables, boxscore_stats_path)
+            write_parquet_store(tables, boxscore_store_path)
+        else:
+            pfr_ids = [e[0] for e in stale]
+            upsert_tables(tables, boxscore_stats_path, pfr_ids)
+            upsert_parquet_store(tables, boxscore_store_path, pfr_ids)
+    write_manifest(boxscore_stats_path, stale + touched, replace=args.full)
@@ -0,0 +1,56 @@
+"""Lazy scans of the nflverse play-by-play data.
+
+There is one ``play_by_play_{season}.parquet`` file per season, with a few
+hundred columns each. Scanning them lazily, selecting only the columns a
+consumer needs and filtering to regular season plays with a possession team
+in the scan means a query only reads those columns and keeps those rows.
+Aggregations over the scan can then run on the streaming engine without
+holding every play in memory.
+"""
+
+import polars as pl
+
+
+def get_plays_paths(raw_plays_path, seasons):
+    """Get the play-by-play file of each season.
+
+    :param pathlib.Path raw_plays_path: play-by-play directory
+    :param Iterable[int] seasons: seasons
+    :return: file paths
+    :rtype: list[pathlib.Path]
+    """
+    return [raw_plays_path / f"play_by_play_{season}.parquet"
+            for season in seasons]
+
+
+def clean_plays(raw_plays):
+    """Keep regular season plays with a possession team.
+
+    :param pl.LazyFrame raw_plays: raw play-by-play data
+    :return: cleaned plays
+    :rtype: pl.LazyFrame
+    """
+    return raw_plays.filter(
+        pl.col('season_type') == 'REG',
+        pl.col('posteam').is_not_null(),
+        ~pl.col('posteam').is_in(['', 'None']),
+    )
+
+
+def scan_plays(raw_plays_path, seasons, columns):
+    """Lazily scan the cleaned plays of several seasons.
+
+    Column types drift between seasons, so each file is scanned on its own
+    and the scans are concatenated with relaxed types.
+
+    :param pathlib.Path raw_plays_path: play-by-play directory
+    :param Iterable[int] seasons: seasons to scan
+    :param list[str] columns: columns to keep
+    :return: cleaned plays
+    :rtype: pl.LazyFrame
+    """
+    return pl.concat(
+        [pl.scan_parquet(path).pipe(clean_plays).select(columns)
+         for path in get_plays_paths(raw_plays_path, seasons)],
+        how='vertical_relaxed',
+    )
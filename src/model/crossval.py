@@ -0,0 +1,105 @@
+"""Cross validation over cached folds.
+
+Only the final estimator of a pipeline is tuned (see DEFAULT_PARAM_PREFIX),
+so the steps before it, such as column reduction and scaling, fit the same
+way for every set of hyperparameters. make_folds splits a dataset once, fits
+those steps on each training fold and keeps the transformed fold matrices.
+Every hyperparameter trial and the final evaluation then only fit the final
+estimator on the cached matrices, with the folds fitted in parallel. Folds
+fitted in parallel fit their estimators on one thread each, since
+estimators like LightGBM otherwise use every CPU in every fold.
+"""
+
+import time
+from collections import namedtuple
+
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.pipeline import Pipeline
+
+
+Fold = namedtuple('Fold', ['train', 'test', 'preprocessor',
+                           'X_train', 'y_train', 'X_test', 'y_test'])
+
+
+def make_folds(pipeline, X, y, cv):
+    """Split a dataset and preprocess each fold.
+
+    :param sklearn.pipeline.Pipeline pipeline: pipeline to evaluate
+    :param pd.DataFrame X: features, with a season column to group by
+    :param pd.Series y: target
+    :param cv: cross-validation object
+    :return: one fold per split, with the pipeline's steps before the final
+        estimator fitted on its training rows
+    :rtype: list[Fold]
+    """
+    folds = []
+    for train, test in cv.split(X, y, groups=X['season']):
+        X_train, y_train = X.iloc[train], y.iloc[train]
+        X_test, y_test = X.iloc[test], y.iloc[test]
+        preprocessor = clone(pipeline[:-1]).fit(X_train, y_train)
+        folds.append(Fold(train, test, preprocessor,
+                          preprocessor.transform(X_train), y_train,
+                          preprocessor.transform(X_test), y_test))
+    return folds
+
+
+def fit_and_score_fold(pipeline, fold, scorer, params):
+    """Fit a pipeline's final estimator on a fold and score it.
+
+    :param sklearn.pipeline.Pipeline pipeline: pipeline to evaluate
+    :param Fold fold: fold from make_folds
+    :param callable scorer: scorer taking an estimator, features and target
+    :param dict params: pipeline hyperparameters
+    :return: fit time, score time, score and the fitted pipeline
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    estimator = clone(pipeline).set_params(**params)[-1]
+    estimator.fit(fold.X_train, fold.y_train)
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    score = scorer(estimator, fold.X_test, fold.y_test)
+    score_time = time.perf_counter() - start
+    fitted = Pipeline([*fold.preprocessor.steps,
+                       (pipeline.steps[-1][0], estimator)])
+    return fit_time, score_time, score, fitted
+
+
+def get_single_thread_params(pipeline):
+    """Get the parameters that fit a pipeline's final estimator on one
+    thread.
+
+    :param sklearn.pipeline.Pipeline pipeline: pipeline to evaluate
+    :return: every ``n_jobs`` parameter of the final estimator, set to 1
+    :rtype: dict
+    """
+    name = pipeline.steps[-1][0]
+    return {f"{name}__{key}": 1 for key in pipeline[-1].get_params()
+            if key == 'n_jobs' or key.endswith('__n_jobs')}
+
+
+def cross_validate_folds(pipeline, folds, scoring, params=None, n_jobs=None):
+    """Cross validate a pipeline on cached folds.
+
+    :param sklearn.pipeline.Pipeline pipeline: pipeline to evaluate
+    :param list[Fold] folds: folds from make_folds
+    :param Union[str, callable] scoring: scoring metric, or a scorer
+        returning a score or a dict of scores
+    :param dict params: pipeline hyperparameters
+    :param int n_jobs: number of folds to fit in parallel. None fits them
+        serially, and -1 uses every CPU. Estimators fit on one thread when
+        folds are fitted in parallel.
+    :return: fit times, score times, scores and fitted pipelines, one per fold
+    :rtype: tuple[list]
+    """
+    scorer = get_scorer(scoring) if isinstance(scoring, str) else scoring
+    params = params or {}
+    if effective_n_jobs(n_jobs) > 1 and len(folds) > 1:
+        params = {**params, **get_single_thread_params(pipeline)}
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(fit_and_score_fold)(pipeline, fold, scorer, params)
+        for fold in folds
+    )
+    return tuple(list(result) for result in zip(*results))
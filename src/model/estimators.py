@@ -2,23 +2,85 @@
 
 Baseline model: Logistic Regression
 Working model: SWIFT
+
+Every estimator is calibrated with a sigmoid fitted on predictions for rows
+it wasn't trained on. In 'ensemble' calibration, the training rows are split
+into folds, the estimator is fitted without each fold and calibrated on it,
+and the calibrated estimators are averaged. In 'holdout' calibration, it is
+fitted once, on the training rows outside a fixed, stratified holdout, and
+calibrated on the holdout. The holdout only depends on the target, so it is
+the same for every hyperparameter trial on a fold, and with 3 folds a fit
+costs a third of an ensemble fit. Holdout calibration ranks hyperparameters
+much like ensemble calibration, but the averaged ensemble scores better, so
+hyperparameters are tuned with holdout calibration and models are evaluated
+and fitted with ensemble calibration.
 """
 
 import pandas as pd
+from sklearn.base import clone
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import FunctionTransformer, StandardScaler
 from sklearn.linear_model import LogisticRegression
 from lightgbm import LGBMClassifier
 from sklearn.svm import NuSVC
 from sklearn.calibration import CalibratedClassifierCV
+from sklearn.model_selection import StratifiedShuffleSplit
 
+from src.config.config import CALIBRATION
 from src.model.process import reduce_columns, drop_columns
 
 
-def build_baseline_pipeline(model_params={}):
+def make_calibration_cv(calibration):
+    """Make the splits to calibrate an estimator on.
+
+    :param dict calibration: calibration settings, with the mode, either
+        'ensemble' or 'holdout', the number of ensemble folds and the holdout
+        size
+    :return: cross-validation strategy for CalibratedClassifierCV
+    :rtype: Union[int, sklearn.model_selection.StratifiedShuffleSplit]
+    """
+    if calibration['mode'] == 'ensemble':
+        return calibration['n_folds']
+    elif calibration['mode'] == 'holdout':
+        return StratifiedShuffleSplit(n_splits=1,
+                                      test_size=calibration['holdout_size'],
+                                      random_state=0)
+    raise ValueError(f"Unknown calibration mode: {calibration['mode']}")
+
+
+def calibrate(estimator, calibration=CALIBRATION):
+    """Wrap an estimator in a sigmoid calibration.
+
+    :param sklearn.base.BaseEstimator estimator: estimator to calibrate
+    :param dict calibration: calibration settings
+    :return: calibrated estimator
+    :rtype: sklearn.calibration.CalibratedClassifierCV
+    """
+    return CalibratedClassifierCV(estimator,
+                                  cv=make_calibration_cv(calibration))
+
+
+def with_calibration(pipeline, calibration):
+    """Copy a pipeline with a different calibration.
+
+    Only the final estimator changes, so folds made for the pipeline can be
+    used for the copy.
+
+    :param sklearn.pipeline.Pipeline pipeline: pipeline built here
+    :param dict calibration: calibration settings
+    :return: unfitted copy of the pipeline
+    :rtype: sklearn.pipeline.Pipeline
+    """
+    return clone(pipeline).set_params(
+        calibratedclassifiercv__cv=make_calibration_cv(calibration)
+    )
+
+
+def build_baseline_pipeline(model_params={}, calibration=CALIBRATION):
     """Build a baseline model pipeline.
     
     :param dict model_params: estimator parameters
+    :param dict calibration: calibration settings
     :return: baseline pipeline
     :rtype: sklearn.pipeline.Pipeline
     """
@@ -28,16 +90,17 @@ def build_baseline_pipeline(model_params={}):
     kw_args = {'columns': feature_columns}
     column_reducer = FunctionTransformer(reduce_columns, kw_args=kw_args)
     estimator = LogisticRegression(**model_params)
-    calibrated_estimator = CalibratedClassifierCV(estimator, cv=3)
+    calibrated_estimator = calibrate(estimator, calibration)
     return make_pipeline(column_reducer,
                          StandardScaler(),
                          calibrated_estimator)
 
 
-def build_lgbm_pipeline(model_params={}):
+def build_lgbm_pipeline(model_params={}, calibration=CALIBRATION):
     """Build an LGBM pipeline.
     
     :param dict model_params: estimator parameters
+    :param dict calibration: calibration settings
     :return: swift pipeline
     :rtype: sklearn.pipeline.Pipeline
     """
@@ -45,15 +108,16 @@ def build_lgbm_pipeline(model_params={}):
     kw_args = {'columns': cols_to_drop}
     column_reducer = FunctionTransformer(drop_columns, kw_args=kw_args)
     estimator = LGBMClassifier(**model_params)
-    calibrated_estimator = CalibratedClassifierCV(estimator, cv=3)
+    calibrated_estimator = calibrate(estimator, calibration)
     return make_pipeline(column_reducer,
                          calibrated_estimator)
 
 
-def build_svc_pipeline(model_params={}):
+def build_svc_pipeline(model_params={}, calibration=CALIBRATION):
     """Build an SVC pipeline.
     
     :param dict model_params: estimator parameters
+    :param dict calibration: calibration settings
     :return: swift pipeline
     :rtype: sklearn.pipeline.Pipeline
     """
@@ -61,7 +125,7 @@ def build_svc_pipeline(model_params={}):
     kw_args = {'columns': cols_to_drop}
     column_reducer = FunctionTransformer(drop_columns, kw_args=kw_args)
     estimator = NuSVC(**model_params)
-    calibrated_estimator = CalibratedClassifierCV(estimator, cv=3)
+    calibrated_estimator = calibrate(estimator, calibration)
     return make_pipeline(column_reducer,
                          StandardScaler(),
                          calibrated_estimator)
@@ -3,16 +3,10 @@
 import numpy as np
 import pandas as pd
 from mlxtend.evaluate.time_series import GroupTimeSeriesSplit, print_split_info
-from sklearn.model_selection import cross_validate
-from sklearn.calibration import calibration_curve
 from sklearn.inspection import permutation_importance
-from sklearn.metrics import (brier_score_loss,
-                             log_loss,
-                             f1_score,
-                             precision_score,
-                             recall_score,
-                             roc_auc_score,
-                             confusion_matrix)
+
+from src.model.crossval import cross_validate_folds, make_folds
+from src.model.metrics import score_probabilities
 
 
 def append_array_to_scores(scores, metric_array, name):
@@ -30,30 +24,26 @@ def append_array_to_scores(scores, metric_array, name):
     return scores
 
 
-def compile_scores(y, y_pred, y_pred_proba):
+def compile_scores(y, y_pred_proba):
     """Compile a dictionary of evaluation metrics.
+
+    Predicted labels are the probabilities above 0.5, and every metric is
+    computed in one pass (see score_probabilities).
     
     :param pd.Series y: target
-    :param pd.Series y_pred: predicted target
     :param pd.Series y_pred_proba: predicted probabilities
     :return: evaluation metrics
     :rtype: dict
     """
-    tn, fp, fn, tp = confusion_matrix(y, y_pred).ravel()
-    prob_true, prob_pred = calibration_curve(y, y_pred_proba, n_bins=7,
-                                             strategy='quantile')
-    scores = {'neg_brier_score': -brier_score_loss(y, y_pred_proba),
-              'neg_log_loss': -log_loss(y, y_pred_proba),
-              'f1': f1_score(y, y_pred),
-              'precision': precision_score(y, y_pred),
-              'recall': recall_score(y, y_pred),
-              'roc_auc': roc_auc_score(y, y_pred_proba),
-              'tn': tn,
-              'fp': fp,
-              'fn': fn,
-              'tp': tp}
-    scores = append_array_to_scores(scores, prob_true, 'prob_true_bin')
-    scores = append_array_to_scores(scores, prob_pred, 'prob_pred_bin')
+    scores = score_probabilities(y, y_pred_proba, n_bins=7)
+    prob_true = scores.pop('prob_true')
+    prob_pred = scores.pop('prob_pred')
+    # empty bins are dropped, like sklearn's calibration_curve does
+    nonempty = ~np.isnan(prob_true)
+    scores = append_array_to_scores(scores, prob_true[nonempty],
+                                    'prob_true_bin')
+    scores = append_array_to_scores(scores, prob_pred[nonempty],
+                                    'prob_pred_bin')
     return scores
 
 
@@ -66,9 +56,8 @@ def custom_scorer(pipeline, X, y):
     :return: evaluation metrics
     :rtype: dict
     """
-    y_pred = pipeline.predict(X)
     y_pred_proba = pipeline.predict_proba(X)[:, 1]
-    scores = compile_scores(y, y_pred, y_pred_proba)
+    scores = compile_scores(y, y_pred_proba)
     return scores
 
 
@@ -88,22 +77,31 @@ def custom_cv(train_size, test_size, shift_size):
     return custom_cv
 
 
-def evaluate_model(pipeline, X, y, cv):
+def evaluate_model(pipeline, X, y, cv, folds=None, n_jobs=None):
     """Evaluate model using a variety of metrics.
     
     :param sklearn.pipeline.Pipeline pipeline: pipeline to evaluate
     :param pd.DataFrame X: features
     :param pd.Series y: target
     :param function cv: cross-validation object
+    :param list[Fold] folds: folds from make_folds. Made from X, y and cv if
+        None.
+    :param int n_jobs: number of folds to fit in parallel
     :return: evaluation metrics
     :rtype: pd.DataFrame
     """
-    groups = X['season']
-    scores = cross_validate(pipeline, X, y, cv=cv, groups=groups,
-                            scoring=custom_scorer, return_estimator=True)
-    estimators = scores.pop('estimator')
-    scores = pd.DataFrame(scores).T
-    num_folds = cv.get_n_splits()
+    if folds is None:
+        folds = make_folds(pipeline, X, y, cv)
+    fit_times, score_times, fold_scores, estimators = cross_validate_folds(
+        pipeline, folds, custom_scorer, n_jobs=n_jobs
+    )
+    scores = pd.DataFrame({
+        'fit_time': fit_times,
+        'score_time': score_times,
+        **{f'test_{metric}': [score[metric] for score in fold_scores]
+           for metric in fold_scores[0]},
+    }).T
+    num_folds = len(folds)
     scores.columns = [f'fold_{i+1}' for i in range(num_folds)]
     scores.index.name = 'metric'
     scores['mean'] = scores.mean(axis=1)
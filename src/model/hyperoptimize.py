@@ -1,16 +1,34 @@
 """Helper functions for optimizing model hyperparameters.
 
-Optimizer: hyperopt"""
+Optimizer: hyperopt
 
+TPE suggests trials in batches of ``batch_size``, and a batch is evaluated
+concurrently on an executor (a process pool by default). TPE only suggests
+one trial at a time once it has enough trials to model, so a batch is
+suggested one trial after another with the constant liar method: each
+suggestion is added as a pending trial with the worst loss so far before the
+next is suggested, which steers the rest of the batch away from it. The suggestions only depend on the
+seed and the batch size, not on the number of workers, so a seeded search
+gives the same trials however many cores it runs on. A batch size of 1 is
+the usual sequential TPE search.
+
+Given a TrialStore, each finished batch is saved, and a search resumes
+from the trials already stored for its study.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import cross_val_score
-from hyperopt import fmin, tpe, space_eval
-from hyperopt.early_stop import no_progress_loss
+from hyperopt import JOB_STATE_DONE, STATUS_OK, Trials, tpe, space_eval
+from hyperopt.base import Domain
 
 from src.config.config import DEFAULT_PARAM_PREFIX
+from src.model.crossval import cross_validate_folds, make_folds
+from src.model.trials import make_study_key
 
 
 def map_name_to_param(param, prefix):
@@ -59,47 +77,325 @@ def make_param_mapping(params, mapper, prefix=DEFAULT_PARAM_PREFIX):
     return param_space
 
 
-def crossval_objective(params, model, X, y, cv, scoring):
+def score_folds(score_fold, folds, pruning=None):
+    """Score folds one at a time, in order, pruning the trial as soon as its
+    mean loss so far is above the threshold for that fold.
+
+    A pruned trial's loss is at least the worst loss of the trials that
+    finished every fold.
+
+    :param callable score_fold: takes a fold and returns its fit time and
+        score
+    :param list folds: folds to score
+    :param dict pruning: output of make_pruning_thresholds, or None to score
+        every fold
+    :return: loss, with the score and fit time of each fold scored
+    :rtype: dict
+    """
+    thresholds = [None] * (len(folds) - 1)
+    if pruning is not None:
+        thresholds = pruning['thresholds']
+    fit_times, scores = [], []
+    # the last fold is never pruned, since pruning there saves nothing
+    for fold, threshold in zip(folds, [*thresholds, None]):
+        fit_time, score = score_fold(fold)
+        fit_times.append(fit_time)
+        scores.append(float(score))
+        loss = -np.mean(scores)
+        if threshold is not None and loss > threshold:
+            print(f"Pruned after {len(scores)} folds: {loss}")
+            return {'loss': max(loss, pruning['pruned_loss']),
+                    'status': STATUS_OK, 'pruned': True,
+                    'fold_scores': scores, 'fit_times': fit_times}
+    print(f"Loss: {loss}")
+    return {'loss': loss, 'status': STATUS_OK,
+            'fold_scores': scores, 'fit_times': fit_times}
+
+
+def crossval_objective(params, model, folds, scoring, n_jobs=None,
+                       pruning=None):
     """Objective function for hyperopt.
 
-    Uses cross validation scoring.
+    Uses cross validation scoring. With ``pruning``, the folds are fitted
+    one at a time and the trial can be pruned (see score_folds).
     
     :param dict params: hyperparameters to test
     :param sklearn.base.BaseEstimator model: estimator to test
-    :param pd.DataFrame X: features
-    :param pd.Series y: target
-    :param Union[int, callable] cv: cross-validation strategy
+    :param list[Fold] folds: folds from make_folds
     :param Union[str, dict] scoring: scoring metric
-    :return: loss
-    :rtype: float
+    :param int n_jobs: number of folds to fit in parallel, without pruning
+    :param dict pruning: output of make_pruning_thresholds, or None to fit
+        every fold in parallel
+    :return: loss, with the score and fit time of each fold fitted
+    :rtype: dict
     """
     print("Testing params:", params)
-    model.set_params(**params)
-    scores = cross_val_score(model, X, y, cv=cv, groups=X['season'],
-                             scoring=scoring)
-    loss = -scores.mean()
-    print(f"Loss: {loss}")
-    return loss
+    if pruning is None:
+        fit_times, _, scores, _ = cross_validate_folds(model, folds, scoring,
+                                                       params, n_jobs=n_jobs)
+        loss = -np.mean(scores)
+        print(f"Loss: {loss}")
+        return {'loss': loss, 'status': STATUS_OK,
+                'fold_scores': [float(score) for score in scores],
+                'fit_times': fit_times}
+
+    def score_fold(fold):
+        fit_times, _, scores, _ = cross_validate_folds(model, [fold], scoring,
+                                                       params)
+        return fit_times[0], scores[0]
+
+    return score_folds(score_fold, folds, pruning)
+
+
+def get_partial_losses(trials):
+    """Get the mean loss of each trial over its first 1, 2, ... folds.
+
+    :param hyperopt.Trials trials: finished trials
+    :return: partial losses of each trial with fold scores
+    :rtype: list[np.ndarray]
+    """
+    partial_losses = []
+    for result in trials.results:
+        fold_scores = result.get('fold_scores')
+        if fold_scores:
+            n_folds = np.arange(1, len(fold_scores) + 1)
+            partial_losses.append(-np.cumsum(fold_scores) / n_folds)
+    return partial_losses
+
+
+def make_pruning_thresholds(trials, min_trials=5, min_folds=1,
+                            tolerance=0.0):
+    """Make the partial loss thresholds to prune trials at.
+
+    A trial is pruned after a fold if its mean loss so far is worse than the
+    median of the trials that got to that fold by more than ``tolerance``, so
+    about half the trials are dropped at each fold, as in successive halving.
+    Pruned trials are given the worst loss of the trials that finished every
+    fold, so TPE steers away from them and they are never the best trial.
+
+    :param hyperopt.Trials trials: finished trials
+    :param int min_trials: number of trials to finish every fold before any
+        are pruned
+    :param int min_folds: number of folds to fit before a trial can be pruned
+    :param float tolerance: relative margin over the median partial loss
+    :return: threshold after each fold but the last, None where trials
+        can't be pruned, and the worst loss of the trials that finished every
+        fold. None if there aren't enough finished trials yet.
+    :rtype: dict
+    """
+    partial_losses = get_partial_losses(trials)
+    if not partial_losses:
+        return None
+    n_folds = max(len(losses) for losses in partial_losses)
+    complete = [-np.mean(result['fold_scores']) for result in trials.results
+                if not result.get('pruned')
+                and len(result.get('fold_scores') or []) == n_folds]
+    if len(complete) < min_trials:
+        return None
+    thresholds = [
+        None if fold + 1 < min_folds else (1 + tolerance) * np.median(
+            [losses[fold] for losses in partial_losses if len(losses) > fold]
+        )
+        for fold in range(n_folds - 1)
+    ]
+    return {'thresholds': thresholds, 'pruned_loss': max(complete)}
+
+
+def suggest_trials(domain, trials, n_trials, rstate):
+    """Ask TPE for a batch of trials, one at a time with the constant liar
+    method.
+
+    Each suggestion is given the worst finished loss and added to a copy of
+    the trials before the next is suggested, so the batch is suggested from
+    the finished trials and the pending ones before it.
+
+    :param hyperopt.base.Domain domain: objective and search space
+    :param hyperopt.Trials trials: finished trials
+    :param int n_trials: number of trials to suggest
+    :param np.random.Generator rstate: random state of the search
+    :return: new trial documents
+    :rtype: list[dict]
+    """
+    trials.refresh()
+    losses = [loss for loss in trials.losses() if loss is not None]
+    liar = {'loss': max(losses, default=None), 'status': STATUS_OK}
+    pending = Trials()
+    pending.insert_trial_docs(trials.trials)
+    docs = []
+    for trial_id in trials.new_trial_ids(n_trials):
+        pending.refresh()
+        doc, = tpe.suggest([trial_id], domain, pending,
+                           rstate.integers(2 ** 31 - 1))
+        docs.append(doc)
+        pending.insert_trial_docs([{**doc, 'state': JOB_STATE_DONE,
+                                    'result': liar}])
+    return docs
+
+
+def get_trial_params(space, trial):
+    """Get the hyperparameters of a trial document.
+
+    :param dict space: hyperparameter ranges
+    :param dict trial: trial document
+    :return: hyperparameters, as passed to the objective
+    :rtype: dict
+    """
+    vals = {key: val[0] for key, val in trial['misc']['vals'].items() if val}
+    return space_eval(space, vals)
+
+
+def record_trials(trials, docs, results):
+    """Record a batch of evaluated trials.
+
+    :param hyperopt.Trials trials: finished trials
+    :param list[dict] docs: trial documents from suggest_trials
+    :param list results: objective result of each trial, a loss or a dict
+        with a loss
+    :return: None
+    :rtype: None
+    """
+    for doc, result in zip(docs, results):
+        doc['state'] = JOB_STATE_DONE
+        if isinstance(result, dict):
+            doc['result'] = result
+        else:
+            doc['result'] = {'loss': result, 'status': STATUS_OK}
+    trials.insert_trial_docs(docs)
+    trials.refresh()
+
+
+def load_trials(stored):
+    """Make hyperopt trials from stored ones.
+
+    :param list[tuple[int, dict, dict]] stored: hyperopt values and result of
+        each trial, by trial ID, from TrialStore.load
+    :return: finished trials
+    :rtype: hyperopt.Trials
+    """
+    trials = Trials()
+    if not stored:
+        return trials
+    trials.new_trial_ids(max(tid for tid, _, _ in stored) + 1)
+    docs = [{
+        'state': JOB_STATE_DONE,
+        'tid': tid,
+        'spec': None,
+        'result': result,
+        'misc': {'tid': tid,
+                 'cmd': ('domain_attachment', 'FMinIter_Domain'),
+                 'workdir': None,
+                 'idxs': {key: [tid] if val else []
+                          for key, val in vals.items()},
+                 'vals': vals},
+        'exp_key': None,
+        'owner': None,
+        'version': 0,
+        'book_time': None,
+        'refresh_time': None,
+    } for tid, vals, result in stored]
+    trials.insert_trial_docs(docs)
+    trials.refresh()
+    return trials
 
 
-def find_best_params(objective, space, max_evals, early_stop_n):
+def has_stalled(trials, early_stop_n):
+    """Check whether the best loss hasn't improved for a number of trials.
+
+    :param hyperopt.Trials trials: finished trials
+    :param int early_stop_n: number of trials without improvement to stop
+    :return: whether to stop the search
+    :rtype: bool
+    """
+    losses = trials.losses()
+    if not losses:
+        return False
+    return len(losses) - 1 - int(np.argmin(losses)) >= early_stop_n
+
+
+def run_search(objective, space, max_evals, early_stop_n, batch_size,
+               executor, seed, trials=None, on_batch=None, pruning=None):
+    """Run a batched TPE search.
+
+    :param callable objective: objective function to minimize
+    :param dict space: hyperparameter ranges
+    :param int max_evals: number of evaluations to perform
+    :param int early_stop_n: number of iterations without improvement to stop
+    :param int batch_size: number of trials suggested and evaluated together
+    :param concurrent.futures.Executor executor: executor to evaluate trials
+        on, or None to evaluate them in this process
+    :param int seed: random seed, or None for an unseeded search
+    :param hyperopt.Trials trials: trials already finished, which count
+        towards ``max_evals``
+    :param callable on_batch: called with the documents and hyperparameters
+        of each finished batch
+    :param dict pruning: keyword arguments of make_pruning_thresholds, or
+        None to finish every trial. The objective has to take the thresholds
+        as ``pruning``.
+    :return: finished trials
+    :rtype: hyperopt.Trials
+    """
+    domain = Domain(objective, space)
+    if trials is None:
+        trials = Trials()
+    # a resumed search mustn't draw the same random trials as the first run
+    rstate = np.random.default_rng(None if seed is None
+                                   else [seed, len(trials)])
+    evaluate = map if executor is None else executor.map
+    while len(trials) < max_evals and not has_stalled(trials, early_stop_n):
+        docs = suggest_trials(domain, trials,
+                              min(batch_size, max_evals - len(trials)), rstate)
+        params = [get_trial_params(space, doc) for doc in docs]
+        batch_objective = objective
+        if pruning is not None:
+            batch_objective = partial(
+                objective,
+                pruning=make_pruning_thresholds(trials, **pruning),
+            )
+        record_trials(trials, docs, list(evaluate(batch_objective, params)))
+        if on_batch is not None:
+            on_batch(docs, params)
+    return trials
+
+
+def find_best_params(objective, space, max_evals, early_stop_n, batch_size=1,
+                     n_jobs=1, seed=None, executor=None, trials=None,
+                     on_batch=None, pruning=None):
     """Search for the optimal model hyperparams using hyperopt.
 
     :param callable objective: objective function to minimize
     :param dict space: hyperparameter ranges
     :param int max_evals: number of evaluations to perform
     :param int early_stop_n: number of iterations without improvement to stop
+    :param int batch_size: number of trials suggested and evaluated together
+    :param int n_jobs: number of worker processes. None uses every CPU, and 1
+        evaluates trials serially in this process.
+    :param int seed: random seed, or None for an unseeded search
+    :param concurrent.futures.Executor executor: executor to evaluate trials
+        on instead of a process pool. The objective must be picklable for a
+        process-based executor.
+    :param hyperopt.Trials trials: trials already finished, which count
+        towards ``max_evals``
+    :param callable on_batch: called with the documents and hyperparameters
+        of each finished batch
+    :param dict pruning: keyword arguments of make_pruning_thresholds, or
+        None to finish every trial
     :return: best hyperparameters
     :rtype: dict
     """
-    best_params = fmin(
-        objective,
-        space=space,
-        algo=tpe.suggest,
-        max_evals=max_evals,
-        early_stop_fn=no_progress_loss(early_stop_n),
-    )
-    return best_params
+    n_jobs = min(n_jobs or os.cpu_count(), batch_size)
+    if executor is None and n_jobs > 1:
+        # lightgbm's OpenMP threads are not fork-safe, so workers are spawned
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 mp_context=context) as executor:
+            trials = run_search(objective, space, max_evals, early_stop_n,
+                                batch_size, executor, seed, trials, on_batch,
+                                pruning)
+    else:
+        trials = run_search(objective, space, max_evals, early_stop_n,
+                            batch_size, executor, seed, trials, on_batch,
+                            pruning)
+    return trials.argmin
 
 
 def fix_param_dtypes(params, param_dtypes):
@@ -117,7 +413,9 @@ def fix_param_dtypes(params, param_dtypes):
 
 
 def hyperoptimize(model, X, y, cv, scoring, space, objective=crossval_objective,
-                  max_evals=100, early_stop_n=15):
+                  max_evals=100, early_stop_n=15, batch_size=1, n_jobs=1,
+                  seed=None, folds=None, cv_n_jobs=None, store=None,
+                  name=None, pruning=None):
     """Optimize model hyperparameters.
 
     :param sklearn.base.BaseEstimator model: estimator to test
@@ -130,15 +428,43 @@ def hyperoptimize(model, X, y, cv, scoring, space, objective=crossval_objective,
         name, value, min, max, type
     :param int max_evals: max number of evaluations to perform
     :param int early_stop_n: number of iterations without improvement to stop
-    :return: best hyperparameters
+    :param int batch_size: number of trials suggested and evaluated together
+    :param int n_jobs: number of worker processes
+    :param int seed: random seed, or None for an unseeded search
+    :param list[Fold] folds: folds from make_folds. Made from X, y and cv if
+        None.
+    :param int cv_n_jobs: number of folds to fit in parallel in each trial
+    :param TrialStore store: store to save trials to and resume them from.
+        Trials are only kept in memory if None.
+    :param str name: model name, which identifies the study in the store
+    :param dict pruning: keyword arguments of make_pruning_thresholds, or
+        None to fit every fold of every trial
+    :return: best hyperparameters, updated with any the objective's result
+        sets as ``params``, such as early-stopped boosting rounds
     :rtype: dict
     """
     search_space = make_param_mapping(space, map_name_to_param)
-    objective = partial(objective, model=model, X=X, y=y, cv=cv,
-                        scoring=scoring)
+    if folds is None:
+        folds = make_folds(model, X, y, cv)
+    trials, on_batch = Trials(), None
+    if store is not None:
+        study = make_study_key(name, model, objective, X, y, folds, space)
+        trials = load_trials(store.load(study))
+        print(f"Resuming {name} search from {len(trials)} stored trials")
+        on_batch = partial(store.save, study, name)
+    objective = partial(objective, model=model, folds=folds, scoring=scoring,
+                        n_jobs=cv_n_jobs)
     best_params = find_best_params(objective,
                                    search_space,
                                    max_evals=max_evals,
-                                   early_stop_n=early_stop_n)
+                                   early_stop_n=early_stop_n,
+                                   batch_size=batch_size,
+                                   n_jobs=n_jobs,
+                                   seed=seed,
+                                   trials=trials,
+                                   on_batch=on_batch,
+                                   pruning=pruning)
     best_params = space_eval(search_space, best_params)
+    # objectives can set some hyperparameters themselves, like boosting rounds
+    best_params.update(trials.best_trial['result'].get('params') or {})
     return best_params
@@ -0,0 +1,243 @@
+"""Native LightGBM training for hyperparameter trials.
+
+An LGBMClassifier in a pipeline bins its features from scratch on every fit,
+so a search bins every fold again in every trial. Here, each fold's training
+rows are split once into the rows to fit and the calibration holdout, the
+same split as a holdout-calibrated pipeline (see estimators.py), and binned
+into an lgb.Dataset. The datasets are cached in each process, keyed by the
+fold's data and the binning parameters, which none of LIGHTGBM_SPACE's
+parameters change, so a worker bins a fold once and reuses it in every trial
+after that. The cache only holds the folds of the current search: a trial on
+other folds drops the datasets of the last search, and clear_fold_datasets
+drops them when a search ends.
+
+Trials train boosters on the cached datasets with lgb.train. ``n_estimators``
+caps the boosting rounds, and training stops early when the holdout loss
+hasn't improved for a number of rounds. The booster is then calibrated on the
+holdout with a sigmoid and scored on the fold's test rows. The mean number of
+rounds kept over the folds is returned as the trial's ``n_estimators``, so
+the tuned pipeline fits as many trees as the trial was scored with.
+"""
+
+import hashlib
+import json
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, log_loss
+
+from src.config.config import (DEFAULT_PARAM_PREFIX,
+                               HYPEROPT_CALIBRATION,
+                               LGBM_EARLY_STOPPING_ROUNDS)
+from src.model.estimators import make_calibration_cv
+from src.model.hyperoptimize import score_folds
+
+
+# parameters used to construct a dataset, rather than to train on it
+BINNING_PARAMS = {'max_bin', 'max_bin_by_feature', 'min_data_in_bin',
+                  'subsample_for_bin', 'bin_construct_sample_cnt',
+                  'use_missing', 'zero_as_missing', 'linear_tree',
+                  'data_random_seed', 'forcedbins_filename'}
+# LGBMClassifier parameters lgb.train doesn't take
+SKLEARN_PARAMS = {'n_estimators', 'importance_type', 'class_weight',
+                  'eval_metric'}
+# losses of the scoring metrics trials can be scored with
+LOSSES = {'neg_brier_score': brier_score_loss, 'neg_log_loss': log_loss}
+
+_datasets = {}
+
+
+def get_booster_params(estimator):
+    """Get the lgb.train parameters of an LGBMClassifier.
+
+    :param lightgbm.LGBMClassifier estimator: estimator
+    :return: training parameters, binning parameters and number of boosting
+        rounds
+    :rtype: tuple[dict, dict, int]
+    """
+    params = {key: value for key, value in estimator.get_params().items()
+              if value is not None and key not in SKLEARN_PARAMS}
+    # LGBMClassifier defaults to a binary objective, and lgb.train to regression
+    params.setdefault('objective', 'binary')
+    eval_metric = estimator.get_params().get('eval_metric')
+    if eval_metric is not None:
+        params['metric'] = eval_metric
+    binning_params = {key: params.pop(key) for key in BINNING_PARAMS
+                      if key in params}
+    return params, binning_params, estimator.n_estimators
+
+
+def make_dataset_key(fold, calibration, binning_params):
+    """Hash everything a fold's binned datasets depend on.
+
+    :param Fold fold: fold from make_folds
+    :param dict calibration: holdout calibration settings
+    :param dict binning_params: dataset construction parameters
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(fold.train.tobytes())
+    digest.update(json.dumps(list(fold.X_train.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(fold.X_train,
+                                             index=False).to_numpy())
+    digest.update(pd.util.hash_pandas_object(fold.y_train,
+                                             index=False).to_numpy())
+    digest.update(repr(sorted(calibration.items())).encode())
+    digest.update(repr(sorted(binning_params.items())).encode())
+    return digest.hexdigest()
+
+
+def get_fold_datasets(fold, calibration, binning_params, key=None):
+    """Get the binned datasets of a fold, making them on the first call.
+
+    The training rows are binned without pre-filtering features, so trials
+    can change ``min_data_in_leaf`` on the same dataset.
+
+    :param Fold fold: fold from make_folds
+    :param dict calibration: holdout calibration settings
+    :param dict binning_params: dataset construction parameters
+    :param str key: the fold's key from make_dataset_key, made if None
+    :return: dataset to fit, holdout dataset and the holdout target
+    :rtype: tuple
+    """
+    if key is None:
+        key = make_dataset_key(fold, calibration, binning_params)
+    if key not in _datasets:
+        cv = make_calibration_cv(calibration)
+        fit, holdout = next(cv.split(fold.X_train, fold.y_train))
+        dataset_params = {**binning_params, 'feature_pre_filter': False,
+                          'verbosity': -1}
+        train_set = lgb.Dataset(fold.X_train.iloc[fit],
+                                fold.y_train.iloc[fit],
+                                params=dataset_params,
+                                free_raw_data=False).construct()
+        valid_set = lgb.Dataset(fold.X_train.iloc[holdout],
+                                fold.y_train.iloc[holdout],
+                                params=dataset_params,
+                                reference=train_set,
+                                free_raw_data=False).construct()
+        _datasets[key] = (train_set, valid_set, fold.y_train.iloc[holdout])
+    return _datasets[key]
+
+
+def clear_fold_datasets(keep=()):
+    """Drop cached datasets.
+
+    :param Iterable[str] keep: keys of the datasets to keep
+    :return: None
+    :rtype: None
+    """
+    for key in _datasets.keys() - set(keep):
+        del _datasets[key]
+
+
+def fit_sigmoid(y_pred, y):
+    """Fit Platt's sigmoid calibration, like CalibratedClassifierCV.
+
+    The targets are smoothed towards the prior, which is a logistic
+    regression on each prediction twice, once as a positive and once as a
+    negative, weighted by the smoothed target.
+
+    :param np.ndarray y_pred: predictions to calibrate
+    :param pd.Series y: target
+    :return: calibrator of the predictions, as a column
+    :rtype: sklearn.linear_model.LogisticRegression
+    """
+    n_pos = (y == 1).sum()
+    n_neg = len(y) - n_pos
+    target = np.where(y == 1, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+    calibrator = LogisticRegression(penalty=None)
+    calibrator.fit(np.concatenate([y_pred, y_pred]).reshape(-1, 1),
+                   np.repeat([1, 0], len(y)),
+                   sample_weight=np.concatenate([target, 1 - target]))
+    return calibrator
+
+
+def fit_and_score_booster(params, num_boost_round, fold, datasets, loss,
+                          early_stopping_rounds):
+    """Train and calibrate a booster on a fold and score it.
+
+    :param dict params: training parameters
+    :param int num_boost_round: maximum number of boosting rounds
+    :param Fold fold: fold from make_folds
+    :param tuple datasets: output of get_fold_datasets
+    :param callable loss: loss taking the target and predicted probabilities
+    :param int early_stopping_rounds: number of rounds without improvement on
+        the holdout to stop training, or None to train every round
+    :return: fit time, score and number of rounds kept
+    :rtype: tuple
+    """
+    train_set, valid_set, y_holdout = datasets
+    callbacks = []
+    if early_stopping_rounds is not None:
+        callbacks.append(lgb.early_stopping(early_stopping_rounds,
+                                            verbose=False))
+    start = time.perf_counter()
+    booster = lgb.train(params, train_set, num_boost_round=num_boost_round,
+                        valid_sets=[valid_set], callbacks=callbacks)
+    best_iteration = booster.best_iteration or num_boost_round
+    holdout_pred = booster.predict(valid_set.get_data(),
+                                   num_iteration=best_iteration)
+    calibrator = fit_sigmoid(holdout_pred, y_holdout)
+    fit_time = time.perf_counter() - start
+    test_pred = booster.predict(fold.X_test, num_iteration=best_iteration)
+    y_pred_proba = calibrator.predict_proba(test_pred.reshape(-1, 1))[:, 1]
+    return fit_time, -loss(fold.y_test, y_pred_proba), best_iteration
+
+
+def lgbm_objective(params, model, folds, scoring, n_jobs=None, pruning=None,
+                   calibration=HYPEROPT_CALIBRATION,
+                   early_stopping_rounds=LGBM_EARLY_STOPPING_ROUNDS):
+    """Objective function for hyperopt, training LightGBM natively.
+
+    A drop-in for crossval_objective with an LGBM pipeline. The folds are
+    fitted one at a time and the trial can be pruned (see score_folds).
+
+    :param dict params: hyperparameters to test
+    :param sklearn.pipeline.Pipeline model: LGBM pipeline, whose fixed
+        estimator parameters are kept
+    :param list[Fold] folds: folds from make_folds
+    :param str scoring: scoring metric, one of LOSSES
+    :param int n_jobs: unused, since LightGBM uses every CPU itself
+    :param dict pruning: output of make_pruning_thresholds
+    :param dict calibration: holdout calibration settings
+    :param int early_stopping_rounds: number of rounds without improvement on
+        the holdout to stop training, or None to train every round
+    :return: loss, with the score and fit time of each fold fitted and the
+        number of boosting rounds kept as ``n_estimators``
+    :rtype: dict
+    """
+    print("Testing params:", params)
+    if scoring not in LOSSES:
+        raise ValueError(f"Unsupported scoring metric: {scoring}")
+    estimator = clone(model[-1].estimator).set_params(**{
+        key.removeprefix(DEFAULT_PARAM_PREFIX): value
+        for key, value in params.items()
+    })
+    booster_params, binning_params, num_boost_round = get_booster_params(
+        estimator
+    )
+    keys = {id(fold): make_dataset_key(fold, calibration, binning_params)
+            for fold in folds}
+    # the datasets of other folds belong to an earlier search
+    clear_fold_datasets(keep=keys.values())
+    best_iterations = []
+
+    def score_fold(fold):
+        datasets = get_fold_datasets(fold, calibration, binning_params,
+                                     key=keys[id(fold)])
+        fit_time, score, best_iteration = fit_and_score_booster(
+            booster_params, num_boost_round, fold, datasets, LOSSES[scoring],
+            early_stopping_rounds
+        )
+        best_iterations.append(best_iteration)
+        return fit_time, score
+
+    result = score_folds(score_fold, folds, pruning)
+    n_estimators = int(round(np.mean(best_iterations)))
+    result['params'] = {f"{DEFAULT_PARAM_PREFIX}n_estimators": n_estimators}
+    return result
@@ -0,0 +1,140 @@
+"""Vectorized evaluation metrics for binary classifiers.
+
+score_probabilities computes every metric compile_scores reports from one
+sort of the predicted probabilities, instead of one sklearn function per
+metric that each validate, and for ROC AUC and the calibration curve sort,
+the predictions again. Predicted labels are the probabilities above 0.5,
+which is what a binary classifier's predict gives, so models only predict
+once.
+
+Predictions can also be a 2-D batch with one row per prediction vector, such
+as the predictions of every trial or of bootstrap samples, with a target
+shared by every row or one per row. Every metric then has one value per row.
+"""
+
+import numpy as np
+
+
+def rank_sorted(sorted_values):
+    """Rank sorted values, giving tied values their average rank.
+
+    :param np.ndarray sorted_values: values sorted along the last axis
+    :return: 1-based ranks
+    :rtype: np.ndarray
+    """
+    n = sorted_values.shape[-1]
+    index = np.broadcast_to(np.arange(n), sorted_values.shape)
+    starts_tie = np.ones(sorted_values.shape, dtype=bool)
+    starts_tie[..., 1:] = sorted_values[..., 1:] != sorted_values[..., :-1]
+    ends_tie = np.ones(sorted_values.shape, dtype=bool)
+    ends_tie[..., :-1] = starts_tie[..., 1:]
+    first = np.maximum.accumulate(np.where(starts_tie, index, 0), axis=-1)
+    last = np.flip(np.minimum.accumulate(
+        np.flip(np.where(ends_tie, index, n - 1), axis=-1), axis=-1
+    ), axis=-1)
+    return (first + last) / 2 + 1
+
+
+def calibration_bins(sorted_proba, sorted_y, n_bins):
+    """Bin sorted predictions by quantile, like sklearn's calibration_curve
+    with the 'quantile' strategy.
+
+    :param np.ndarray sorted_proba: predicted probabilities, sorted along the
+        last axis
+    :param np.ndarray sorted_y: target, in the order of the predictions
+    :param int n_bins: number of bins
+    :return: fraction of positives and mean predicted probability in each
+        bin, NaN for empty bins
+    :rtype: tuple[np.ndarray]
+    """
+    n = sorted_proba.shape[-1]
+    # quantiles, interpolated linearly like np.percentile
+    position = np.linspace(0, 1, n_bins + 1)[1:-1] * (n - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.ceil(position).astype(int)
+    lower_value = sorted_proba[..., lower]
+    edges = lower_value + (sorted_proba[..., upper] - lower_value) * (
+        position - lower
+    )
+    # bins hold the predictions up to and including their upper edge
+    ends = (sorted_proba[..., :, None] <= edges[..., None, :]).sum(axis=-2)
+    ends = np.concatenate([ends, np.full(ends.shape[:-1] + (1,), n)],
+                          axis=-1)
+    starts = np.concatenate([np.zeros(ends.shape[:-1] + (1,), dtype=int),
+                             ends[..., :-1]], axis=-1)
+    zeros = np.zeros(sorted_proba.shape[:-1] + (1,))
+    proba_sums = np.concatenate([zeros, sorted_proba.cumsum(axis=-1)],
+                                axis=-1)
+    y_sums = np.concatenate([zeros, sorted_y.cumsum(axis=-1)], axis=-1)
+    totals = ends - starts
+
+    def bin_mean(sums):
+        bin_sums = (np.take_along_axis(sums, ends, axis=-1)
+                    - np.take_along_axis(sums, starts, axis=-1))
+        return np.divide(bin_sums, totals, out=np.full(totals.shape, np.nan),
+                         where=totals > 0)
+
+    return bin_mean(y_sums), bin_mean(proba_sums)
+
+
+def score_probabilities(y, y_pred_proba, n_bins=7):
+    """Score predicted probabilities of the positive class.
+
+    The metrics are Brier score and log loss, negated like sklearn's scorers,
+    F1, precision, recall, ROC AUC, the confusion matrix counts and the
+    quantile calibration curve. Precision, recall and F1 are 0 when they
+    divide by 0, and ROC AUC is NaN for a target of one class.
+
+    :param array-like y: target, of shape (n,) or (k, n)
+    :param array-like y_pred_proba: predicted probabilities, of shape (n,)
+        or (k, n)
+    :param int n_bins: number of calibration bins
+    :return: evaluation metrics, scalars for predictions of shape (n,) and
+        arrays of shape (k,) for a batch, and 'prob_true' and 'prob_pred'
+        calibration curves of shape (n_bins,), or (k, n_bins), NaN for empty
+        bins
+    :rtype: dict
+    """
+    y_pred_proba = np.asarray(y_pred_proba, dtype=float)
+    y = np.broadcast_to(np.asarray(y), y_pred_proba.shape)
+    order = np.argsort(y_pred_proba, axis=-1, kind='stable')
+    proba = np.take_along_axis(y_pred_proba, order, axis=-1)
+    positive = np.take_along_axis(y, order, axis=-1) == 1
+    n = proba.shape[-1]
+    n_pos = positive.sum(axis=-1)
+    n_neg = n - n_pos
+
+    predicted = proba > 0.5
+    tp = (predicted & positive).sum(axis=-1)
+    fp = (predicted & ~positive).sum(axis=-1)
+    fn = n_pos - tp
+    tn = n_neg - fp
+
+    eps = np.finfo(proba.dtype).eps
+    likelihood = np.where(positive, proba, 1 - proba)
+    ranks = rank_sorted(proba)
+    prob_true, prob_pred = calibration_bins(proba, positive, n_bins)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(n_pos > 0, tp / n_pos, 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+        roc_auc = (((ranks * positive).sum(axis=-1) - n_pos * (n_pos + 1) / 2)
+                   / (n_pos * n_neg))
+    scores = {
+        'neg_brier_score': -((proba - positive) ** 2).mean(axis=-1),
+        'neg_log_loss': np.log(np.clip(likelihood, eps, 1 - eps)).mean(
+            axis=-1
+        ),
+        'f1': f1,
+        'precision': precision,
+        'recall': recall,
+        'roc_auc': roc_auc,
+        'tn': tn,
+        'fp': fp,
+        'fn': fn,
+        'tp': tp,
+    }
+    # np.where gives 0-d arrays for 1-D predictions, which [()] makes scalars
+    scores = {metric: score[()] for metric, score in scores.items()}
+    return {**scores, 'prob_true': prob_true, 'prob_pred': prob_pred}
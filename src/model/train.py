@@ -10,8 +10,12 @@ from sklearn.model_selection import LeaveOneGroupOut
 
 from src.model.estimators import (build_baseline_pipeline,
                                   build_lgbm_pipeline,
-                                  build_svc_pipeline)
-from src.model.hyperoptimize import hyperoptimize
+                                  build_svc_pipeline,
+                                  with_calibration)
+from src.model.crossval import make_folds
+from src.model.hyperoptimize import crossval_objective, hyperoptimize
+from src.model.lgbm import clear_fold_datasets, lgbm_objective
+from src.model.trials import TrialStore
 from src.model.evaluate import (custom_cv,
                                 evaluate_model,
                                 evaluate_features,
@@ -24,9 +28,15 @@ from src.config.config import (PATHS,
                                CV_TRAIN_SIZE,
                                CV_TEST_SIZE,
                                CV_SHIFT_SIZE,
+                               CV_N_JOBS,
                                SCORING_METRIC,
                                MAX_EVALS,
-                               EARLY_STOP_N)
+                               EARLY_STOP_N,
+                               HYPEROPT_BATCH_SIZE,
+                               HYPEROPT_N_JOBS,
+                               HYPEROPT_SEED,
+                               HYPEROPT_PRUNING,
+                               HYPEROPT_CALIBRATION)
 from src.config.spaces import BASELINE_PARAMS, LIGHTGBM_SPACE, SVC_SPACE
 
 
@@ -71,27 +81,41 @@ def map_seasons_to_groups(X_train):
 
 def evaluate_train_save(model_name, model, X_train, y_train, X_test, y_test,
                         cv, save_path, hyperopt=False, scoring_metric=None,
-                        space=None, max_evals=None, early_stop_n=None):
+                        space=None, max_evals=None, early_stop_n=None,
+                        batch_size=1, n_jobs=1, seed=None, store=None,
+                        pruning=None, objective=crossval_objective):
     """"""
     print(f"Evaluating {model_name} on training and holdout data...")
+    folds = make_folds(model, X_train, y_train, cv)
     if hyperopt:
-        best_params = hyperoptimize(model, X_train, y_train, cv,
+        tuning_model = with_calibration(model, HYPEROPT_CALIBRATION)
+        best_params = hyperoptimize(tuning_model, X_train, y_train, cv,
                                     scoring=scoring_metric,
                                     space=space,
+                                    objective=objective,
                                     max_evals=max_evals,
-                                    early_stop_n=early_stop_n)
+                                    early_stop_n=early_stop_n,
+                                    batch_size=batch_size,
+                                    n_jobs=n_jobs,
+                                    seed=seed,
+                                    folds=folds,
+                                    store=store,
+                                    name=model_name,
+                                    pruning=pruning)
+        # trials run in this process leave their binned folds cached
+        clear_fold_datasets()
         print(f"Best params: {best_params}")
         model.set_params(**best_params)
-    scores, _ = evaluate_model(model, X_train, y_train, cv)
+    scores, _ = evaluate_model(model, X_train, y_train, cv, folds=folds,
+                               n_jobs=CV_N_JOBS)
     scores.to_csv(f"{save_path}/{model_name}_scores.csv")
     make_and_save_plots(scores, model_name, save_path)
     model.fit(X_train, y_train)
     feature_importances = evaluate_features(model, X_test, y_test,
                                             scoring_metric, n_repeats=10)
     plot_feature_importances(feature_importances, model_name, save_path)
-    y_pred = model.predict(X_test)
     y_pred_proba = model.predict_proba(X_test)[:, 1]
-    scores = compile_scores(y_test, y_pred, y_pred_proba)
+    scores = compile_scores(y_test, y_pred_proba)
     plot_test_calibration(scores, model_name, save_path)
     print(f"Training {name} on all data...")
     X_full = pd.concat([X_train, X_test])
@@ -121,6 +145,7 @@ if __name__ == "__main__":
     # cv = LeaveOneGroupOut()
 
     cv = custom_cv(CV_TRAIN_SIZE, CV_TEST_SIZE, CV_SHIFT_SIZE)
+    trial_store = TrialStore(PATHS['hyperopt_trials'])
 
     # evaluate baseline model
     name = 'baseline'
@@ -134,7 +159,10 @@ if __name__ == "__main__":
     evaluate_train_save(name, svc, X_train, y_train, X_test, y_test,
                         cv, save_path, hyperopt=True, scoring_metric=SCORING_METRIC,
                         space=SVC_SPACE, max_evals=MAX_EVALS,
-                        early_stop_n=EARLY_STOP_N)
+                        early_stop_n=EARLY_STOP_N,
+                        batch_size=HYPEROPT_BATCH_SIZE,
+                        n_jobs=HYPEROPT_N_JOBS, seed=HYPEROPT_SEED,
+                        store=trial_store, pruning=HYPEROPT_PRUNING)
 
     # evaluate lightgbm
     name = 'lightgbm'
@@ -142,4 +170,8 @@ if __name__ == "__main__":
     evaluate_train_save(name, lightgbm, X_train, y_train, X_test, y_test,
                         cv, save_path, hyperopt=True, scoring_metric=SCORING_METRIC,
                         space=LIGHTGBM_SPACE, max_evals=MAX_EVALS,
-                        early_stop_n=EARLY_STOP_N)
+                        early_stop_n=EARLY_STOP_N,
+                        batch_size=HYPEROPT_BATCH_SIZE,
+                        n_jobs=HYPEROPT_N_JOBS, seed=HYPEROPT_SEED,
+                        store=trial_store, pruning=HYPEROPT_PRUNING,
+                        objective=lgbm_objective)
@@ -0,0 +1,133 @@
+"""SQLite store of finished hyperparameter trials.
+
+Every trial of a search is saved with its hyperopt values, loss, per-fold
+scores and fit times, whether it was pruned, and any hyperparameters the
+objective set itself, as soon as its batch finishes. Trials belong to a study, keyed by the model
+name, the final estimator's fixed settings, the objective, the training data
+and its folds and the search space, so a search with the same study picks up
+the trials already run: an interrupted search resumes where it stopped,
+raising ``max_evals`` extends it, and TPE suggests new trials from every
+stored one. Changing the estimator's settings, such as its calibration, the
+objective, the data, the folds or the space starts a new study.
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+
+import pandas as pd
+
+
+def make_study_key(name, model, objective, X, y, folds, space):
+    """Hash everything a study's losses depend on.
+
+    :param str name: model name
+    :param sklearn.pipeline.Pipeline model: pipeline to tune
+    :param callable objective: objective function
+    :param pd.DataFrame X: features
+    :param pd.Series y: target
+    :param list[Fold] folds: folds from make_folds
+    :param list[namedtuple] space: named tuples with the following fields:
+        name, value, min, max, type
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(name.encode())
+    digest.update(repr(model[-1]).encode())
+    digest.update(objective.__name__.encode())
+    digest.update(json.dumps(list(X.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy())
+    for fold in folds:
+        digest.update(fold.train.tobytes())
+        digest.update(fold.test.tobytes())
+    for param in space:
+        value = getattr(param.value, '__name__', param.value)
+        digest.update(repr((param.name, value, param.min, param.max)).encode())
+    return digest.hexdigest()
+
+
+class TrialStore:
+    """SQLite store of finished hyperparameter trials.
+
+    :param pathlib.Path path: database path
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "create table if not exists trials ("
+                "study text, name text, tid integer, vals text, params text, "
+                "loss real, fold_scores text, fit_times text, "
+                "finished text, fitted_params text, pruned integer, "
+                "primary key (study, tid))"
+            )
+            columns = [row[1] for row in
+                       conn.execute("pragma table_info(trials)")]
+            for column, dtype in [('fitted_params', 'text'),
+                                  ('pruned', 'integer')]:
+                if column not in columns:
+                    conn.execute(
+                        f"alter table trials add column {column} {dtype}"
+                    )
+
+    def load(self, study):
+        """Load the finished trials of a study.
+
+        :param str study: study key
+        :return: hyperopt values and result of each trial, by trial ID
+        :rtype: list[tuple[int, dict, dict]]
+        """
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(
+                "select tid, vals, loss, fold_scores, fit_times, "
+                "fitted_params, pruned from trials where study = ? "
+                "order by tid",
+                (study,),
+            ).fetchall()
+        return [
+            (tid, json.loads(vals),
+             {'loss': loss, 'status': 'ok', 'pruned': bool(pruned),
+              'fold_scores': json.loads(fold_scores),
+              'fit_times': json.loads(fit_times),
+              'params': json.loads(fitted_params or 'null')})
+            for (tid, vals, loss, fold_scores, fit_times, fitted_params,
+                 pruned) in rows
+        ]
+
+    def save(self, study, name, docs, params):
+        """Save finished trials.
+
+        :param str study: study key
+        :param str name: model name
+        :param list[dict] docs: finished hyperopt trial documents
+        :param list[dict] params: hyperparameters of each trial
+        :return: None
+        :rtype: None
+        """
+        finished = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for doc, trial_params in zip(docs, params):
+            vals = {key: [float(val) for val in vals]
+                    for key, vals in doc['misc']['vals'].items()}
+            result = doc['result']
+            rows.append((
+                study, name, doc['tid'], json.dumps(vals),
+                json.dumps(trial_params, default=str), result['loss'],
+                json.dumps(result.get('fold_scores')),
+                json.dumps(result.get('fit_times')),
+                finished,
+                json.dumps(result.get('params')),
+                int(result.get('pruned', False)),
+            ))
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "insert or replace into trials (study, name, tid, vals, "
+                "params, loss, fold_scores, fit_times, finished, "
+                "fitted_params, pruned) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
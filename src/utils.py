@@ -70,27 +70,84 @@ def get_date_n_days_out(n):
     return formatted_date
 
 
-def shift_week_number(df):
-    """Shifts the week number of a df with season/team/week columns.
-    
-    Aggregations are nearly always calculated up to the *end* of a week.
-    Shifting is useful when you want your stats to align with the week before
-    or the week after (consistent with the bye weeks).
-
-    :param pd.DataFrame df: Dataframe with season/team/week cols
-    :param int n: Number of rows to shift.
-    :return: Dataframe with shifted weeks.
-    :rtype: pd.DataFrame
+def make_team_week_index(games):
+    """Index every team and week with a game.
+
+    Each team-week gets a dense integer key, team_week, in team, season and
+    week order, and a pointer, prev_team_week, to the key of the team's
+    previous game that season. Bye weeks have no row, so the previous game
+    is the last week the team played. The pointer is null for a team's first
+    game of the season.
+
+    :param pl.LazyFrame games: games with obj_team, adv_team, season and week
+        columns
+    :return: one row per team and week
+    :rtype: pl.LazyFrame
     """
     return (
-        df
+        pl.concat([
+            games.select(pl.col('obj_team').alias('team'), 'season', 'week'),
+            games.select(pl.col('adv_team').alias('team'), 'season', 'week'),
+        ])
+        .unique()
         .sort('team', 'season', 'week')
+        .with_row_index('team_week')
         .with_columns(
-            pl.exclude('team', 'season', 'week').shift(1).over(["team", "season"])
+            prev_team_week=pl.when(
+                (pl.col('team') == pl.col('team').shift())
+                & (pl.col('season') == pl.col('season').shift())
+            ).then(pl.col('team_week') - 1)
         )
+        .select('team', 'season', 'week', 'team_week', 'prev_team_week')
     )
 
 
+def lag_team_features(team_features, team_weeks):
+    """Align team stats with the game they go into.
+
+    Aggregations are nearly always calculated up to the *end* of a week, so
+    the stats going into a game are those through the team's previous game.
+
+    :param pl.LazyFrame team_features: stats through each team and week
+    :param pl.LazyFrame team_weeks: output of make_team_week_index
+    :return: stats through the team's previous game, for every team and
+        week in the index. Null for a team's first game of the season.
+    :rtype: pl.LazyFrame
+    """
+    keys = ['team', 'season', 'week']
+    names = team_features.collect_schema().names()
+    through = (
+        team_features
+        .join(team_weeks.select(*keys, 'team_week'), on=keys, how='inner')
+        .drop(keys)
+    )
+    return (
+        team_weeks
+        .join(through, left_on='prev_team_week', right_on='team_week',
+              how='left', maintain_order='left')
+        .select(names)
+    )
+
+
+def rolling_total(col, by, window):
+    """Sum a column over the last ``window`` rows of each group.
+
+    Computed as a difference of cumulative sums, so the frame must already be
+    sorted within each group.
+
+    :param str col: column to sum
+    :param list[str] by: group columns
+    :param int window: number of rows in the window, or None for every row
+        so far
+    :return: rolling total expression
+    :rtype: pl.Expr
+    """
+    total = pl.col(col).cum_sum()
+    if window is None:
+        return total.over(by)
+    return (total - total.shift(window, fill_value=0)).over(by)
+
+
 def rename_adv_cols(col_name):
     """Rename columns to specify away team feature.
 
@@ -120,18 +177,47 @@ def rename_obj_cols(col_name):
         return f'{col_name}_obj'
 
 
+def combine_team_features(team_features):
+    """Combine team feature tables into one table keyed by team and week.
+
+    Only team-weeks present in every table are kept, as the inner joins in
+    join_to_home_and_away would.
+
+    :param Iterable[pl.LazyFrame] team_features: tables with team, season and
+        week columns
+    :return: one row per team and week with every feature column
+    :rtype: pl.LazyFrame
+    """
+    tables = iter(team_features)
+    combined = next(tables)
+    for table in tables:
+        combined = combined.join(table, on=['team', 'season', 'week'],
+                                 how='inner')
+    return combined
+
+
 def join_to_home_and_away(games, team_features, drop_swt=True):
-    """"""
+    """Join team features to the obj and adv teams in each game.
+
+    :param pl.LazyFrame games: games with season, week, obj_team and adv_team
+        columns
+    :param pl.LazyFrame team_features: features keyed by team, season and
+        week
+    :param bool drop_swt: drop the season, week and team columns
+    :return: games with a {feature}_obj and {feature}_adv column per feature
+    :rtype: pl.LazyFrame
+    """
+    names = team_features.collect_schema().names()
     joined = (
         games
         .join(
-            team_features.rename(rename_obj_cols),
+            team_features.rename({c: rename_obj_cols(c) for c in names}),
             left_on=['season', 'week', 'obj_team'],
             right_on=['season', 'week', 'team'],
             how='inner',
         )
         .join(
-            team_features.rename(rename_adv_cols),
+            team_features.rename({c: rename_adv_cols(c) for c in names}),
             left_on=['season', 'week', 'adv_team'],
             right_on=['season', 'week', 'team'],
             how='inner',
@@ -140,5 +226,3 @@ def join_to_home_and_away(games, team_features, drop_swt=True):
     if drop_swt:
         joined = joined.drop('season', 'week', 'obj_team', 'adv_team')
     return joined
-
-
@@ -0,0 +1,105 @@
+"""Unit tests for src/data/cache.py."""
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.cache import FeatureCache
+
+
+def add_total(df, scores):
+    """A toy feature builder.
+
+    :param pl.LazyFrame df: games
+    :param pl.LazyFrame scores: scores
+    :return: games with a total column
+    """
+    return df.join(scores, on='game_id').with_columns(
+        total=pl.col('away_score') + pl.col('home_score')
+    )
+
+
+@pytest.fixture
+def games():
+    """A fixture for a small games frame.
+
+    :return: games
+    """
+    return pl.LazyFrame({'game_id': ['a', 'b', 'c']})
+
+
+@pytest.fixture
+def scores():
+    """A fixture for the scores of the games.
+
+    :return: scores
+    """
+    return pl.LazyFrame({'game_id': ['a', 'b', 'c'],
+                         'away_score': [10, 20, 30],
+                         'home_score': [7, 3, 24]})
+
+
+class TestFeatureCache:
+    """Tests for FeatureCache."""
+
+    def test_hit_case(self, tmp_path, games, scores):
+        """Test that a repeated call reads the cached output.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pl.LazyFrame games: games
+        :param pl.LazyFrame scores: scores
+        """
+        cache = FeatureCache(tmp_path)
+        builder = cache.wrap(add_total)
+        first = builder(games, scores=scores).collect()
+        [entry] = tmp_path.glob('*.parquet')
+        second = builder(games, scores=scores)
+        assert second.explain().count('Parquet') == 1
+        assert_frame_equal(second.collect(), first)
+        assert list(tmp_path.glob('*.parquet')) == [entry]
+
+    def test_changed_input_case(self, tmp_path, games, scores):
+        """Test that changing an input recomputes the output.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pl.LazyFrame games: games
+        :param pl.LazyFrame scores: scores
+        """
+        builder = FeatureCache(tmp_path).wrap(add_total)
+        builder(games, scores=scores).collect()
+        scores = scores.with_columns(home_score=pl.col('home_score') + 1)
+        result = builder(games, scores=scores).collect()
+        assert result['total'].to_list() == [18, 24, 55]
+        assert len(list(tmp_path.glob('*.parquet'))) == 2
+
+    def test_eviction_case(self, tmp_path, games, scores):
+        """Test that only the most recent entries are kept.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pl.LazyFrame games: games
+        :param pl.LazyFrame scores: scores
+        """
+        builder = FeatureCache(tmp_path, max_entries=2).wrap(add_total)
+        for i in range(4):
+            builder(games, scores=scores.with_columns(home_score=pl.lit(i)))
+        assert len(list(tmp_path.glob('*.parquet'))) == 2
+
+    def test_force_case(self, tmp_path, games, scores):
+        """Test that force recomputes a cached output.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pl.LazyFrame games: games
+        :param pl.LazyFrame scores: scores
+        """
+        calls = []
+
+        def counted_total(df, scores):
+            calls.append(1)
+            return add_total(df, scores)
+
+        FeatureCache(tmp_path).wrap(counted_total)(games, scores=scores)
+        FeatureCache(tmp_path).wrap(counted_total)(games, scores=scores)
+        assert len(calls) == 1
+        FeatureCache(tmp_path, force=True).wrap(counted_total)(games,
+                                                               scores=scores)
+        assert len(calls) == 2
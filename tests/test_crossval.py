@@ -0,0 +1,101 @@
+"""Unit tests for src/model/crossval.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+from src.config.config import DEFAULT_PARAM_PREFIX
+from src.model.crossval import cross_validate_folds, make_folds
+from src.model.estimators import build_lgbm_pipeline
+from src.model.evaluate import custom_cv
+from src.model.process import drop_columns
+
+
+@pytest.fixture
+def data():
+    """A fixture for eight seasons of training data.
+
+    :return: features and target
+    """
+    rng = np.random.default_rng(0)
+    n = 400
+    X = pd.DataFrame({'season': np.repeat(np.arange(2010, 2018), n // 8),
+                      'x1': rng.normal(size=n),
+                      'x2': rng.normal(5, 3, size=n)})
+    y = pd.Series((X['x1'] + rng.normal(size=n) > 0).astype(int))
+    return X, y
+
+
+@pytest.fixture
+def pipeline():
+    """A fixture for a pipeline with preprocessing steps.
+
+    :return: pipeline
+    """
+    column_reducer = FunctionTransformer(drop_columns,
+                                         kw_args={'columns': ['season']})
+    return make_pipeline(column_reducer, StandardScaler(),
+                         LogisticRegression())
+
+
+class TestMakeFolds:
+    """Tests for make_folds."""
+
+    def test_standard_case(self, data, pipeline):
+        """Test that preprocessing is fitted on each training fold only.
+
+        :param tuple data: features and target
+        :param sklearn.pipeline.Pipeline pipeline: pipeline
+        """
+        X, y = data
+        folds = make_folds(pipeline, X, y, custom_cv(4, 2, 1))
+        assert len(folds) == 3
+        for fold in folds:
+            scaler = fold.preprocessor[-1]
+            train_means = X.iloc[fold.train][['x1', 'x2']].mean().to_numpy()
+            assert np.allclose(scaler.mean_, train_means)
+            assert fold.X_test.shape == (len(fold.test), 2)
+
+
+class TestCrossValidateFolds:
+    """Tests for cross_validate_folds."""
+
+    def test_standard_case(self, data, pipeline):
+        """Test that scores match cross validating the whole pipeline.
+
+        :param tuple data: features and target
+        :param sklearn.pipeline.Pipeline pipeline: pipeline
+        """
+        X, y = data
+        cv = custom_cv(4, 2, 1)
+        params = {'logisticregression__C': 0.1}
+        expected = cross_val_score(pipeline.set_params(**params), X, y,
+                                   cv=cv, groups=X['season'],
+                                   scoring='neg_brier_score')
+        folds = make_folds(pipeline, X, y, cv)
+        _, _, scores, estimators = cross_validate_folds(
+            pipeline, folds, 'neg_brier_score', params, n_jobs=2
+        )
+        assert np.allclose(scores, expected)
+        assert estimators[0].predict_proba(X).shape == (len(X), 2)
+
+    def test_threads_case(self, data):
+        """Test that folds fitted in parallel fit LightGBM on one thread.
+
+        :param tuple data: features and target
+        """
+        X, y = data
+        pipeline = build_lgbm_pipeline()
+        folds = make_folds(pipeline, X, y, custom_cv(4, 2, 1))
+        params = {f"{DEFAULT_PARAM_PREFIX}n_estimators": 10,
+                  f"{DEFAULT_PARAM_PREFIX}verbosity": -1}
+        for n_jobs, threads in [(None, None), (2, 1)]:
+            *_, estimators = cross_validate_folds(
+                pipeline, folds, 'neg_brier_score', params, n_jobs=n_jobs
+            )
+            for estimator in estimators:
+                assert estimator[-1].estimator.n_jobs == threads
@@ -0,0 +1,62 @@
+"""Unit tests for src/model/estimators.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model.crossval import cross_validate_folds, make_folds
+from src.model.estimators import build_baseline_pipeline, with_calibration
+from src.model.evaluate import custom_cv
+
+
+ENSEMBLE = {'mode': 'ensemble', 'n_folds': 3, 'holdout_size': 1 / 3}
+HOLDOUT = {'mode': 'holdout', 'n_folds': 3, 'holdout_size': 1 / 3}
+
+
+@pytest.fixture
+def data():
+    """A fixture for twelve seasons of training data.
+
+    :return: features and target
+    """
+    rng = np.random.default_rng(0)
+    n = 2400
+    X = pd.DataFrame({'season': np.repeat(np.arange(2010, 2022), n // 12),
+                      'log5_pyexp': rng.uniform(0.1, 0.9, size=n),
+                      'rest_net': rng.integers(-7, 8, size=n),
+                      'obj_team_is_home': rng.integers(0, 2, size=n)})
+    z = 3 * (X['log5_pyexp'] - 0.5) + 0.3 * X['obj_team_is_home']
+    y = pd.Series((z + rng.logistic(size=n) > 0).astype(int))
+    return X, y
+
+
+class TestWithCalibration:
+    """Tests for with_calibration."""
+
+    def test_standard_case(self, data):
+        """Test that holdout calibration fits the estimator once.
+
+        :param tuple data: features and target
+        """
+        X, y = data
+        ensemble = build_baseline_pipeline(calibration=ENSEMBLE).fit(X, y)
+        holdout = with_calibration(ensemble, HOLDOUT).fit(X, y)
+        assert len(ensemble[-1].calibrated_classifiers_) == 3
+        assert len(holdout[-1].calibrated_classifiers_) == 1
+
+    def test_quality_case(self, data):
+        """Test that holdout calibration scores close to ensemble calibration
+        on the same folds.
+
+        :param tuple data: features and target
+        """
+        X, y = data
+        ensemble = build_baseline_pipeline(calibration=ENSEMBLE)
+        holdout = with_calibration(ensemble, HOLDOUT)
+        folds = make_folds(ensemble, X, y, custom_cv(6, 2, 2))
+        scores = {}
+        for name, pipeline in [('ensemble', ensemble), ('holdout', holdout)]:
+            _, _, fold_scores, _ = cross_validate_folds(pipeline, folds,
+                                                        'neg_brier_score')
+            scores[name] = -np.mean(fold_scores)
+        assert scores['holdout'] == pytest.approx(scores['ensemble'], abs=0.005)
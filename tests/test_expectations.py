@@ -0,0 +1,123 @@
+"""Unit tests for src/data/ancillary/expectations.py."""
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal, assert_series_equal
+
+from src.data.ancillary.expectations import (EV_COLUMNS,
+                                             calculate_field_position_ev,
+                                             preprocess_plays,
+                                             scan_ev_store,
+                                             update_ev_store)
+from src.data.raw.plays import scan_plays
+
+
+@pytest.fixture
+def plays():
+    """A fixture for plays where the net value is linear in field position.
+
+    Home first downs are worth a point more for each yard towards the end
+    zone, and away first downs half a point. Second downs are worth nothing.
+
+    :return: preprocessed plays
+    """
+    rows = []
+    for posteam_type, slope in [('home', 1.0), ('away', 0.5)]:
+        for yards in [10, 30, 50, 70]:
+            # own half for 10 and 30 yards, opponent's half for 70
+            if yards < 50:
+                yrdln = f"KC {yards}"
+            elif yards == 50:
+                yrdln = '50'
+            else:
+                yrdln = f"DEN {100 - yards}"
+            sign = 1 if posteam_type == 'home' else -1
+            for down, value in [(1, slope * yards), (2, 0.0)]:
+                rows.append({'posteam': 'KC', 'posteam_type': posteam_type,
+                             'down': down, 'yrdln': yrdln,
+                             'posteam_score': 0, 'defteam_score': 0,
+                             'result': sign * value})
+    return pl.LazyFrame(rows)
+
+
+class TestCalculateFieldPositionEv:
+    """Tests for calculate_field_position_ev."""
+
+    def test_standard_case(self, plays):
+        """Test that first down lines are fitted for each posteam type.
+
+        :param pl.LazyFrame plays: preprocessed plays
+        """
+        ev = calculate_field_position_ev(plays).collect()
+        assert ev.columns == ['absolute_yrdln', 'net_value', 'posteam_type',
+                              'down', 'expected_value']
+        assert ev['down'].unique().to_list() == [1]
+        assert ev['absolute_yrdln'].to_list() == [10, 30, 50, 70] * 2
+        assert_series_equal(ev['expected_value'], ev['net_value'],
+                            check_names=False)
+
+    def test_downs_case(self, plays):
+        """Test that several downs are fitted in one call.
+
+        :param pl.LazyFrame plays: preprocessed plays
+        """
+        ev = calculate_field_position_ev(plays, downs=[1, 2]).collect()
+        assert ev.height == 16
+        second_downs = ev.filter(pl.col('down') == 2)
+        assert second_downs['expected_value'].abs().max() < 1e-9
+
+
+@pytest.fixture
+def raw_plays_path(tmp_path, plays):
+    """A fixture for three seasons of play-by-play files.
+
+    Each season's net values are shifted by the season, so that every
+    season's fit is different.
+
+    :param pathlib.Path tmp_path: temporary directory
+    :param pl.LazyFrame plays: preprocessed plays
+    :return: play-by-play directory
+    """
+    for season in [2021, 2022, 2023]:
+        (
+            plays
+            .with_columns(pl.col('result') + (season - 2021),
+                          season=pl.lit(season), season_type=pl.lit('REG'),
+                          location=pl.lit('Home'))
+            .collect()
+            .write_parquet(tmp_path / f"play_by_play_{season}.parquet")
+        )
+    return tmp_path
+
+
+class TestUpdateEvStore:
+    """Tests for update_ev_store."""
+
+    def test_incremental_case(self, tmp_path, raw_plays_path):
+        """Test that adding a season at a time matches fitting every season.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pathlib.Path raw_plays_path: play-by-play directory
+        """
+        store_path = tmp_path / 'store'
+        assert update_ev_store(store_path, raw_plays_path, [2021]) == 1
+        assert update_ev_store(store_path, raw_plays_path,
+                               [2021, 2022, 2023]) == 2
+        assert update_ev_store(store_path, raw_plays_path,
+                               [2021, 2022, 2023]) == 0
+        store = scan_ev_store(store_path).collect()
+        for season in [2021, 2022, 2023]:
+            seasons = range(2021, season + 1)
+            expected = (
+                scan_plays(raw_plays_path, seasons, EV_COLUMNS)
+                .pipe(preprocess_plays)
+                .pipe(calculate_field_position_ev)
+                .collect()
+            )
+            result = (
+                store
+                .filter(pl.col('fit_through_season') == season)
+                .select(expected.columns)
+                .sort('posteam_type', 'down', 'absolute_yrdln')
+            )
+            assert_frame_equal(result, expected, check_exact=False)
@@ -0,0 +1,170 @@
+"""Unit tests for src/model/hyperoptimize.py."""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pytest
+from hyperopt import Trials, hp
+
+from src.model.hyperoptimize import (find_best_params,
+                                     make_pruning_thresholds,
+                                     record_trials)
+
+
+def quadratic(params):
+    """A fixture objective with its minimum at x = 3.
+
+    :param dict params: hyperparameters
+    :return: loss
+    :rtype: float
+    """
+    return (params['x'] - 3) ** 2
+
+
+def folded_quadratic(params, pruning=None, calls=None):
+    """A fixture objective scored over three folds, which prunes like
+    crossval_objective.
+
+    :param dict params: hyperparameters
+    :param dict pruning: output of make_pruning_thresholds
+    :param list calls: list to append each fitted fold to
+    :return: loss and fold scores
+    :rtype: dict
+    """
+    thresholds = [None, None] if pruning is None else pruning['thresholds']
+    scores = []
+    for fold, threshold in zip(range(3), [*thresholds, None]):
+        if calls is not None:
+            calls.append(fold)
+        scores.append(-(params['x'] - 3) ** 2 - fold)
+        loss = -np.mean(scores)
+        if threshold is not None and loss > threshold:
+            return {'loss': max(loss, pruning['pruned_loss']),
+                    'status': 'ok', 'fold_scores': scores}
+    return {'loss': loss, 'status': 'ok', 'fold_scores': scores}
+
+
+def make_trials(fold_scores):
+    """Make finished trials from their fold scores.
+
+    :param list[list[float]] fold_scores: fold scores of each trial
+    :return: finished trials
+    :rtype: hyperopt.Trials
+    """
+    trials = Trials()
+    docs = [{'state': 0, 'tid': tid, 'spec': None, 'result': {},
+             'misc': {'tid': tid, 'cmd': None, 'workdir': None,
+                      'idxs': {'x': [tid]}, 'vals': {'x': [0.0]}},
+             'exp_key': None, 'owner': None, 'version': 0,
+             'book_time': None, 'refresh_time': None}
+            for tid in trials.new_trial_ids(len(fold_scores))]
+    results = [{'loss': -np.mean(scores), 'status': 'ok',
+                'fold_scores': scores} for scores in fold_scores]
+    record_trials(trials, docs, results)
+    return trials
+
+
+@pytest.fixture
+def space():
+    """A fixture for a one-parameter search space.
+
+    :return: hyperparameter ranges
+    """
+    return {'x': hp.uniform('x', -10, 10)}
+
+
+class TestFindBestParams:
+    """Tests for find_best_params."""
+
+    def test_standard_case(self, space):
+        """Test that a seeded search finds the minimum.
+
+        :param dict space: hyperparameter ranges
+        """
+        best = find_best_params(quadratic, space, max_evals=60,
+                                early_stop_n=60, batch_size=4, seed=0)
+        assert best['x'] == pytest.approx(3, abs=0.5)
+
+    def test_executor_case(self, space):
+        """Test that evaluating batches concurrently gives the same search.
+
+        :param dict space: hyperparameter ranges
+        """
+        serial = find_best_params(quadratic, space, max_evals=20,
+                                  early_stop_n=20, batch_size=4, seed=1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            concurrent = find_best_params(quadratic, space, max_evals=20,
+                                          early_stop_n=20, batch_size=4,
+                                          seed=1, executor=executor)
+        assert concurrent == serial
+
+    def test_batch_size_case(self, space):
+        """Test that batches stay full once TPE models the trials, past its
+        20 random startup trials.
+
+        :param dict space: hyperparameter ranges
+        """
+        batch_sizes = []
+        find_best_params(quadratic, space, max_evals=42, early_stop_n=42,
+                         batch_size=4, seed=0,
+                         on_batch=lambda docs, _: batch_sizes.append(len(docs)))
+        assert batch_sizes == [4] * 10 + [2]
+
+    def test_early_stop_case(self, space):
+        """Test that the search stops once the loss stops improving.
+
+        :param dict space: hyperparameter ranges
+        """
+        calls = []
+
+        def constant(params):
+            calls.append(params)
+            return 1.0
+
+        find_best_params(constant, space, max_evals=100, early_stop_n=5,
+                         batch_size=2, seed=0)
+        assert len(calls) == 6
+
+
+class TestMakePruningThresholds:
+    """Tests for make_pruning_thresholds."""
+
+    def test_standard_case(self):
+        """Test that the thresholds are the median partial losses."""
+        trials = make_trials([[-1.0, -3.0, -5.0],
+                              [-2.0, -2.0, -2.0],
+                              [-3.0, -5.0, -7.0],
+                              [-6.0]])
+        pruning = make_pruning_thresholds(trials, min_trials=3)
+        # partial losses after one fold are 1, 2, 3 and 6; after two, 2, 2, 4
+        assert pruning['thresholds'] == pytest.approx([2.5, 2.0])
+        assert pruning['pruned_loss'] == pytest.approx(5.0)
+
+    def test_warm_up_case(self):
+        """Test that nothing is pruned before enough trials finish, or
+        before the first folds are fitted."""
+        trials = make_trials([[-1.0, -3.0, -5.0], [-2.0, -2.0, -2.0]])
+        assert make_pruning_thresholds(trials, min_trials=3) is None
+        pruning = make_pruning_thresholds(trials, min_trials=2, min_folds=2,
+                                          tolerance=0.5)
+        assert pruning['thresholds'] == [None, pytest.approx(3.0)]
+
+    def test_search_case(self, space):
+        """Test that a pruned search fits fewer folds and still finds the
+        minimum.
+
+        :param dict space: hyperparameter ranges
+        """
+        full_calls, pruned_calls = [], []
+        full = find_best_params(partial(folded_quadratic, calls=full_calls),
+                                space, max_evals=60, early_stop_n=60,
+                                batch_size=4, seed=0)
+        pruned = find_best_params(partial(folded_quadratic,
+                                          calls=pruned_calls),
+                                  space, max_evals=60, early_stop_n=60,
+                                  batch_size=4, seed=0,
+                                  pruning={'min_trials': 8})
+        assert len(pruned_calls) < 0.8 * len(full_calls)
+        assert pruned['x'] == pytest.approx(3, abs=0.5)
+        assert full['x'] == pytest.approx(3, abs=0.5)
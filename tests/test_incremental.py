@@ -0,0 +1,106 @@
+"""Unit tests for src/data/incremental.py."""
+
+import datetime
+import itertools
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.incremental import (TEAM_FEATURES,
+                                  is_after,
+                                  materialise_team_features,
+                                  read_state,
+                                  scan_team_features)
+
+
+TEAMS = ['BUF', 'MIA', 'NE', 'NYJ']
+
+
+@pytest.fixture
+def tables():
+    """A fixture for two seasons of boxscore tables for a four-team league.
+
+    :return: drives, scores, player offense and starters
+    """
+    rng = np.random.default_rng(0)
+    drives, scores, player_offense, starters = [], [], [], []
+    for season, week in itertools.product([2023, 2024], range(1, 9)):
+        order = rng.permutation(TEAMS)
+        for away, home in [order[:2], order[2:]]:
+            date = (datetime.date(season, 9, 7)
+                    + datetime.timedelta(weeks=week - 1))
+            pfr = f"{date:%Y%m%d}0{home.lower()}"
+            points = rng.integers(0, 40, size=2)
+            scores.append({'obj_team': away, 'adv_team': home,
+                           'season': season, 'week': week,
+                           'obj_score': points[0], 'adv_score': points[1]})
+            for team, opp in [(away, home), (home, away)]:
+                for _ in range(3):
+                    drives.append({'posteam': team, 'season': season,
+                                   'week': week, 'defteam': opp, 'pfr': pfr,
+                                   'Net Yds': rng.integers(-5, 80),
+                                   'Plays': rng.integers(1, 12)})
+                # teams change starting QB in week 5 of 2024
+                qb = f"{team} QB{int(season == 2024 and week >= 5)}"
+                attempts = rng.integers(10, 40)
+                player_offense.append({
+                    'player': qb, 'pfr': pfr, 'season': season, 'week': week,
+                    'completions': rng.integers(0, attempts),
+                    'pass_attempts': attempts,
+                    'pass_yards': rng.integers(0, 400),
+                    'pass_td': rng.integers(0, 4),
+                    'interceptions': rng.integers(0, 3),
+                })
+                starters.append({'posteam': team, 'season': season,
+                                 'week': week, 'pfr': pfr, 'QB_1': qb})
+    return {'drives': pl.LazyFrame(drives),
+            'scores': pl.LazyFrame(scores),
+            'player_offense': pl.LazyFrame(player_offense),
+            'starters': pl.LazyFrame(starters)}
+
+
+def read_team_features(store_path):
+    """Read the team feature store, sorted.
+
+    :param pathlib.Path store_path: team feature store directory
+    :return: one table per name
+    """
+    return {name: table.sort('team', 'season', 'week').collect()
+            for name, table in scan_team_features(store_path).items()}
+
+
+class TestMaterialiseTeamFeatures:
+    """Tests for materialise_team_features."""
+
+    def test_incremental_case(self, tmp_path, tables):
+        """Test that adding a week at a time matches a full build.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param dict tables: boxscore tables
+        """
+        materialise_team_features(tmp_path / 'full', **tables)
+        expected = read_team_features(tmp_path / 'full')
+
+        store_path = tmp_path / 'incremental'
+        weeks = [(2023, 6), (2023, 8), (2024, 1), (2024, 5), (2024, 8)]
+        for season, week in weeks:
+            upto = {name: table.filter(~is_after(season, week))
+                    for name, table in tables.items()}
+            assert materialise_team_features(store_path, **upto) > 0
+            assert read_state(store_path) == (season, week)
+        result = read_team_features(store_path)
+        for name in TEAM_FEATURES:
+            assert_frame_equal(result[name], expected[name])
+
+    def test_up_to_date_case(self, tmp_path, tables):
+        """Test that nothing is written when there are no new weeks.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param dict tables: boxscore tables
+        """
+        assert materialise_team_features(tmp_path, **tables) == 16
+        files = sorted(tmp_path.rglob('*.parquet'))
+        assert materialise_team_features(tmp_path, **tables) == 0
+        assert sorted(tmp_path.rglob('*.parquet')) == files
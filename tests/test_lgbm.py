@@ -0,0 +1,104 @@
+"""Unit tests for src/model/lgbm.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model.crossval import make_folds
+from src.model.estimators import build_lgbm_pipeline
+from src.model.evaluate import custom_cv
+from src.model.hyperoptimize import crossval_objective
+from src.model.lgbm import (get_booster_params,
+                            get_fold_datasets,
+                            lgbm_objective)
+
+
+HOLDOUT = {'mode': 'holdout', 'n_folds': 3, 'holdout_size': 1 / 3}
+PREFIX = 'calibratedclassifiercv__estimator__'
+PARAMS = {f"{PREFIX}n_estimators": 200,
+          f"{PREFIX}learning_rate": 0.3,
+          f"{PREFIX}num_leaves": 15,
+          f"{PREFIX}min_data_in_leaf": 20,
+          f"{PREFIX}verbosity": -1}
+
+
+@pytest.fixture
+def data():
+    """A fixture for eight seasons of training data.
+
+    :return: features and target
+    """
+    rng = np.random.default_rng(0)
+    n = 1600
+    X = pd.DataFrame({'season': np.repeat(np.arange(2010, 2018), n // 8),
+                      'x1': rng.normal(size=n),
+                      'x2': rng.normal(size=n)})
+    y = pd.Series((X['x1'] + rng.logistic(size=n) > 0).astype(int))
+    return X, y
+
+
+@pytest.fixture
+def folds(data):
+    """A fixture for the folds of a holdout-calibrated LGBM pipeline.
+
+    :param tuple data: features and target
+    :return: pipeline and folds
+    """
+    X, y = data
+    model = build_lgbm_pipeline(calibration=HOLDOUT)
+    return model, make_folds(model, X, y, custom_cv(4, 2, 2))
+
+
+class TestLgbmObjective:
+    """Tests for lgbm_objective."""
+
+    def test_standard_case(self, folds):
+        """Test that training every round scores like the pipeline.
+
+        :param tuple folds: pipeline and folds
+        """
+        model, folds = folds
+        expected = crossval_objective(PARAMS, model, folds, 'neg_brier_score')
+        result = lgbm_objective(PARAMS, model, folds, 'neg_brier_score',
+                                calibration=HOLDOUT,
+                                early_stopping_rounds=None)
+        assert result['loss'] == pytest.approx(expected['loss'], abs=1e-5)
+        assert result['params'] == {f"{PREFIX}n_estimators": 200}
+
+    def test_early_stopping_case(self, folds):
+        """Test that early stopping keeps fewer rounds and reuses the binned
+        datasets.
+
+        :param tuple folds: pipeline and folds
+        """
+        model, folds = folds
+        _, binning_params, _ = get_booster_params(model[-1].estimator)
+        datasets = get_fold_datasets(folds[0], HOLDOUT, binning_params)
+        result = lgbm_objective(PARAMS, model, folds, 'neg_brier_score',
+                                calibration=HOLDOUT, early_stopping_rounds=5)
+        assert result['params'][f"{PREFIX}n_estimators"] < 200
+        assert get_fold_datasets(folds[0], HOLDOUT,
+                                 binning_params) is datasets
+
+    def test_other_data_case(self, data, folds):
+        """Test that folds of the same rows of other data get their own
+        datasets, and that a search on them drops the last search's.
+
+        :param tuple data: features and target
+        :param tuple folds: pipeline and folds
+        """
+        model, folds = folds
+        X, y = data
+        other_folds = make_folds(model, X.assign(x1=-X['x1']), y,
+                                 custom_cv(4, 2, 2))
+        _, binning_params, _ = get_booster_params(model[-1].estimator)
+        datasets = get_fold_datasets(folds[0], HOLDOUT, binning_params)
+        other = get_fold_datasets(other_folds[0], HOLDOUT, binning_params)
+        assert other is not datasets
+        assert not np.array_equal(other[0].get_data(), datasets[0].get_data())
+        lgbm_objective(PARAMS, model, other_folds, 'neg_brier_score',
+                       calibration=HOLDOUT, early_stopping_rounds=5)
+        assert get_fold_datasets(other_folds[0], HOLDOUT,
+                                 binning_params) is other
+        assert get_fold_datasets(folds[0], HOLDOUT,
+                                 binning_params) is not datasets
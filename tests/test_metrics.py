@@ -0,0 +1,95 @@
+"""Unit tests for src/model/metrics.py."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.calibration import calibration_curve
+from sklearn.metrics import (brier_score_loss,
+                             confusion_matrix,
+                             f1_score,
+                             log_loss,
+                             roc_auc_score)
+
+from src.model.estimators import build_baseline_pipeline
+from src.model.evaluate import custom_cv, evaluate_model
+from src.model.metrics import rank_sorted, score_probabilities
+
+
+@pytest.fixture
+def predictions():
+    """A fixture for a target and tied, rounded predicted probabilities.
+
+    :return: target and predicted probabilities
+    """
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, size=500)
+    y_pred_proba = np.round(np.clip(0.5 + 0.3 * (y - 0.5)
+                                    + rng.normal(0, 0.2, size=500), 0, 1), 2)
+    return y, y_pred_proba
+
+
+class TestRankSorted:
+    """Tests for rank_sorted."""
+
+    def test_standard_case(self):
+        """Test that tied values get their average rank."""
+        ranks = rank_sorted(np.array([[0.1, 0.2, 0.2, 0.2, 0.7, 0.7]]))
+        assert ranks.tolist() == [[1, 3, 3, 3, 5.5, 5.5]]
+
+
+class TestScoreProbabilities:
+    """Tests for score_probabilities."""
+
+    def test_standard_case(self, predictions):
+        """Test that the metrics match sklearn's.
+
+        :param tuple predictions: target and predicted probabilities
+        """
+        y, y_pred_proba = predictions
+        y_pred = (y_pred_proba > 0.5).astype(int)
+        scores = score_probabilities(y, y_pred_proba)
+        prob_true, prob_pred = calibration_curve(y, y_pred_proba, n_bins=7,
+                                                 strategy='quantile')
+        nonempty = ~np.isnan(scores['prob_true'])
+        assert scores['neg_brier_score'] == pytest.approx(
+            -brier_score_loss(y, y_pred_proba)
+        )
+        assert scores['neg_log_loss'] == pytest.approx(
+            -log_loss(y, y_pred_proba)
+        )
+        assert scores['roc_auc'] == pytest.approx(
+            roc_auc_score(y, y_pred_proba)
+        )
+        assert scores['f1'] == pytest.approx(f1_score(y, y_pred))
+        assert ([scores[count] for count in ['tn', 'fp', 'fn', 'tp']]
+                == confusion_matrix(y, y_pred).ravel().tolist())
+        assert np.allclose(scores['prob_true'][nonempty], prob_true)
+        assert np.allclose(scores['prob_pred'][nonempty], prob_pred)
+
+    def test_batch_case(self, predictions):
+        """Test that each row of a batch scores like it does on its own.
+
+        :param tuple predictions: target and predicted probabilities
+        """
+        y, y_pred_proba = predictions
+        rng = np.random.default_rng(1)
+        samples = rng.integers(0, len(y), size=(20, len(y)))
+        batch = score_probabilities(y[samples], y_pred_proba[samples])
+        for i, sample in enumerate(samples):
+            scores = score_probabilities(y[sample], y_pred_proba[sample])
+            for metric, score in scores.items():
+                assert np.allclose(batch[metric][i], score, equal_nan=True)
+
+    def test_score_table_case(self):
+        """Test that evaluate_model's score table is all floats."""
+        rng = np.random.default_rng(0)
+        n = 1200
+        X = pd.DataFrame({'season': np.repeat(np.arange(2010, 2018), n // 8),
+                          'log5_pyexp': rng.uniform(0.1, 0.9, size=n),
+                          'rest_net': rng.integers(-7, 8, size=n),
+                          'obj_team_is_home': rng.integers(0, 2, size=n)})
+        y = pd.Series((3 * (X['log5_pyexp'] - 0.5)
+                       + rng.logistic(size=n) > 0).astype(int))
+        scores, _ = evaluate_model(build_baseline_pipeline(), X, y,
+                                   custom_cv(4, 2, 2))
+        assert all(dtype == np.float64 for dtype in scores.dtypes)
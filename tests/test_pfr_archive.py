@@ -0,0 +1,102 @@
+"""Unit tests for src/data/pfr/archive.py."""
+
+import gzip
+import pathlib
+
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.pfr.archive import BoxscoreArchive, import_html_files
+from src.data.pfr.tables import TABLE_NAMES, parse_boxscores
+
+
+FIXTURES_PATH = pathlib.Path(__file__).parent / 'fixtures' / 'pfr'
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A fixture for an empty archive.
+
+    :param pathlib.Path tmp_path: temporary directory
+    :return: archive
+    """
+    with BoxscoreArchive(tmp_path / 'archive', pack_size=2048) as archive:
+        yield archive
+
+
+class TestBoxscoreArchive:
+    """Tests for BoxscoreArchive."""
+
+    def test_standard_case(self, archive):
+        """Test that pages round trip.
+
+        :param BoxscoreArchive archive: archive
+        """
+        pages = {path.stem: path.read_text()
+                 for path in sorted(FIXTURES_PATH.glob('*.html'))}
+        for pfr_id, html in pages.items():
+            archive.put(pfr_id, html)
+        assert archive.ids() == set(pages)
+        for pfr_id, html in pages.items():
+            assert archive.get(pfr_id) == html
+
+    def test_dedup_case(self, archive):
+        """Test that identical pages are stored once.
+
+        :param BoxscoreArchive archive: archive
+        """
+        first = archive.put('202409050kan', '<html>same</html>')
+        second = archive.put('202409080cin', '<html>same</html>')
+        assert first == second
+        assert archive.pack_path(0).stat().st_size == len(
+            gzip.compress(b'<html>same</html>', mtime=0))
+
+    def test_replace_case(self, archive):
+        """Test that putting a game again replaces its page.
+
+        :param BoxscoreArchive archive: archive
+        """
+        archive.put('202409050kan', '<html>old</html>')
+        assert archive.get('202409050kan') == '<html>old</html>'
+        archive.put('202409050kan', '<html>new</html>')
+        assert archive.get('202409050kan') == '<html>new</html>'
+        assert len(archive) == 1
+
+    def test_pack_rollover_case(self, archive):
+        """Test that a new pack is started once a pack is full.
+
+        :param BoxscoreArchive archive: archive
+        """
+        for path in sorted(FIXTURES_PATH.glob('*.html')):
+            archive.put(path.stem, path.read_text())
+        assert archive.pack_path(1).exists()
+        packs = sorted(archive.path.glob('pack-*.gz'))
+        for path in packs:
+            # every pack is a valid multi-member gzip file
+            gzip.decompress(path.read_bytes())
+
+    def test_missing_case(self, archive):
+        """Test that reading a missing page raises a KeyError.
+
+        :param BoxscoreArchive archive: archive
+        """
+        with pytest.raises(KeyError):
+            archive.get('202409050kan')
+        assert '202409050kan' not in archive
+
+
+class TestParseArchivedBoxscores:
+    """Tests for parsing boxscores from an archive."""
+
+    def test_standard_case(self, archive):
+        """Test that parsing from the archive matches parsing html files.
+
+        :param BoxscoreArchive archive: archive
+        """
+        paths = sorted(FIXTURES_PATH.glob('*.html'))
+        assert import_html_files(archive, paths) == len(paths)
+        from_files = parse_boxscores(paths, n_jobs=1)
+        from_archive = parse_boxscores([p.stem for p in paths], n_jobs=2,
+                                       archive_path=archive.path)
+        for name in TABLE_NAMES:
+            assert_frame_equal(from_archive[name], from_files[name])
@@ -0,0 +1,80 @@
+"""Unit tests for src/data/pfr/extract.py."""
+
+import pathlib
+
+import pytest
+from bs4 import BeautifulSoup
+from polars.testing import assert_frame_equal
+
+from src.data.pfr.extract import extract_table_rows, find_tables
+from src.data.pfr.tables import (TABLE_NAMES,
+                                 extract_all_table_rows_bs4,
+                                 parse_boxscore)
+
+
+FIXTURES_PATH = pathlib.Path(__file__).parent / 'fixtures' / 'pfr'
+
+
+@pytest.fixture(params=sorted(FIXTURES_PATH.glob('*.html')),
+                ids=lambda p: p.stem)
+def boxscore_path(request):
+    """A fixture for each page in the boxscore corpus.
+
+    :return: boxscore html file
+    """
+    return request.param
+
+
+class TestExtractTableRows:
+    """Tests for extract_table_rows."""
+
+    def test_matches_bs4_case(self, boxscore_path):
+        """Test that rows match the BeautifulSoup extraction.
+
+        :param pathlib.Path boxscore_path: boxscore html file
+        """
+        html = boxscore_path.read_text()
+        assert extract_table_rows(html) == extract_all_table_rows_bs4(html)
+
+    def test_prettified_case(self, boxscore_path):
+        """Test that rows match on a prettified page.
+
+        :param pathlib.Path boxscore_path: boxscore html file
+        """
+        html = BeautifulSoup(boxscore_path.read_text(), 'html.parser').prettify()
+        assert extract_table_rows(html) == extract_all_table_rows_bs4(html)
+
+    def test_tables_case(self, boxscore_path):
+        """Test that both engines build identical tables.
+
+        :param pathlib.Path boxscore_path: boxscore html file
+        """
+        html = boxscore_path.read_text()
+        fast = parse_boxscore(html, boxscore_path.stem, engine='fast')
+        reference = parse_boxscore(html, boxscore_path.stem, engine='bs4')
+        for name in TABLE_NAMES:
+            assert_frame_equal(fast[name], reference[name])
+
+
+class TestFindTables:
+    """Tests for find_tables."""
+
+    def test_comment_preference_case(self):
+        """Test which copy is used when a table is both rendered and
+        commented out."""
+        html = (
+            '<table id="player_offense"><tr><td>body</td></tr></table>'
+            '<table id="team_stats"><tr><td>body</td></tr></table>'
+            '<!-- <table id="player_offense"><tr><td>comment</td></tr></table>'
+            '<table id="team_stats"><tr><td>comment</td></tr></table> -->'
+        )
+        tables = find_tables(html, ['player_offense', 'team_stats'])
+        assert 'body' in tables['player_offense']
+        assert 'comment' in tables['team_stats']
+
+    def test_nested_table_case(self):
+        """Test that a nested table doesn't end the outer table early."""
+        html = ('<table id="team_stats"><tr><td><table><tr><td>x</td></tr>'
+                '</table></td></tr><tr><td>last</td></tr></table>')
+        tables = find_tables(html, ['team_stats'])
+        assert tables['team_stats'].endswith('<td>last</td></tr></table>')
@@ -0,0 +1,152 @@
+"""Unit tests for src/data/pfr/raw.py."""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.pfr.raw import TokenBucket, fetch_boxscores, get_existing_pfr_ids
+
+
+class StubBoxscoreHandler(BaseHTTPRequestHandler):
+    """Serves fake boxscore pages.
+
+    Game IDs starting with 'throttled' get a 429 on the first request, IDs
+    starting with 'flaky' get a 503 on the first request, and IDs starting
+    with 'missing' always get a 404.
+    """
+
+    def do_GET(self):
+        game_id = self.path.rsplit('/', 1)[-1].removesuffix('.htm')
+        with self.server.lock:
+            self.server.hits[game_id] = self.server.hits.get(game_id, 0) + 1
+            hits = self.server.hits[game_id]
+        if game_id.startswith('missing'):
+            self.send_response(404)
+            self.end_headers()
+        elif game_id.startswith('throttled') and hits == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+        elif game_id.startswith('flaky') and hits == 1:
+            self.send_response(503)
+            self.end_headers()
+        else:
+            body = f"<html><body>{game_id}</body></html>".encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """A fixture for a local boxscore server.
+
+    :return: the running server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBoxscoreHandler)
+    server.hits = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run_fetch(server, game_ids, **kwargs):
+    """Fetch boxscores from the stub server.
+
+    :param ThreadingHTTPServer server: stub server
+    :param list[str] game_ids: pfr game IDs
+    :return: saved pages and failures
+    :rtype: tuple[dict, dict]
+    """
+    saved = {}
+    base_url = f"http://127.0.0.1:{server.server_port}/boxscores"
+    kwargs = {'rate': 1000, 'burst': 10, 'backoff': 0.01, **kwargs}
+    failures = asyncio.run(
+        fetch_boxscores(game_ids, saved.__setitem__, base_url=base_url, **kwargs)
+    )
+    return saved, failures
+
+
+class TestFetchBoxscores:
+    """Tests for fetch_boxscores."""
+
+    def test_standard_case(self, stub_server):
+        """Test that every page is fetched and saved once.
+
+        :param ThreadingHTTPServer stub_server: stub server
+        """
+        game_ids = [f'2024090{i}0kan' for i in range(8)]
+        saved, failures = run_fetch(stub_server, game_ids)
+        assert failures == {}
+        assert set(saved) == set(game_ids)
+        assert all(i in saved[i] for i in game_ids)
+        assert all(hits == 1 for hits in stub_server.hits.values())
+
+    def test_retry_case(self, stub_server):
+        """Test that 429 and 5xx responses are retried.
+
+        :param ThreadingHTTPServer stub_server: stub server
+        """
+        saved, failures = run_fetch(stub_server, ['throttled1', 'flaky1'])
+        assert failures == {}
+        assert set(saved) == {'throttled1', 'flaky1'}
+        assert stub_server.hits == {'throttled1': 2, 'flaky1': 2}
+
+    def test_missing_case(self, stub_server):
+        """Test that a 404 fails that game only, without retrying.
+
+        :param ThreadingHTTPServer stub_server: stub server
+        """
+        saved, failures = run_fetch(stub_server, ['missing1', 'found1'])
+        assert set(failures) == {'missing1'}
+        assert set(saved) == {'found1'}
+        assert stub_server.hits['missing1'] == 1
+
+    def test_rate_limit_case(self, stub_server):
+        """Test that the token bucket holds the request rate.
+
+        :param ThreadingHTTPServer stub_server: stub server
+        """
+        start = time.monotonic()
+        saved, _ = run_fetch(stub_server, [f'game{i}' for i in range(6)],
+                             rate=20, burst=1, max_concurrency=6)
+        elapsed = time.monotonic() - start
+        assert len(saved) == 6
+        assert elapsed >= 5 / 20
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket."""
+
+    def test_drain_case(self):
+        """Test that draining the bucket delays the next token."""
+        async def wait_after_drain():
+            bucket = TokenBucket(rate=100, capacity=5)
+            bucket.drain(0.1)
+            start = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - start
+        assert asyncio.run(wait_after_drain()) >= 0.1
+
+
+class TestGetExistingPfrIds:
+    """Tests for get_existing_pfr_ids."""
+
+    def test_standard_case(self, tmp_path):
+        """Test that only html files are indexed.
+
+        :param pathlib.Path tmp_path: temporary directory
+        """
+        (tmp_path / '202409050kan.html').write_text('')
+        (tmp_path / 'notes.txt').write_text('')
+        assert get_existing_pfr_ids(tmp_path) == {'202409050kan'}
@@ -0,0 +1,95 @@
+"""Unit tests for src/data/pfr/store.py."""
+
+import pathlib
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.pfr.store import (pfr_season,
+                                scan_parquet_store,
+                                upsert_parquet_store,
+                                write_parquet_store)
+from src.data.pfr.tables import TABLE_NAMES, build_tables, parse_boxscores
+
+
+FIXTURES_PATH = pathlib.Path(__file__).parent / 'fixtures' / 'pfr'
+
+
+@pytest.fixture
+def boxscore_paths():
+    """A fixture for a small corpus of boxscore pages.
+
+    :return: boxscore html files
+    """
+    return sorted(FIXTURES_PATH.glob('*.html'))
+
+
+class TestPfrSeason:
+    """Tests for pfr_season."""
+
+    def test_standard_case(self):
+        """Test that January and February games belong to the prior season."""
+        pfr = pl.DataFrame({'pfr': ['202409050kan', '202501050kan',
+                                    '202202130ram', '202103070xxx']})
+        seasons = pfr.select(pfr_season()).to_series().to_list()
+        assert seasons == [2024, 2024, 2021, 2021]
+
+
+class TestParquetStore:
+    """Tests for the parquet store."""
+
+    def test_round_trip_case(self, tmp_path, boxscore_paths):
+        """Test that scanning the store gives back the written tables.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        """
+        tables = build_tables(parse_boxscores(boxscore_paths, n_jobs=1))
+        write_parquet_store(tables, tmp_path)
+        assert sorted(p.name for p in (tmp_path / 'drives').iterdir()) == [
+            'season=2023', 'season=2024']
+        for name in TABLE_NAMES:
+            result = scan_parquet_store(tmp_path, name).drop('season').collect()
+            assert_frame_equal(result, tables[name].collect(),
+                               check_row_order=False, check_column_order=False)
+
+    def test_season_pruning_case(self, tmp_path, boxscore_paths):
+        """Test that a season filter only returns that season.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        """
+        tables = build_tables(parse_boxscores(boxscore_paths, n_jobs=1))
+        write_parquet_store(tables, tmp_path)
+        drives = (
+            scan_parquet_store(tmp_path, 'drives')
+            .filter(pl.col('season') >= 2024)
+            .select('pfr', 'Net Yds')
+            .collect()
+        )
+        assert set(drives['pfr']) == {'202409050kan', '202409080cin'}
+
+    def test_upsert_case(self, tmp_path, boxscore_paths):
+        """Test that upserting games matches a full write.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        """
+        full_path = tmp_path / 'full'
+        write_parquet_store(build_tables(parse_boxscores(boxscore_paths,
+                                                         n_jobs=1)),
+                            full_path)
+        incremental_path = tmp_path / 'incremental'
+        write_parquet_store(build_tables(parse_boxscores(boxscore_paths[:2],
+                                                         n_jobs=1)),
+                            incremental_path)
+        upsert_paths = boxscore_paths[1:]
+        upsert_parquet_store(build_tables(parse_boxscores(upsert_paths,
+                                                          n_jobs=1)),
+                             incremental_path, [p.stem for p in upsert_paths])
+        for name in TABLE_NAMES:
+            expected = scan_parquet_store(full_path, name).collect()
+            result = scan_parquet_store(incremental_path, name).collect()
+            assert_frame_equal(result, expected, check_row_order=False,
+                               check_column_order=False)
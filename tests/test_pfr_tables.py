@@ -0,0 +1,133 @@
+"""Unit tests for src/data/pfr/tables.py."""
+
+import os
+import pathlib
+import shutil
+import sqlite3
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.pfr.tables import (TABLE_NAMES,
+                                 build_tables,
+                                 find_stale_files,
+                                 make_manifest_entry,
+                                 make_shards,
+                                 parse_boxscores,
+                                 read_manifest,
+                                 upsert_tables,
+                                 write_manifest,
+                                 write_tables)
+
+
+FIXTURES_PATH = pathlib.Path(__file__).parent / 'fixtures' / 'pfr'
+
+
+@pytest.fixture
+def boxscore_paths():
+    """A fixture for a small corpus of boxscore pages.
+
+    :return: boxscore html files
+    """
+    return sorted(FIXTURES_PATH.glob('*.html'))
+
+
+class TestParseBoxscores:
+    """Tests for parse_boxscores."""
+
+    def test_standard_case(self, boxscore_paths):
+        """Test that every table is parsed for every game.
+
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        """
+        tables = parse_boxscores(boxscore_paths, n_jobs=1)
+        assert list(tables) == TABLE_NAMES
+        for name in ['team_stats', 'starters']:
+            assert tables[name].height == 2 * len(boxscore_paths)
+
+    def test_parallel_case(self, boxscore_paths):
+        """Test that parsing on a process pool matches parsing serially.
+
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        """
+        serial = parse_boxscores(boxscore_paths, n_jobs=1)
+        parallel = parse_boxscores(boxscore_paths, n_jobs=2, shards_per_job=1)
+        for name in TABLE_NAMES:
+            assert_frame_equal(serial[name], parallel[name])
+
+
+class TestMakeShards:
+    """Tests for make_shards."""
+
+    def test_standard_case(self):
+        """Test that shards are contiguous and cover every path."""
+        shards = make_shards(list(range(10)), 4)
+        assert shards == [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]
+
+    def test_more_shards_than_paths_case(self):
+        """Test that empty shards are dropped."""
+        assert make_shards([0, 1], 4) == [[0], [1]]
+
+
+class TestIncrementalBuild:
+    """Tests for the incremental table build."""
+
+    @pytest.fixture
+    def pfr_path(self, tmp_path, boxscore_paths):
+        """A fixture for a copy of the boxscore corpus.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param list[pathlib.Path] boxscore_paths: boxscore html files
+        :return: directory of boxscore html files
+        """
+        pfr_path = tmp_path / 'pfr'
+        pfr_path.mkdir()
+        for path in boxscore_paths:
+            shutil.copy(path, pfr_path / path.name)
+        return pfr_path
+
+    def test_find_stale_files_case(self, tmp_path, pfr_path):
+        """Test that only new and changed files are stale.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pathlib.Path pfr_path: directory of boxscore html files
+        """
+        db_path = tmp_path / 'boxscore-stats.db'
+        paths = sorted(pfr_path.glob('*.html'))
+        write_manifest(db_path, [make_manifest_entry(p) for p in paths[:2]])
+        manifest = read_manifest(db_path)
+
+        stat = paths[0].stat()
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with open(paths[1], 'a') as f:
+            f.write('<!-- edited -->')
+        stale, touched = find_stale_files(paths, manifest)
+        assert [e[0] for e in stale] == [paths[1].stem, paths[2].stem]
+        assert [e[0] for e in touched] == [paths[0].stem]
+
+    def test_upsert_case(self, tmp_path, pfr_path):
+        """Test that upserting games matches a full rebuild.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param pathlib.Path pfr_path: directory of boxscore html files
+        """
+        paths = sorted(pfr_path.glob('*.html'))
+        full_path = tmp_path / 'full.db'
+        write_tables(build_tables(parse_boxscores(paths, n_jobs=1)), full_path)
+
+        incremental_path = tmp_path / 'incremental.db'
+        write_tables(build_tables(parse_boxscores(paths[:2], n_jobs=1)),
+                     incremental_path)
+        upsert_paths = paths[1:]
+        upsert_tables(build_tables(parse_boxscores(upsert_paths, n_jobs=1)),
+                      incremental_path, [p.stem for p in upsert_paths])
+
+        for name in TABLE_NAMES:
+            query = f'select * from "{name}"'
+            with sqlite3.connect(full_path) as conn:
+                expected = pl.read_database(query, conn)
+            with sqlite3.connect(incremental_path) as conn:
+                result = pl.read_database(query, conn)
+            assert_frame_equal(result, expected.select(result.columns),
+                               check_row_order=False)
@@ -0,0 +1,48 @@
+"""Unit tests for src/data/raw/plays.py."""
+
+import polars as pl
+import pytest
+
+from src.data.raw.plays import scan_plays
+
+
+@pytest.fixture
+def raw_plays_path(tmp_path):
+    """A fixture for two seasons of play-by-play files.
+
+    The down column is an integer in one season and a float in the other.
+
+    :param pathlib.Path tmp_path: temporary directory
+    :return: play-by-play directory
+    """
+    for season, down in [(2022, [1, 2, 3, 1]), (2023, [1.0, 2.0, 3.0, 4.0])]:
+        pl.DataFrame({
+            'season': [season] * 4,
+            'season_type': ['REG', 'REG', 'POST', 'REG'],
+            'posteam': ['KC', None, 'KC', ''],
+            'down': down,
+            'desc': ['play'] * 4,
+        }).write_parquet(tmp_path / f"play_by_play_{season}.parquet")
+    return tmp_path
+
+
+class TestScanPlays:
+    """Tests for scan_plays."""
+
+    def test_standard_case(self, raw_plays_path):
+        """Test that plays are filtered and only the columns asked for kept.
+
+        :param pathlib.Path raw_plays_path: play-by-play directory
+        """
+        plays = scan_plays(raw_plays_path, [2022, 2023],
+                           ['season', 'posteam', 'down']).collect()
+        assert plays.columns == ['season', 'posteam', 'down']
+        assert plays.rows() == [(2022, 'KC', 1.0), (2023, 'KC', 1.0)]
+
+    def test_missing_season_case(self, raw_plays_path):
+        """Test that a season without a file raises.
+
+        :param pathlib.Path raw_plays_path: play-by-play directory
+        """
+        with pytest.raises(FileNotFoundError):
+            scan_plays(raw_plays_path, [2021], ['season']).collect()
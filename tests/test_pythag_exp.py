@@ -0,0 +1,66 @@
+"""Unit tests for src/data/features/pythag_exp.py."""
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.features.pythag_exp import (build_pythag_team_features,
+                                          roll_points_for_against)
+
+
+@pytest.fixture
+def team_scores():
+    """A fixture for a team's scores over two seasons.
+
+    :return: team scores
+    """
+    return pl.LazyFrame({
+        'obj_team': ['BUF'] * 5,
+        'season': [2023, 2023, 2023, 2024, 2024],
+        'week': [1, 2, 3, 1, 2],
+        'adv_team': ['MIA', 'NE', 'NYJ', 'MIA', 'NE'],
+        'obj_score': [10, 20, 30, 7, 14],
+        'adv_score': [3, 6, 9, 21, 28],
+    })
+
+
+class TestRollPointsForAgainst:
+    """Tests for roll_points_for_against."""
+
+    def test_windows_case(self, team_scores):
+        """Test season-to-date and last-2-game totals.
+
+        :param pl.LazyFrame team_scores: team scores
+        """
+        result = roll_points_for_against(team_scores, windows=[None, 2])
+        expected = pl.LazyFrame({
+            'obj_team': ['BUF'] * 5,
+            'season': [2023, 2023, 2023, 2024, 2024],
+            'week': [1, 2, 3, 1, 2],
+            'points_for': [10, 30, 60, 7, 21],
+            'points_against': [3, 9, 18, 21, 49],
+            'points_for_2g': [10, 30, 50, 7, 21],
+            'points_against_2g': [3, 9, 15, 21, 49],
+        })
+        assert_frame_equal(result, expected)
+
+
+class TestBuildPythagTeamFeatures:
+    """Tests for build_pythag_team_features."""
+
+    def test_variants_case(self, team_scores):
+        """Test that every variant matches building it on its own.
+
+        :param pl.LazyFrame team_scores: team scores
+        """
+        scores = team_scores.filter(pl.col('season') == 2023)
+        result = build_pythag_team_features(scores, windows=[None, 2],
+                                            exponents=[2.77, 2.37]).collect()
+        assert result.columns == ['team', 'season', 'week', 'pyexp',
+                                  'pyexp_e2p37', 'pyexp_2g', 'pyexp_2g_e2p37']
+        for window in [None, 2]:
+            for exponent in [2.77, 2.37]:
+                expected = build_pythag_team_features(
+                    scores, windows=[window], exponents=[exponent]
+                ).collect()
+                assert_frame_equal(result.select(expected.columns), expected)
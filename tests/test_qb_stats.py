@@ -0,0 +1,77 @@
+"""Unit tests for src/data/features/qb_stats.py."""
+
+import polars as pl
+import pytest
+
+from src.data.features.qb_stats import (build_starter_qbr,
+                                        make_rolling_qb_data)
+
+
+@pytest.fixture
+def player_offense():
+    """A fixture for two QBs' passing over two seasons.
+
+    :return: player offense stats
+    """
+    return pl.LazyFrame({
+        'player': ['A', 'A', 'A', 'A', 'B'],
+        'pfr': ['202309100buf', '202309170buf', '202309240buf',
+                '202409080buf', '202409150buf'],
+        'season': [2023, 2023, 2023, 2024, 2024],
+        'week': [1, 2, 3, 1, 2],
+        'completions': [20, 10, 30, 15, 25],
+        'pass_attempts': [30, 20, 40, 25, 35],
+        'pass_yards': [250, 100, 300, 200, 280],
+        'pass_td': [2, 0, 3, 1, 2],
+        'interceptions': [1, 2, 0, 1, 0],
+    })
+
+
+class TestMakeRollingQbData:
+    """Tests for make_rolling_qb_data."""
+
+    def test_windows_case(self, player_offense):
+        """Test game and attempt windows.
+
+        :param pl.LazyFrame player_offense: player offense stats
+        """
+        result = (
+            make_rolling_qb_data(player_offense, game_windows=[2],
+                                 attempt_windows=[50])
+            .filter(pl.col('player') == 'A')
+            .sort('game_date')
+            .collect()
+        )
+        assert result['pass_attempts_2g'].to_list() == [30, 50, 60, 65]
+        # the fewest recent games with at least 50 attempts
+        assert result['pass_attempts_50att'].to_list() == [30, 50, 60, 65]
+        assert result['pass_yards_50att'].to_list() == [250, 350, 400, 500]
+
+
+class TestBuildStarterQbr:
+    """Tests for build_starter_qbr."""
+
+    def test_as_of_case(self, player_offense):
+        """Test that starters get their rating through their last game.
+
+        B's first start has no earlier passing game, and A didn't throw in
+        2024 week 2.
+
+        :param pl.LazyFrame player_offense: player offense stats
+        """
+        starters = pl.LazyFrame({
+            'posteam': ['BUF', 'BUF', 'BUF', 'BUF'],
+            'season': [2023, 2023, 2024, 2024],
+            'week': [1, 3, 2, 3],
+            'pfr': ['202309100buf', '202309240buf', '202409150buf',
+                    '202409220buf'],
+            'QB_1': ['A', 'A', 'B', 'A'],
+        })
+        result = build_starter_qbr(player_offense, starters,
+                                   game_windows=[1]).collect()
+        assert result['starter_qbr_1g'].to_list() == [
+            None,  # no earlier game, and no 2022 season for a league rating
+            25.0,  # A's 2023 week 2 game
+            92.4,  # the league's 2023 rating
+            82.1,  # A's 2024 week 1 game
+        ]
@@ -0,0 +1,108 @@
+"""Unit tests for src/data/features/scaler.py."""
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.data.features.scaler import (build_adjusted_features,
+                                      calculate_adj_metric_asof)
+
+
+TEAMS = ['BUF', 'MIA', 'NE', 'NYJ', 'KC', 'LV']
+
+
+def make_game_data(schedule, seed=0):
+    """Make per-team game data for a schedule.
+
+    :param list[tuple[int, int, str, str]] schedule: (season, week, away,
+        home) for each game
+    :param int seed: random seed
+    :return: one row per team and game
+    :rtype: pl.LazyFrame
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season, week, away, home in schedule:
+        for posteam, defteam in [(away, home), (home, away)]:
+            rows.append({'posteam': posteam, 'season': season, 'week': week,
+                         'defteam': defteam,
+                         'yards_play': int(rng.integers(100, 500)),
+                         'first_downs': int(rng.integers(5, 30)),
+                         'count': int(rng.integers(40, 80))})
+    return pl.LazyFrame(rows)
+
+
+@pytest.fixture
+def full_schedule():
+    """A fixture for two seasons in which every team plays every week.
+
+    :return: game data
+    """
+    rng = np.random.default_rng(1)
+    schedule = []
+    for season in [2023, 2024]:
+        for week in range(1, 11):
+            teams = rng.permutation(TEAMS)
+            schedule += [(season, week, teams[i], teams[i + 1])
+                         for i in range(0, len(teams), 2)]
+    return make_game_data(schedule)
+
+
+class TestBuildAdjustedFeatures:
+    """Tests for build_adjusted_features."""
+
+    @pytest.mark.parametrize('aggregation', ['mean', 'cumsum'])
+    def test_engines_match_case(self, full_schedule, aggregation):
+        """Test that the as-of engine matches the list-based engine.
+
+        :param pl.LazyFrame full_schedule: game data without byes
+        :param str aggregation: aggregation
+        """
+        expected = build_adjusted_features(full_schedule, aggregation,
+                                           engine='explode').collect()
+        result = build_adjusted_features(full_schedule, aggregation,
+                                         engine='asof').collect()
+        assert_frame_equal(result, expected)
+
+    def test_multi_stat_case(self, full_schedule):
+        """Test that adjusting stats together matches adjusting them alone.
+
+        :param pl.LazyFrame full_schedule: game data without byes
+        """
+        result = build_adjusted_features(full_schedule).collect()
+        assert result.columns == [
+            'team', 'season', 'week', 'yards_play_posteam',
+            'first_downs_posteam', 'yards_play_defteam', 'first_downs_defteam',
+        ]
+        for stat_name in ['yards_play', 'first_downs']:
+            expected = build_adjusted_features(
+                full_schedule, stat_names=[stat_name]
+            ).collect()
+            assert_frame_equal(result.select(expected.columns), expected)
+
+
+class TestCalculateAdjMetricAsof:
+    """Tests for calculate_adj_metric_asof."""
+
+    def test_bye_case(self):
+        """Test that an opponent on a bye contributes its latest totals."""
+        game_data = pl.LazyFrame({
+            'posteam': ['A', 'B', 'A', 'C', 'B', 'C'],
+            'season': [2024] * 6,
+            'week': [1, 1, 2, 2, 3, 3],
+            'defteam': ['B', 'A', 'C', 'A', 'C', 'B'],
+            'yards_play': [300, 200, 250, 350, 400, 100],
+            'count': [60, 50, 55, 65, 70, 45],
+        })
+        result = (
+            calculate_adj_metric_asof(game_data, ['yards_play'], 'posteam')
+            .filter(pl.col('posteam') == 'A', pl.col('week') == 2,
+                    pl.col('defteam') == 'B')
+            .collect()
+        )
+        # B was on a bye in week 2, so its totals through week 1 are used
+        assert result.select('yards_play_defteam', 'count_defteam').row(0) == (
+            300, 60)
+        # the league term is unused, so league totals aren't joined
+        assert 'yards_play_lg' not in result.columns
@@ -0,0 +1,77 @@
+"""Unit tests for src/data/features/srs.py."""
+
+import numpy as np
+import polars as pl
+import pytest
+
+from src.data.features.srs import build_srs_features
+
+
+TEAMS = ['BUF', 'MIA', 'NE', 'NYJ', 'KC', 'LV']
+
+
+@pytest.fixture
+def game_data():
+    """A fixture for a season in which every team plays every week.
+
+    Each offense and defense has a fixed strength, so that yards per play
+    are the league average plus the two strengths, plus noise.
+
+    :return: game data and the true strengths
+    """
+    rng = np.random.default_rng(0)
+    offense = dict(zip(TEAMS, rng.normal(0, 0.5, len(TEAMS))))
+    defense = dict(zip(TEAMS, rng.normal(0, 0.5, len(TEAMS))))
+    rows = []
+    for week in range(1, 16):
+        teams = rng.permutation(TEAMS)
+        for i in range(0, len(teams), 2):
+            for posteam, defteam in [teams[i:i + 2], teams[i:i + 2][::-1]]:
+                count = int(rng.integers(50, 70))
+                per_play = (5.5 + offense[posteam] + defense[defteam]
+                            + rng.normal(0, 0.05))
+                rows.append({'posteam': posteam, 'season': 2024,
+                             'week': week, 'defteam': defteam,
+                             'yards_play': per_play * count, 'count': count})
+    return pl.LazyFrame(rows), offense, defense
+
+
+class TestBuildSrsFeatures:
+    """Tests for build_srs_features."""
+
+    def test_recovers_strengths_case(self, game_data):
+        """Test that ratings recover the offense and defense strengths.
+
+        :param tuple game_data: game data and the true strengths
+        """
+        feature_data, offense, defense = game_data
+        result = (
+            build_srs_features(feature_data, alpha=1.0)
+            .filter(pl.col('week') == 15)
+            .collect()
+        )
+        mean_offense = np.mean(list(offense.values()))
+        mean_defense = np.mean(list(defense.values()))
+        for team, posteam, defteam in result.select(
+                'team', 'yards_play_posteam', 'yards_play_defteam').rows():
+            assert posteam == pytest.approx(offense[team] - mean_offense,
+                                            abs=0.05)
+            assert defteam == pytest.approx(defense[team] - mean_defense,
+                                            abs=0.05)
+
+    def test_weekly_fit_case(self, game_data):
+        """Test that each week's ratings only use games through that week.
+
+        :param tuple game_data: game data and the true strengths
+        """
+        feature_data, _, _ = game_data
+        result = build_srs_features(feature_data).collect()
+        through_week_5 = build_srs_features(
+            feature_data.filter(pl.col('week') <= 5)
+        ).collect()
+        assert result.height == 15 * len(TEAMS)
+        np.testing.assert_allclose(
+            result.filter(pl.col('week') <= 5).drop('team', 'season', 'week'),
+            through_week_5.drop('team', 'season', 'week'),
+            rtol=1e-7,
+        )
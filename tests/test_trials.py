@@ -0,0 +1,110 @@
+"""Unit tests for src/model/trials.py."""
+
+from functools import partial
+
+import pytest
+from hyperopt import hp
+
+from src.model.hyperoptimize import (find_best_params,
+                                     load_trials,
+                                     make_pruning_thresholds,
+                                     score_folds)
+from src.model.trials import TrialStore
+
+
+@pytest.fixture
+def space():
+    """A fixture for a one-parameter search space.
+
+    :return: hyperparameter ranges
+    """
+    return {'x': hp.uniform('x', -10, 10)}
+
+
+class TestTrialStore:
+    """Tests for TrialStore."""
+
+    def search(self, store, space, max_evals, calls):
+        """Run a stored search of a quadratic, counting evaluations.
+
+        :param TrialStore store: trial store
+        :param dict space: hyperparameter ranges
+        :param int max_evals: number of evaluations to perform
+        :param list calls: list to append each evaluation to
+        :return: best hyperparameters
+        """
+        def objective(params):
+            calls.append(params['x'])
+            return {'loss': (params['x'] - 3) ** 2, 'status': 'ok',
+                    'fold_scores': [params['x']], 'fit_times': [0.0]}
+
+        return find_best_params(
+            objective, space, max_evals=max_evals, early_stop_n=max_evals,
+            batch_size=2, seed=0, trials=load_trials(store.load('study')),
+            on_batch=partial(store.save, 'study', 'quadratic'),
+        )
+
+    def test_resume_case(self, tmp_path, space):
+        """Test that a search extends the stored trials without repeats.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param dict space: hyperparameter ranges
+        """
+        store = TrialStore(tmp_path / 'trials.db')
+        calls = []
+        self.search(store, space, 6, calls)
+        assert len(calls) == 6
+        best = self.search(store, space, 10, calls)
+        assert len(calls) == 10
+        assert len(set(calls)) == 10
+        stored = store.load('study')
+        assert [tid for tid, _, _ in stored] == list(range(10))
+        losses = {result['loss']: vals['x'][0] for _, vals, result in stored}
+        assert best['x'] == losses[min(losses)]
+        assert stored[0][2]['fold_scores'] == [calls[0]]
+
+    def test_finished_case(self, tmp_path, space):
+        """Test that a finished search evaluates nothing.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param dict space: hyperparameter ranges
+        """
+        store = TrialStore(tmp_path / 'trials.db')
+        calls = []
+        first = self.search(store, space, 4, calls)
+        assert self.search(store, space, 4, calls) == first
+        assert len(calls) == 4
+
+    def test_pruned_case(self, tmp_path, space):
+        """Test that pruned trials are restored as pruned, with the same
+        pruning thresholds.
+
+        :param pathlib.Path tmp_path: temporary directory
+        :param dict space: hyperparameter ranges
+        """
+        def objective(params, pruning=None):
+            def score_fold(fold):
+                return 0.0, -(params['x'] - 3) ** 2 - fold
+
+            return score_folds(score_fold, [0, 1, 2], pruning)
+
+        store = TrialStore(tmp_path / 'trials.db')
+        docs = []
+
+        def on_batch(batch_docs, params):
+            docs.extend(batch_docs)
+            store.save('study', 'quadratic', batch_docs, params)
+
+        find_best_params(objective, space, max_evals=30, early_stop_n=30,
+                         batch_size=2, seed=0, on_batch=on_batch,
+                         pruning={'min_trials': 5})
+        trials = load_trials(store.load('study'))
+        pruned = [doc['result'].get('pruned', False) for doc in docs]
+        assert any(pruned)
+        assert [result['pruned'] for result in trials.results] == pruned
+        assert make_pruning_thresholds(trials, min_trials=5) == (
+            make_pruning_thresholds(load_trials(
+                [(doc['tid'], doc['misc']['vals'], doc['result'])
+                 for doc in docs]
+            ), min_trials=5)
+        )
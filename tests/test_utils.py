@@ -4,8 +4,13 @@ import pytest
 
 import numpy as np
 import pandas as pd
+import polars as pl
 
-from src.utils import get_kickoff_hours, shift_week_number
+from src.utils import (combine_team_features,
+                       get_kickoff_hours,
+                       join_to_home_and_away,
+                       lag_team_features,
+                       make_team_week_index)
 
 
 class TestGetKickoffHours:
@@ -38,31 +43,111 @@ class TestGetKickoffHours:
             get_kickoff_hours(pd.Series([np.nan]))
 
 
-class TestShiftWeekNumber:
-    """Tests for shift_week_number."""
+class TestLagTeamFeatures:
+    """Tests for make_team_week_index and lag_team_features."""
 
     @pytest.fixture
-    def season_team_idx(self):
-        """A fixture for the season_team_idx column.
-        
-        :return: 
+    def team_weeks(self):
+        """A fixture for the team-week index of two seasons.
+
+        SF has a bye in week 2 of 2023.
+
+        :return: team-week index
         """
-        df = pd.DataFrame({'season': [2023]*6,
-                           'team': ['KC', 'KC', 'KC', 'SF', 'SF', 'SF'],
-                           'week': [1, 2, 3, 1, 2, 3],
-                           'value': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]})
-        df = df.set_index(['season', 'team', 'week'])
-        return df
-
-    def test_standard_case(self, season_team_idx):
-        """Test the standard case.
-    
-        :param pd.DataFrame season_team_idx: a column of game times
+        games = pl.LazyFrame({'obj_team': ['KC', 'KC', 'SF', 'KC'],
+                              'adv_team': ['SF', 'DEN', 'DEN', 'SF'],
+                              'season': [2023, 2023, 2023, 2024],
+                              'week': [1, 2, 3, 1]})
+        return make_team_week_index(games)
+
+    def test_index_case(self, team_weeks):
+        """Test the previous game pointers, including over a bye.
+
+        :param pl.LazyFrame team_weeks: team-week index
+        """
+        index = team_weeks.collect()
+        assert index['team_week'].to_list() == list(range(8))
+        assert index.filter(pl.col('team') == 'SF').rows() == [
+            ('SF', 2023, 1, 5, None),
+            ('SF', 2023, 3, 6, 5),
+            ('SF', 2024, 1, 7, None),
+        ]
+
+    def test_standard_case(self, team_weeks):
+        """Test that stats go into the team's next game of the season.
+
+        :param pl.LazyFrame team_weeks: team-week index
+        """
+        stats = pl.LazyFrame({'team': ['SF', 'SF', 'SF'],
+                              'season': [2024, 2023, 2023],
+                              'week': [1, 3, 1],
+                              'value': [3.0, 2.0, 1.0]})
+        lagged = lag_team_features(stats, team_weeks).collect()
+        assert lagged.columns == ['team', 'season', 'week', 'value']
+        assert lagged.filter(pl.col('team') == 'SF').rows() == [
+            ('SF', 2023, 1, None),
+            ('SF', 2023, 3, 1.0),
+            ('SF', 2024, 1, None),
+        ]
+
+
+class TestCombineTeamFeatures:
+    """Tests for combine_team_features and join_to_home_and_away."""
+
+    @pytest.fixture
+    def games(self):
+        """A fixture for two games in one week.
+
+        :return: games with obj and adv teams
+        """
+        return pl.LazyFrame({'game_id': ['a', 'b'],
+                             'season': [2023, 2023],
+                             'week': [2, 2],
+                             'obj_team': ['KC', 'SF'],
+                             'adv_team': ['DEN', 'LA']})
+
+    @pytest.fixture
+    def team_features(self):
+        """A fixture for two team feature tables.
+
+        DEN has no rating, so game a is missing from the second table.
+
+        :return: team feature tables
+        """
+        teams = ['KC', 'DEN', 'SF', 'LA']
+        yards = pl.LazyFrame({'team': teams, 'season': [2023] * 4,
+                              'week': [2] * 4, 'yards': [1.0, 2.0, 3.0, 4.0]})
+        rating = pl.LazyFrame({'team': ['KC', 'SF', 'LA'],
+                               'season': [2023] * 3, 'week': [2] * 3,
+                               'rating': [10.0, 30.0, 40.0]})
+        return [yards, rating]
+
+    def test_matches_chained_joins(self, games, team_features):
+        """Test that one join of the combined table matches a join per table.
+
+        Only the column order differs.
+
+        :param pl.LazyFrame games: games
+        :param list[pl.LazyFrame] team_features: team feature tables
+        """
+        chained = games
+        for table in team_features:
+            chained = join_to_home_and_away(chained, table, drop_swt=False)
+        combined = join_to_home_and_away(
+            games, combine_team_features(team_features), drop_swt=False
+        )
+        chained = chained.collect()
+        assert combined.collect().select(chained.columns).equals(chained)
+
+    def test_standard_case(self, games, team_features):
+        """Test the joined columns for the game with every feature.
+
+        :param pl.LazyFrame games: games
+        :param list[pl.LazyFrame] team_features: team feature tables
         """
-        shifted = shift_week_number(season_team_idx, 1)
-        expected = pd.DataFrame({'season': [2023]*4,
-                                 'team': ['KC', 'KC', 'SF', 'SF'],
-                                 'week': [2, 3, 2, 3],
-                                 'value': [1.0, 2.0, 4.0, 5.0]})
-        expected = expected.set_index(['season', 'team', 'week'])
-        assert shifted.equals(expected)
+        joined = join_to_home_and_away(
+            games, combine_team_features(team_features)
+        ).collect()
+        assert joined.columns == ['game_id', 'yards_obj', 'rating_obj',
+                                  'yards_adv', 'rating_adv']
+        assert joined.row(0) == ('b', 3.0, 30.0, 4.0, 40.0)